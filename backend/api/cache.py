@@ -0,0 +1,169 @@
+import os
+import time
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from sqlalchemy import text
+from starlette.responses import Response
+
+from .db import AsyncSessionLocal
+
+# Cache de respostas em memória (por processo).
+# Os dados só mudam quando o importer roda: cada carga grava uma nova versão em 'versao_dados'
+# e as respostas guardadas valem enquanto a versão for a mesma.
+
+# Limite do cache em bytes (corpo das respostas); as menos usadas saem primeiro
+CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# De quanto em quanto tempo (segundos) perguntar ao banco se a versão mudou
+CACHE_VERSION_TTL = float(os.getenv("API_CACHE_VERSION_TTL", "2"))
+
+# Rotas cacheadas (prefixos). Só GET com resposta 200.
+CACHED_PREFIXES = ("/operadoras", "/dashboard", "/analises")
+
+# Cabeçalhos da resposta original que vão junto para o cache
+CACHED_HEADERS = ("content-type",)
+
+class ResponseCache:
+    """LRU limitado por bytes: {chave: (etag, corpo, cabeçalhos)}."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        body = entry[1]
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self.entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, removed = self.entries.popitem(last=False)
+                self.size -= len(removed[1])
+
+    def set_version(self, version):
+        """Troca a versão dos dados; se mudou, tudo que estava guardado é descartado."""
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.size = 0
+                self.version = version
+
+    def stats(self):
+        with self.lock:
+            return {"versao": self.version, "entradas": len(self.entries), "bytes": self.size,
+                    "hits": self.hits, "misses": self.misses}
+
+class DataVersion:
+    """Lê a versão dos dados do banco, no máximo uma vez a cada 'ttl' segundos."""
+
+    def __init__(self, ttl=CACHE_VERSION_TTL):
+        self.ttl = ttl
+        self.value = None
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def fetch(self):
+        async with AsyncSessionLocal() as db:
+            # Banco sem nenhuma carga ainda (tabela não existe): versão "0"
+            if (await db.execute(text("SELECT to_regclass('versao_dados')"))).scalar() is None:
+                return "0"
+            return (await db.execute(text("SELECT versao FROM versao_dados WHERE id = 1"))).scalar() or "0"
+
+    def cached(self):
+        """Versão lida há menos de 'ttl' segundos, ou None se precisa consultar o banco."""
+        if self.value is not None and time.monotonic() - self.checked_at < self.ttl:
+            return self.value
+        return None
+
+    async def current(self):
+        # Uma consulta por vez: requisições simultâneas esperam e reaproveitam o resultado
+        async with self.lock:
+            if self.value is None or time.monotonic() - self.checked_at >= self.ttl:
+                self.value = await self.fetch()
+                self.checked_at = time.monotonic()
+            return self.value
+
+response_cache = ResponseCache()
+data_version = DataVersion()
+
+def cache_key(request):
+    """Rota + parâmetros (ordenados: ?a=1&b=2 e ?b=2&a=1 são a mesma resposta)."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+def make_etag(version, key):
+    return '"' + hashlib.sha1(f"{version}|{key}".encode()).hexdigest()[:20] + '"'
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+def is_cacheable(request):
+    return request.method == "GET" and request.url.path.startswith(CACHED_PREFIXES)
+
+async def cache_middleware(request, call_next):
+    """
+    Responde do cache quando possível:
+    - If-None-Match igual ao ETag atual -> 304 sem corpo (o navegador reaproveita o que tem);
+    - resposta já guardada para esta versão -> devolve os bytes guardados, sem ir ao banco;
+    - senão executa a rota e guarda a resposta (só status 200).
+    """
+    if not is_cacheable(request):
+        return await call_next(request)
+
+    version = data_version.cached()
+    if version is None:
+        try:
+            version = await data_version.current()
+        except Exception:
+            # Sem conseguir ler a versão não há como saber se o cache vale: segue sem cache
+            return await call_next(request)
+    if version != response_cache.version:
+        response_cache.set_version(version)
+
+    key = cache_key(request)
+    etag = make_etag(version, key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Data-Version": version}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    entry = response_cache.get(key)
+    if entry is not None:
+        _, body, cached_headers = entry
+        return Response(content=body, status_code=200, headers={**cached_headers, **headers, "X-Cache": "HIT"})
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    cached_headers = {k: v for k, v in response.headers.items() if k in CACHED_HEADERS}
+    # Só guarda se a versão não mudou enquanto a rota rodava (senão o corpo pode ser de dados novos)
+    if response_cache.version == version:
+        response_cache.put(key, (etag, body, cached_headers))
+    return Response(content=body, status_code=200,
+                    headers={**dict(response.headers), **headers, "X-Cache": "MISS"})
@@ -0,0 +1,169 @@
+import os
+import zlib
+import brotli
+
+# Compressão das respostas (brotli ou gzip, o que o cliente aceitar; brotli tem preferência).
+# Respostas normais são comprimidas inteiras; respostas em pedaços (exportação) são
+# comprimidas pedaço a pedaço, sem juntar tudo na memória.
+# Cada codificação é outra representação do recurso, com outro ETag forte: o ETag da rota ganha o
+# sufixo da codificação ("abc" -> "abc-br"), e o sufixo da codificação escolhida sai do If-None-Match
+# antes de chegar na rota ("abc-br" pedindo gzip não bate com nada: outra representação).
+
+# Respostas menores que isso (bytes) vão sem compressão: não compensa
+COMPRESS_MIN_SIZE = int(os.getenv("API_COMPRESS_MIN_SIZE", "1024"))
+
+# Níveis pensados para conteúdo gerado a cada requisição (rápidos, boa taxa)
+GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("API_BROTLI_QUALITY", "4"))
+
+# Conteúdo que já vem comprimido
+SKIP_CONTENT_TYPES = ("application/vnd.apache.parquet", "application/zip", "image/")
+
+def negotiate(accept_encoding):
+    """Escolhe 'br' ou 'gzip' pelo Accept-Encoding (respeitando q=0), ou None."""
+    aceitos = {}
+    for item in accept_encoding.split(","):
+        nome, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        aceitos[nome.strip().lower()] = q
+    for encoding in ("br", "gzip"):
+        if aceitos.get(encoding, aceitos.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def etag_with_coding(etag, encoding):
+    """ETag (bytes) da versão comprimida. ETag fraco (W/) vale para qualquer codificação e fica como está."""
+    if etag.startswith(b"W/") or not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + b"-" + encoding.encode() + b'"'
+
+def strip_coding(if_none_match, encoding):
+    """If-None-Match (bytes) sem o sufixo da codificação: a rota (e o cache) só conhecem o ETag sem compressão."""
+    sufixo = b"-" + encoding.encode() + b'"'
+    tags = []
+    for tag in if_none_match.split(b","):
+        tag = tag.strip()
+        if tag.endswith(sufixo) and not tag.startswith(b"W/"):
+            tag = tag[:-len(sufixo)] + b'"'
+        tags.append(tag)
+    return b", ".join(tags)
+
+class Compressor:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self.obj = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31: formato gzip (cabeçalho + CRC)
+            self.obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        """Comprime e libera o que já dá para enviar (o cliente recebe os pedaços sem esperar o fim)."""
+        if self.encoding == "br":
+            return self.obj.process(data) + self.obj.flush()
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.obj.finish() if self.encoding == "br" else self.obj.flush()
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if_none_match = headers.get(b"if-none-match")
+        client_tags = set()
+        if if_none_match and encoding:
+            client_tags = {t.strip() for t in if_none_match.split(b",")}
+            scope = {**scope, "headers": [(k, strip_coding(v, encoding) if k == b"if-none-match" else v)
+                                          for k, v in scope["headers"]]}
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                response_headers = dict(message.get("headers", []))
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (b"content-encoding" in response_headers
+                               or content_type.startswith(SKIP_CONTENT_TYPES))
+                if passthrough:
+                    await send(message)
+                elif message["status"] == 304:
+                    # Sem corpo: devolve o ETag na forma que o cliente mandou (com ou sem sufixo)
+                    passthrough = True
+                    await send(self.not_modified(message, encoding, client_tags))
+                elif not encoding:
+                    # Cliente sem compressão: vai como está, mas a resposta varia com o Accept-Encoding
+                    passthrough = True
+                    await send(self.with_vary(message))
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body:
+                    # Resposta inteira de uma vez
+                    if len(body) < self.minimum_size:
+                        await send(self.with_vary(start))
+                        await send(message)
+                        return
+                    c = Compressor(encoding)
+                    comprimido = c.chunk(body) + c.finish()
+                    await send(self.with_encoding(start, encoding, len(comprimido)))
+                    await send({"type": "http.response.body", "body": comprimido})
+                    return
+                # Resposta em pedaços: tamanho final desconhecido (sem Content-Length)
+                compressor = Compressor(encoding)
+                await send(self.with_encoding(start, encoding, None))
+
+            data = compressor.chunk(body)
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def with_vary(start):
+        headers = [(k, v) for k, v in start.get("headers", []) if k != b"vary"]
+        vary = [v for k, v in start.get("headers", []) if k == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        return {**start, "headers": headers}
+
+    @classmethod
+    def with_encoding(cls, start, encoding, length):
+        headers = [(k, etag_with_coding(v, encoding) if k == b"etag" else v)
+                   for k, v in cls.with_vary(start)["headers"] if k != b"content-length"]
+        headers.append((b"content-encoding", encoding.encode()))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**start, "headers": headers}
+
+    @classmethod
+    def not_modified(cls, start, encoding, client_tags):
+        def etag(valor):
+            comprimido = etag_with_coding(valor, encoding) if encoding else valor
+            return comprimido if comprimido in client_tags else valor
+        headers = [(k, etag(v) if k == b"etag" else v) for k, v in start.get("headers", [])]
+        return cls.with_vary({**start, "headers": headers})
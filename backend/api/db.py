@@ -1,7 +1,12 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from . import metrics
+
 # Configurações com Segurança (Lê do Sistema ou usa Padrão)
 DB_USER = os.getenv("DB_USER", "user_ans")
 DB_PASS = os.getenv("DB_PASS", "password_ans")
@@ -10,13 +15,79 @@ DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "ans_database")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Mesmo banco, driver assíncrono (asyncpg) para as rotas de leitura
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Pool de conexões (por processo/worker do uvicorn)
+POOL_SETTINGS = {
+    # Conexões mantidas abertas
+    'pool_size': int(os.getenv("DB_POOL_SIZE", "10")),
+    # Conexões extras abertas em picos (fechadas quando devolvidas)
+    'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    # Segundos esperando uma conexão livre antes de dar erro
+    'pool_timeout': float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    # Recicla conexões mais velhas que isso (segundos); -1 desliga
+    'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    # Testa a conexão antes de usar (evita erro depois de restart do banco)
+    'pool_pre_ping': os.getenv("DB_POOL_PRE_PING", "1") == "1",
+}
+
+# --- Instrumentação (ver api/metrics.py) ---
+
+class TimedQueuePool(QueuePool):
+    """Pool que mede quanto cada requisição esperou por uma conexão livre."""
+    engine_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_wait(self.engine_name, time.perf_counter() - start)
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_wait(self.engine_name, time.perf_counter() - start)
 
-# Cria o motor de conexão
-engine = create_engine(DATABASE_URL)
+def instrument(engine, engine_name):
+    """Mede cada comando SQL (e registra no log os lentos, com parâmetros)."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        metrics.observe_query(engine_name, statement, parameters, time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        # Comando com erro não passa pelo after_cursor_execute: descarta o início guardado
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+# Cria o motor de conexão (síncrono: scripts e rotas que ainda usam Session)
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **POOL_SETTINGS)
+instrument(engine, "sync")
 
 # Cria a fábrica de sessões
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor assíncrono: enquanto espera o banco, o worker atende outras requisições
+# (a concorrência não fica limitada ao threadpool do FastAPI)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **POOL_SETTINGS)
+# Os eventos de execução ficam no engine síncrono por baixo do assíncrono
+instrument(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 # Base para modelos (se fossemos usar ORM completo, mas usaremos SQL direto para performance)
 Base = declarative_base()
 
@@ -28,3 +99,20 @@ def get_db():
     finally:
         db.close()
 
+# Dependência assíncrona (rotas 'async def')
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_stats():
+    """Uso dos pools deste processo: conexões abertas, em uso, livres e extras (overflow)."""
+    stats = {}
+    for nome, pool in [('async', async_engine.pool), ('sync', engine.pool)]:
+        stats[nome] = {
+            'tamanho': pool.size(),
+            'em_uso': pool.checkedout(),
+            'livres': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'max_overflow': POOL_SETTINGS['max_overflow'],
+        }
+    return stats
@@ -0,0 +1,123 @@
+import os
+import io
+import csv
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from .db import async_engine
+
+# Exportação em massa de despesas_detalhadas.
+# As linhas saem do banco por um cursor no servidor, em lotes de EXPORT_BATCH, e cada lote
+# vira um pedaço da resposta HTTP (chunked) antes do próximo ser lido: a memória da API não
+# depende do tamanho da exportação.
+
+EXPORT_BATCH = int(os.getenv("API_EXPORT_BATCH", "5000"))
+
+EXPORT_COLUMNS = ['id', 'registro_ans', 'ano', 'trimestre', 'descricao', 'valor_despesa']
+
+# Schema do Parquet: valor exato (decimal, como no banco), registro_ans como texto
+PARQUET_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('registro_ans', pa.string()),
+    ('ano', pa.int32()),
+    ('trimestre', pa.int32()),
+    ('descricao', pa.string()),
+    ('valor_despesa', pa.decimal128(15, 2)),
+])
+
+# formato -> (content-type, extensão)
+EXPORT_FORMATS = {
+    'csv': ("text/csv; charset=utf-8", "csv"),
+    'ndjson': ("application/x-ndjson", "ndjson"),
+    'parquet': ("application/vnd.apache.parquet", "parquet"),
+}
+
+def build_query(ano=None, trimestre=None, registro_ans=None):
+    """SELECT com os filtros informados. Filtrar por ano/trimestre lê só as partições deles."""
+    filtros, params = [], {}
+    for coluna, valor in [('ano', ano), ('trimestre', trimestre), ('registro_ans', registro_ans)]:
+        if valor is not None:
+            filtros.append(f"{coluna} = :{coluna}")
+            params[coluna] = valor
+    where = "WHERE " + " AND ".join(filtros) if filtros else ""
+    return f"SELECT {', '.join(EXPORT_COLUMNS)} FROM despesas_detalhadas {where}", params
+
+async def fetch_batches(sql, params, batch=EXPORT_BATCH):
+    """Lotes de linhas lidos de um cursor no servidor (a conexão fica presa só durante a exportação)."""
+    async with async_engine.connect() as conn:
+        result = await conn.stream(text(sql).execution_options(yield_per=batch), params)
+        async for rows in result.partitions(batch):
+            yield rows
+
+# --- Serialização por lote ---
+
+def csv_chunk(rows, header=False):
+    """Mesmo padrão dos arquivos do pipeline: ';' e decimal ','."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', lineterminator='\n')
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(['' if v is None else str(v).replace('.', ',') if c == 'valor_despesa' else v
+                         for c, v in zip(EXPORT_COLUMNS, row)])
+    return buffer.getvalue().encode('utf-8')
+
+def ndjson_chunk(rows):
+    """Uma linha JSON por despesa (orjson já devolve bytes; Decimal vira número)."""
+    return b"".join(orjson.dumps(dict(zip(EXPORT_COLUMNS, row)), default=float,
+                                 option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+class StreamSink:
+    """
+    Destino de escrita para o ParquetWriter que não guarda os bytes: o que foi escrito é
+    retirado com take() e enviado. Só a posição (tell) é mantida, para o rodapé do arquivo.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.pending.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.pending)
+        self.pending = []
+        return data
+
+# --- Geradores da resposta ---
+
+async def stream_export(formato, sql, params):
+    """Gera os pedaços da resposta, um por lote lido do banco."""
+    if formato == 'parquet':
+        sink = StreamSink()
+        # Cada lote vira um row group; o rodapé sai no close()
+        with pq.ParquetWriter(sink, PARQUET_SCHEMA, compression='zstd') as writer:
+            async for rows in fetch_batches(sql, params):
+                colunas = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(colunas, PARQUET_SCHEMA)],
+                    schema=PARQUET_SCHEMA))
+                yield sink.take()
+        yield sink.take()
+        return
+
+    if formato == 'csv':
+        yield csv_chunk([], header=True)
+    async for rows in fetch_batches(sql, params):
+        yield csv_chunk(rows) if formato == 'csv' else ndjson_chunk(rows)
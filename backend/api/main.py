@@ -1,10 +1,20 @@
-from fastapi import FastAPI, Depends, HTTPException
+import base64
+import asyncio
+from decimal import Decimal
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from typing import List, Optional
+from typing import Literal, Optional
 from pydantic import BaseModel
-from .db import get_db
+from .db import AsyncSessionLocal, get_async_db, pool_stats
+from database import busca as busca_nome
+from .cache import cache_middleware, response_cache
+from .export import EXPORT_FORMATS, build_query, stream_export
+from .serialization import Tabela, json_response
+from .compression import CompressionMiddleware
+from .metrics import metrics_middleware, render_metrics
 
 app = FastAPI(
     title="API Intuitive Care - Teste Marcelo",
@@ -12,20 +22,34 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# --- CACHE DE RESPOSTAS ---
+# Respostas guardadas até a próxima carga do importer (ver api/cache.py)
+app.middleware("http")(cache_middleware)
+
 # --- CONFIGURAÇÃO DO CORS ---
 origins = [
     "http://localhost:5173", # Porta padrão do Vite (Frontend)
     "http://127.0.0.1:5173",
 ]
 
+# Registrado depois do cache = fica por fora dele: HITs e 304 também recebem os cabeçalhos de CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"], # Permite GET, POST, PUT, DELETE...
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Data-Version"],
 )
 
+# --- MÉTRICAS (latência e status por rota) ---
+# Fora do cache: conta também as respostas servidas por ele
+app.middleware("http")(metrics_middleware)
+
+# --- COMPRESSÃO (brotli/gzip) ---
+# Registrada por último = camada mais externa: comprime também as respostas vindas do cache
+app.add_middleware(CompressionMiddleware)
+
 # --- Schemas (Modelos de Resposta - O contrato da API) ---
 class OperadoraStats(BaseModel):
     razao_social: str
@@ -37,6 +61,26 @@ class TopOperadora(BaseModel):
     registro_ans: str
     total_despesas: float
 
+class TotalAnual(BaseModel):
+    ano: int
+    total_despesas: float
+    qtd_lancamentos: int
+
+def resposta_tabela(modelo):
+    """
+    Documentação (OpenAPI) de uma rota que devolve Tabela: lista de registros ou, com colunar=true,
+    {coluna: [valores]}. As rotas devolvem Response pronto, então o response_model não se aplica.
+    """
+    campos = modelo.model_json_schema()["properties"]
+    return {200: {
+        "description": f"Lista de {modelo.__name__} (ou, com colunar=true, uma lista de valores por coluna)",
+        "content": {"application/json": {"schema": {"oneOf": [
+            {"type": "array", "items": modelo.model_json_schema()},
+            {"type": "object", "title": f"{modelo.__name__}Colunar",
+             "properties": {nome: {"type": "array", "items": campo} for nome, campo in campos.items()}},
+        ]}}},
+    }}
+
 # --- Rotas ---
 
 @app.get("/")
@@ -44,74 +88,266 @@ def health_check():
     """Rota raiz para verificar se a API está online."""
     return {"status": "ok", "message": "API de Despesas ANS rodando!"}
 
+@app.get("/cache/stats", summary="Estatísticas do cache de respostas")
+def cache_stats():
+    """Versão dos dados em cache, ocupação e acertos/erros (deste processo)."""
+    return response_cache.stats()
+
+@app.get("/metrics", summary="Métricas no formato do Prometheus", include_in_schema=False)
+def metrics():
+    """Latência/status por rota, tempo dos comandos SQL e espera por conexão do pool."""
+    return render_metrics()
+
+@app.get("/db/stats", summary="Uso do pool de conexões")
+def db_stats():
+    """Conexões abertas, em uso e livres nos pools deste processo."""
+    return pool_stats()
+
+# --- Paginação por cursor (keyset) ---
+# O cursor guarda (total_despesas, id) da última linha da página: a próxima página começa
+# logo depois dela pelo índice (total_despesas DESC, id DESC), sem OFFSET.
+# Buscar a página N custa o mesmo que a página 1.
+
+def encode_cursor(total_despesas, id):
+    raw = f"{total_despesas}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        total, id = raw.split("|")
+        total = Decimal(total)
+        if not total.is_finite():
+            raise ValueError(total)
+        return total, int(id)
+    except (ValueError, ArithmeticError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+# --- Consultas (usadas pelas rotas e pelo /dashboard) ---
+# Valores NUMERIC saem do banco já como float8: o driver entrega float e a serialização
+# não precisa converter Decimal linha a linha. NUMERIC(15,2) cabe em float8 sem perder centavos.
+# No ORDER BY a coluna vai qualificada pela tabela: o nome puro é o alias float8 (sem índice).
+
+async def dados_operadoras(db, busca=None, limit=10, cursor=None, ordem="total"):
+    if cursor and ordem == "relevancia":
+        raise HTTPException(status_code=400, detail="Cursor só vale para ordem=total.")
+
+    params = {"limit": limit + 1}
+    filtros = []
+
+    # Cada palavra vira um LIKE na coluna normalizada (atendido pelo índice de trigramas)
+    palavras = busca_nome.termos(busca)
+    for i, palavra in enumerate(palavras):
+        params[f"termo_{i}"] = f"%{palavra}%"
+        filtros.append(f"razao_social_busca LIKE :termo_{i}")
+
+    if cursor:
+        params["cursor_total"], params["cursor_id"] = decode_cursor(cursor)
+        filtros.append("(total_despesas, id) < (:cursor_total, :cursor_id)")
+
+    ordenacao = "despesas_agregadas.total_despesas DESC, despesas_agregadas.id DESC"
+    if ordem == "relevancia" and palavras:
+        termo = " ".join(palavras)
+        params.update({"termo": termo, "termo_inicio": f"{termo}%", "termo_palavra": f"% {termo}%"})
+        ordenacao = f"""
+            CASE WHEN razao_social_busca = :termo THEN 0
+                 WHEN razao_social_busca LIKE :termo_inicio THEN 1
+                 WHEN razao_social_busca LIKE :termo_palavra THEN 2
+                 ELSE 3 END, {ordenacao}"""
+
+    # Query segura usando parâmetros (:termo_N) para evitar SQL Injection
+    query_sql = f"""
+        SELECT razao_social, uf, total_despesas::float8 AS total_despesas, id
+        FROM despesas_agregadas
+        {"WHERE " + " AND ".join(filtros) if filtros else ""}
+        ORDER BY {ordenacao}
+        LIMIT :limit
+    """
+    
+    # Executa SQL puro (uma linha a mais que o limite: diz se existe próxima página)
+    result = await db.execute(text(query_sql), params)
+    colunas = list(result.keys())
+    linhas = result.all()
+    pagina = linhas[:limit]
+
+    next_cursor = None
+    if len(linhas) > limit and ordem == "total":
+        ultima = pagina[-1]
+        next_cursor = encode_cursor(ultima.total_despesas, ultima.id)
+
+    # O id só serve para o cursor: fica fora da resposta
+    items = Tabela(colunas[:-1], [linha[:-1] for linha in pagina])
+    return {"items": items, "next_cursor": next_cursor}
+
+async def dados_top_10(db):
+    query = """
+        SELECT razao_social, registro_ans, total_despesas::float8 AS total_despesas
+        FROM resumo_operadoras
+        ORDER BY resumo_operadoras.total_despesas DESC
+        LIMIT 10;
+    """
+    return Tabela.from_result(await db.execute(text(query)))
+
+async def dados_resumo(db):
+    row = (await db.execute(text(
+        "SELECT total_gasto_geral::float8 AS total_gasto_geral, total_operadoras_analisadas FROM resumo_geral"
+    ))).first()
+    return {
+        "total_gasto_geral": row.total_gasto_geral if row else None,
+        "total_operadoras_analisadas": row.total_operadoras_analisadas if row else 0
+    }
+
+async def dados_anual(db):
+    return Tabela.from_result(await db.execute(text(
+        "SELECT ano, total_despesas::float8 AS total_despesas, qtd_lancamentos FROM resumo_anual ORDER BY ano DESC"
+    )))
+
+# --- Rotas de consulta ---
+# colunar=true: listas vêm como {coluna: [valores]} em vez de [{coluna: valor}] (resposta menor)
+
 @app.get("/operadoras", summary="Busca operadoras")
-def listar_operadoras(
+async def listar_operadoras(
     busca: Optional[str] = None, 
-    limit: int = 10, 
-    db: Session = Depends(get_db)
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    ordem: Literal["total", "relevancia"] = "total",
+    colunar: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Lista as operadoras com maiores despesas.
     Permite filtrar por nome (busca) e limitar a quantidade.
+    A busca ignora acentos, maiúsculas e pontuação; com várias palavras, todas precisam aparecer.
+    Para a próxima página, envie o 'next_cursor' da resposta em 'cursor' (null = acabou).
+    Com ordem=relevancia, nome igual ao buscado vem primeiro, depois os que começam com ele
+    e depois os que têm uma palavra começando com ele (só uma página, sem cursor).
     """
-    # Query segura usando parâmetros (:busca) para evitar SQL Injection
-    query_sql = """
-        SELECT razao_social, uf, total_despesas 
-        FROM despesas_agregadas
-        WHERE (:busca IS NULL OR lower(razao_social) LIKE lower('%' || :busca || '%'))
-        ORDER BY total_despesas DESC
-        LIMIT :limit
-    """
-    
-    # Executa SQL puro
-    results = db.execute(text(query_sql), {"busca": busca, "limit": limit}).fetchall()
-    
-    # Formata resposta
-    lista_resposta = []
-    for row in results:
-        lista_resposta.append({
-            "razao_social": row.razao_social,
-            "uf": row.uf,
-            "total_despesas": float(row.total_despesas)
-        })
-        
-    return lista_resposta
-
-@app.get("/dashboard/top-10", response_model=List[TopOperadora])
-def top_10_despesas_anual(db: Session = Depends(get_db)):
+    return json_response(await dados_operadoras(db, busca, limit, cursor, ordem), colunar)
+
+@app.get("/dashboard/top-10", responses=resposta_tabela(TopOperadora))
+async def top_10_despesas_anual(colunar: bool = False, db: AsyncSession = Depends(get_async_db)):
     """
     Retorna o Top 10 operadoras que mais gastaram no último ano.
+    Lê o resumo pré-calculado na carga (resumo_operadoras), não a tabela de detalhe.
     """
-    query = """
-        SELECT 
-            o.razao_social,
-            o.registro_ans,
-            SUM(d.valor_despesa) as total_despesas
-        FROM despesas_detalhadas d
-        JOIN operadoras o ON d.registro_ans = o.registro_ans
-        GROUP BY o.razao_social, o.registro_ans
-        ORDER BY total_despesas DESC
-        LIMIT 10;
-    """
-    results = db.execute(text(query)).fetchall()
-    
-    return [
-        {
-            "razao_social": row.razao_social, 
-            "registro_ans": row.registro_ans, 
-            "total_despesas": row.total_despesas
-        } 
-        for row in results
-    ]
+    return json_response(await dados_top_10(db), colunar)
 
 @app.get("/dashboard/resumo")
-def resumo_geral(db: Session = Depends(get_db)):
-    """Retorna números gerais para o topo do Dashboard."""
-    total_despesa = db.execute(text("SELECT SUM(valor_despesa) FROM despesas_detalhadas")).scalar()
-    total_ops = db.execute(text("SELECT COUNT(*) FROM operadoras")).scalar()
-    
-    return {
-        "total_gasto_geral": total_despesa,
-        "total_operadoras_analisadas": total_ops
-    }
+async def resumo_geral(db: AsyncSession = Depends(get_async_db)):
+    """Retorna números gerais para o topo do Dashboard (resumo pré-calculado na carga)."""
+    return json_response(await dados_resumo(db))
+
+@app.get("/dashboard/anual", responses=resposta_tabela(TotalAnual))
+async def totais_por_ano(colunar: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Total de despesas e de lançamentos por ano (resumo pré-calculado na carga)."""
+    return json_response(await dados_anual(db), colunar)
+
+# --- Dashboard completo em uma requisição ---
+
+async def com_sessao(consulta, *args):
+    """Roda uma consulta com sessão (conexão) própria: sessões diferentes podem consultar ao mesmo tempo."""
+    async with AsyncSessionLocal() as db:
+        return await consulta(db, *args)
 
+@app.get("/dashboard", summary="Dados da tela inicial do dashboard")
+async def dashboard(
+    busca: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=1000),
+    colunar: bool = False,
+):
+    """
+    Tudo que a tela inicial precisa (listagem, Top 10, resumo e totais por ano) em uma resposta.
+    As consultas rodam em paralelo, cada uma na sua conexão: o tempo é o da mais lenta, não a soma.
+    """
+    operadoras, top_10, resumo, anual = await asyncio.gather(
+        com_sessao(dados_operadoras, busca, limit),
+        com_sessao(dados_top_10),
+        com_sessao(dados_resumo),
+        com_sessao(dados_anual),
+    )
+    return json_response({"operadoras": operadoras, "top_10": top_10, "resumo": resumo, "anual": anual}, colunar)
+
+# --- Análises (cubo trimestral gerado pelo aggregator) ---
+# Cada análise lê um nível do cubo pelo índice (nivel, ...): nada de varrer despesas_detalhadas.
+
+async def dados_trimestres(db, uf=None):
+    filtro_uf = "AND uf = :uf" if uf else ""
+    return Tabela.from_result(await db.execute(text(f"""
+        SELECT ano, trimestre, total_despesas::float8 AS total_despesas, qtd_lancamentos,
+               qtd_operadoras, variacao_pct
+        FROM cubo_despesas
+        WHERE nivel = :nivel {filtro_uf}
+        ORDER BY ano, trimestre
+    """), {"nivel": "uf_trimestre" if uf else "trimestre", "uf": uf}))
+
+async def dados_ufs(db):
+    return Tabela.from_result(await db.execute(text("""
+        SELECT uf, qtd_operadoras, media_por_operadora::float8 AS media_por_operadora,
+               total_despesas::float8 AS total_despesas
+        FROM cubo_despesas
+        WHERE nivel = 'uf'
+        ORDER BY cubo_despesas.total_despesas DESC
+    """)))
+
+async def dados_volatilidade(db, limit=10):
+    return Tabela.from_result(await db.execute(text("""
+        SELECT razao_social, uf, media_trimestral::float8 AS media_trimestral,
+               desvio_padrao::float8 AS desvio_padrao
+        FROM cubo_despesas
+        WHERE nivel = 'operadora' AND desvio_padrao > 0
+        ORDER BY cubo_despesas.desvio_padrao DESC
+        LIMIT :limit
+    """), {"limit": limit}))
+
+async def dados_operadora_trimestres(db, razao_social, uf=None):
+    filtro_uf = "AND uf = :uf" if uf else ""
+    return Tabela.from_result(await db.execute(text(f"""
+        SELECT razao_social, uf, ano, trimestre, total_despesas::float8 AS total_despesas,
+               qtd_lancamentos, variacao_pct
+        FROM cubo_despesas
+        WHERE nivel = 'operadora_trimestre' AND razao_social = :razao_social {filtro_uf}
+        ORDER BY uf, ano, trimestre
+    """), {"razao_social": razao_social, "uf": uf}))
+
+@app.get("/analises/trimestres", summary="Variação de despesas por trimestre")
+async def analise_trimestres(uf: Optional[str] = None, colunar: bool = False,
+                             db: AsyncSession = Depends(get_async_db)):
+    """Total por trimestre (de todas as operadoras ou só de uma UF) e variação (%) sobre o trimestre anterior."""
+    return json_response(await dados_trimestres(db, uf), colunar)
+
+@app.get("/analises/ufs", summary="Despesas por UF")
+async def analise_ufs(colunar: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Quantidade de operadoras, média de despesa por operadora e total de cada UF."""
+    return json_response(await dados_ufs(db), colunar)
+
+@app.get("/analises/volatilidade", summary="Operadoras com gastos mais instáveis")
+async def analise_volatilidade(limit: int = Query(10, ge=1, le=1000), colunar: bool = False,
+                               db: AsyncSession = Depends(get_async_db)):
+    """Operadoras com maior desvio padrão das despesas entre trimestres."""
+    return json_response(await dados_volatilidade(db, limit), colunar)
+
+@app.get("/analises/operadora", summary="Despesas de uma operadora por trimestre")
+async def analise_operadora(razao_social: str, uf: Optional[str] = None, colunar: bool = False,
+                            db: AsyncSession = Depends(get_async_db)):
+    """Série trimestral de uma operadora (razão social exata), com a variação sobre o trimestre anterior."""
+    return json_response(await dados_operadora_trimestres(db, razao_social, uf), colunar)
+
+@app.get("/export/despesas", summary="Exporta despesas detalhadas")
+def exportar_despesas(
+    formato: Literal["csv", "ndjson", "parquet"] = "csv",
+    ano: Optional[int] = None,
+    trimestre: Optional[int] = Query(None, ge=1, le=4),
+    registro_ans: Optional[str] = None,
+):
+    """
+    Exporta despesas_detalhadas inteira (ou filtrada por ano, trimestre e registro_ans)
+    em CSV (';' e decimal ','), NDJSON (uma linha JSON por despesa) ou Parquet.
+    A resposta é enviada em pedaços enquanto o banco é lido: serve para milhões de linhas.
+    """
+    sql, params = build_query(ano, trimestre, registro_ans)
+    content_type, extensao = EXPORT_FORMATS[formato]
+    return StreamingResponse(
+        stream_export(formato, sql, params),
+        media_type=content_type,
+        headers={"Content-Disposition": f'attachment; filename="despesas_detalhadas.{extensao}"'},
+    )
@@ -0,0 +1,84 @@
+import os
+import time
+import logging
+from prometheus_client import (CollectorRegistry, Counter, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+from starlette.responses import Response
+from starlette.routing import Match
+
+# Métricas da API no formato do Prometheus (rota /metrics).
+# Com vários workers (uvicorn --workers N), defina PROMETHEUS_MULTIPROC_DIR com uma pasta vazia
+# e compartilhada: cada processo grava seus valores lá e o /metrics soma todos eles.
+
+logger = logging.getLogger("api.metrics")
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Consultas acima disso (ms) vão para o log com os parâmetros
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_COUNT = Counter("api_requests_total", "Requisições atendidas",
+                        ["method", "route", "status"])
+REQUEST_LATENCY = Histogram("api_request_duration_seconds",
+                            "Tempo até a resposta começar a ser enviada",
+                            ["method", "route"], buckets=LATENCY_BUCKETS)
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "Tempo de execução dos comandos SQL",
+                          ["engine", "operation"], buckets=LATENCY_BUCKETS)
+SLOW_QUERIES = Counter("db_slow_queries_total", "Comandos SQL acima de DB_SLOW_QUERY_MS",
+                       ["engine", "operation"])
+POOL_WAIT = Histogram("db_pool_checkout_wait_seconds", "Espera por uma conexão livre do pool",
+                      ["engine"], buckets=LATENCY_BUCKETS)
+
+def route_label(request):
+    """Modelo da rota ("/operadoras"), não o caminho real: evita uma série por URL diferente."""
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    # Resposta que não chegou ao roteador (ex: veio do cache): procura a rota que atenderia
+    for route in request.app.router.routes:
+        if route.matches(request.scope)[0] == Match.FULL:
+            return route.path
+    return "desconhecida"
+
+async def metrics_middleware(request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = route_label(request)
+        REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(request.method, route, str(status)).inc()
+
+# --- SQL ---
+
+def sql_operation(statement):
+    """Primeira palavra do comando (SELECT, INSERT...), para agrupar sem explodir o número de séries."""
+    palavra = statement.lstrip().split(None, 1)[0] if statement.strip() else ""
+    return palavra.upper()[:16] or "OUTRO"
+
+def observe_query(engine_name, statement, parameters, elapsed):
+    operation = sql_operation(statement)
+    QUERY_LATENCY.labels(engine_name, operation).observe(elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.labels(engine_name, operation).inc()
+        logger.warning("Consulta lenta (%.1f ms) [%s]: %s | parâmetros: %r",
+                       elapsed * 1000, engine_name, " ".join(statement.split()), parameters)
+
+def observe_pool_wait(engine_name, elapsed):
+    POOL_WAIT.labels(engine_name).observe(elapsed)
+
+# --- Exposição ---
+
+def render_metrics():
+    """Texto no formato do Prometheus (somando todos os workers, no modo multiprocesso)."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,40 @@
+from decimal import Decimal
+import orjson
+from starlette.responses import Response
+
+# Serialização rápida das respostas: as linhas do banco vão direto para bytes com orjson,
+# sem passar pela validação/conversão do Pydantic e do jsonable_encoder do FastAPI.
+
+class Tabela:
+    """Resultado de uma consulta (nomes das colunas + linhas), serializado só na hora da resposta."""
+
+    def __init__(self, colunas, linhas):
+        self.colunas = list(colunas)
+        self.linhas = linhas
+
+    @classmethod
+    def from_result(cls, result):
+        return cls(result.keys(), result.all())
+
+    def registros(self):
+        """[{coluna: valor}, ...] (formato padrão da API)."""
+        return [dict(zip(self.colunas, linha)) for linha in self.linhas]
+
+    def colunar(self):
+        """{coluna: [valores]}: os nomes das colunas aparecem uma vez só (resposta menor)."""
+        if not self.linhas:
+            return {coluna: [] for coluna in self.colunas}
+        return dict(zip(self.colunas, zip(*self.linhas)))
+
+def to_json(conteudo, colunar=False):
+    """Serializa com orjson. Tabela vira lista de registros (ou colunas, com colunar=True); Decimal vira número."""
+    def default(obj):
+        if isinstance(obj, Tabela):
+            return obj.colunar() if colunar else obj.registros()
+        if isinstance(obj, Decimal):
+            return float(obj)
+        raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+    return orjson.dumps(conteudo, default=default)
+
+def json_response(conteudo, colunar=False):
+    return Response(content=to_json(conteudo, colunar), media_type="application/json")
@@ -0,0 +1,184 @@
+"""
+Benchmark de carga da API: vazão (RPS), latência (p50/p95/p99) e taxa de erro por rota.
+
+A API precisa estar rodando (docker compose up, ou uvicorn api.main:app). Com --seed-db o banco
+configurado em DB_* é recarregado com dados sintéticos antes (ver benchmarks/synthetic.py).
+
+Uso:
+    python benchmarks/api_benchmark.py --seed-db --escala 10 --concorrencia 1 8 32 --duracao 15 \\
+        --saida resultados/api_escala10.json
+    python benchmarks/api_benchmark.py --sem-cache      # cada requisição fura o cache de respostas
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Permite rodar este arquivo direto (python benchmarks/api_benchmark.py) e ainda achar os pacotes do backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.profiling import git_commit, machine_info
+
+API_URL = os.getenv("BENCH_API_URL", "http://localhost:8000")
+
+# Termos de busca usados quando o banco não foi gerado agora (partes comuns dos nomes)
+BUSCAS_PADRAO = ['unimed', 'saude', 'sao francisco', 'odonto', 'amil', 'medica', 'santa casa']
+
+def cenarios(buscas):
+    """Nome -> função que devolve (caminho, parâmetros) de uma requisição."""
+    return {
+        'operadoras': lambda rng: ("/operadoras", {"limit": 10}),
+        'operadoras_busca': lambda rng: ("/operadoras", {"limit": 10, "busca": rng.choice(buscas)}),
+        'top_10': lambda rng: ("/dashboard/top-10", {}),
+        'resumo': lambda rng: ("/dashboard/resumo", {}),
+    }
+
+def percentil(ordenados, p):
+    """Percentil por posição mais próxima (lista já ordenada)."""
+    if not ordenados:
+        return None
+    k = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[k]
+
+def executar(url, gerar, concorrencia, duracao, aquecimento, sem_cache, seed=0):
+    """
+    Dispara requisições com 'concorrencia' threads (cada uma com sua conexão keep-alive)
+    durante 'duracao' segundos, depois de 'aquecimento' segundos não medidos.
+    """
+    latencias, erros = [], []
+    lock = threading.Lock()
+    inicio_medicao = time.perf_counter() + aquecimento
+    fim = inicio_medicao + duracao
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        minhas_latencias, meus_erros = [], []
+        contador = 0
+        while True:
+            agora = time.perf_counter()
+            if agora >= fim:
+                break
+            caminho, params = gerar(rng)
+            if sem_cache:
+                # Parâmetro extra muda a chave do cache: toda requisição vai ao banco
+                contador += 1
+                params = {**params, "_": f"{n}-{contador}"}
+            t0 = time.perf_counter()
+            try:
+                r = session.get(url + caminho, params=params, timeout=30)
+                ok = r.status_code < 400
+                r.content  # lê o corpo inteiro (faz parte da latência)
+            except requests.RequestException:
+                ok = False
+            t1 = time.perf_counter()
+            if t0 >= inicio_medicao:
+                minhas_latencias.append(t1 - t0)
+                if not ok:
+                    meus_erros.append(t1 - t0)
+        session.close()
+        with lock:
+            latencias.extend(minhas_latencias)
+            erros.extend(meus_erros)
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(worker, range(concorrencia)))
+
+    latencias.sort()
+    total = len(latencias)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'concorrencia': concorrencia,
+        'duracao_s': duracao,
+        'requisicoes': total,
+        'erros': len(erros),
+        'taxa_erro': round(len(erros) / total, 6) if total else None,
+        'rps': round(total / duracao, 2),
+        'latencia_ms': {
+            'p50': ms(percentil(latencias, 50)),
+            'p95': ms(percentil(latencias, 95)),
+            'p99': ms(percentil(latencias, 99)),
+            'media': ms(sum(latencias) / total) if total else None,
+            'max': ms(latencias[-1]) if total else None,
+        },
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API")
+    parser.add_argument("--url", default=API_URL, help="Endereço da API")
+    parser.add_argument("--cenarios", nargs="+", default=['operadoras', 'operadoras_busca', 'top_10', 'resumo'],
+                        help="Rotas a medir")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 8, 32],
+                        help="Requisições simultâneas (uma rodada para cada valor)")
+    parser.add_argument("--duracao", type=float, default=10, help="Segundos medidos por rodada")
+    parser.add_argument("--aquecimento", type=float, default=2, help="Segundos não medidos no início de cada rodada")
+    parser.add_argument("--sem-cache", action="store_true", help="Fura o cache de respostas da API")
+    parser.add_argument("--seed-db", action="store_true",
+                        help="Recarrega o banco (DB_*) com dados sintéticos antes de medir")
+    parser.add_argument("--escala", type=float, default=1, help="Escala dos dados sintéticos (com --seed-db)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente dos dados e das buscas")
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados (padrão: só imprime)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    buscas = BUSCAS_PADRAO
+
+    if args.seed_db:
+        from benchmarks import synthetic
+        operadoras = synthetic.seed_database(args.escala, args.seed)
+        # Termos que existem nos dados gerados: primeira palavra de nomes sorteados
+        amostra = operadoras['RazaoSocial'].sample(min(50, len(operadoras)), random_state=args.seed)
+        buscas = sorted(set(amostra.str.split().str[0].str.lower())) + BUSCAS_PADRAO
+
+    disponiveis = cenarios(buscas)
+    desconhecidos = [c for c in args.cenarios if c not in disponiveis]
+    if desconhecidos:
+        raise SystemExit(f"Cenários desconhecidos: {desconhecidos} (use {', '.join(disponiveis)})")
+
+    requests.get(args.url + "/", timeout=10).raise_for_status()
+
+    resultados = []
+    for cenario in args.cenarios:
+        for concorrencia in args.concorrencia:
+            print(f"⏱️  {cenario} com {concorrencia} simultâneas por {args.duracao}s...")
+            r = executar(args.url, disponiveis[cenario], concorrencia, args.duracao,
+                         args.aquecimento, args.sem_cache, args.seed)
+            r = {'cenario': cenario, **r}
+            lat = r['latencia_ms']
+            print(f"   {r['rps']} req/s | p50 {lat['p50']} ms | p95 {lat['p95']} ms | "
+                  f"p99 {lat['p99']} ms | erros {r['erros']}")
+            resultados.append(r)
+
+    relatorio = {
+        'benchmark': 'api',
+        'commit': git_commit(),
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'maquina': machine_info(),
+        'config': {
+            'url': args.url, 'escala': args.escala if args.seed_db else None, 'seed': args.seed,
+            'sem_cache': args.sem_cache, 'duracao_s': args.duracao, 'aquecimento_s': args.aquecimento,
+        },
+        'resultados': resultados,
+    }
+
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"📄 Resultados gravados em {args.saida}")
+    else:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    return relatorio
+
+if __name__ == "__main__":
+    main()
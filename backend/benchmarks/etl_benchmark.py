@@ -0,0 +1,151 @@
+"""
+Benchmark do pipeline ETL offline: tempo e pico de memória de cada etapa com dados sintéticos.
+
+Gera os arquivos brutos (ZIPs trimestrais + Cadop, ver benchmarks/synthetic.py), simula o
+download (copia os ZIPs para <pasta>/raw) e roda as etapas do main.py uma a uma, cada uma em
+um processo novo: o pico de memória (RSS) medido é só daquela etapa. O Cadop é servido pelo
+etl/fake_ans_server.py e baixado pela rotina normal do scraper.
+
+A etapa importer grava no banco configurado em DB_* (full refresh, substitui os dados) e só
+roda com --com-banco.
+
+Uso:
+    python benchmarks/etl_benchmark.py --escala 1 --trimestres 4 --saida resultados/etl_escala1.json
+    python benchmarks/etl_benchmark.py --escala 10 --trimestres 8 --formato parquet --com-banco
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timezone
+
+# Permite rodar este arquivo direto (python benchmarks/etl_benchmark.py) e ainda achar os pacotes do backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import formats, scraper
+from etl.fake_ans_server import start_server
+from etl.profiling import RunReport, git_commit, machine_info
+from benchmarks import synthetic
+
+ETAPAS = ['consolidator', 'transformer', 'aggregator', 'importer']
+
+def medir_etapa(nome, pasta, fmt, fila):
+    """Executado em um processo novo: aponta as etapas para a pasta do benchmark e roda uma delas."""
+    import main
+    from database import importer
+
+    synthetic.apontar_para(pasta)
+    etapa = main.build_stages(fmt)[nome]
+    run = etapa['run']
+    if nome == 'importer':
+        # Carga completa: cada execução mede o mesmo trabalho (a incremental pularia trimestres já carregados)
+        run = lambda: importer.load_data(full_refresh=True, fmt=fmt)
+
+    # Mesmas medidas do relatório do main.py (tempo, CPU, pico de RSS, linhas/bytes, I/O)
+    report = RunReport(os.path.join(pasta, f"relatorio_{nome}.json"))
+    try:
+        with report.stage(nome, etapa.get('inputs'), etapa.get('outputs')):
+            run()
+    except Exception:
+        pass  # o erro fica registrado na etapa
+    fila.put(report.data['etapas'][-1])
+
+def executar_etapa(nome, pasta, fmt):
+    # spawn: o processo começa vazio (fork herdaria a memória do gerador e distorceria o pico)
+    ctx = multiprocessing.get_context('spawn')
+    fila = ctx.Queue()
+    processo = ctx.Process(target=medir_etapa, args=(nome, pasta, fmt, fila))
+    processo.start()
+    try:
+        resultado = fila.get()
+    finally:
+        processo.join()
+    return resultado
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do pipeline ETL")
+    parser.add_argument("--escala", type=float, default=1, help="Múltiplo do número atual de operadoras")
+    parser.add_argument("--trimestres", type=int, default=len(synthetic.TRIMESTRES), help="Trimestres gerados")
+    parser.add_argument("--contas", type=int, default=synthetic.CONTAS_POR_OPERADORA,
+                        help="Contas por operadora em cada trimestre")
+    parser.add_argument("--fracao-xlsx", type=float, default=synthetic.FRACAO_XLSX,
+                        help="Parte dos trimestres gravada em Excel")
+    parser.add_argument("--seed", type=int, default=42, help="Semente dos dados")
+    parser.add_argument("--formato", choices=list(formats.FORMATS), default=formats.FORMAT,
+                        help="Formato dos arquivos intermediários")
+    parser.add_argument("--workers", type=int, help="Processos do consolidator (CONSOLIDATOR_WORKERS)")
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, help="Etapas medidas (padrão: todas)")
+    parser.add_argument("--com-banco", action="store_true",
+                        help="Inclui o importer (substitui os dados do banco configurado em DB_*)")
+    parser.add_argument("--pasta", help="Pasta de trabalho (padrão: temporária, apagada no fim)")
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados (padrão: só imprime)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    etapas = args.etapas or [e for e in ETAPAS if e != 'importer' or args.com_banco]
+    if 'importer' in etapas and not args.com_banco:
+        raise SystemExit("A etapa importer substitui os dados do banco: use --com-banco")
+    if args.workers:
+        # Lido pelo consolidator no processo da etapa (herda o ambiente)
+        os.environ["CONSOLIDATOR_WORKERS"] = str(args.workers)
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="ans_etl_bench_")
+    pasta_ans = os.path.join(pasta, "ans")
+    processados = os.path.join(pasta, "processed")
+    os.makedirs(processados, exist_ok=True)
+
+    inicio = time.perf_counter()
+    geracao = synthetic.gerar_arquivos_ans(pasta_ans, args.escala, args.trimestres, args.seed,
+                                           args.contas, args.fracao_xlsx)
+    geracao['segundos'] = round(time.perf_counter() - inicio, 3)
+    synthetic.simular_download(pasta_ans, os.path.join(processados, "raw"))
+
+    server, base_url = start_server(pasta_ans)
+    resultados = []
+    try:
+        scraper.download_cadop(os.path.join(processados, "raw"), base_url=f"{base_url}{synthetic.DIR_CADOP}/")
+        for nome in etapas:
+            print(f"⏱️  {nome}...")
+            r = executar_etapa(nome, processados, args.formato)
+            print(f"   {r['segundos']} s | CPU {r['cpu_segundos']} s | pico {r['pico_rss_mb']} MB"
+                  + (f" | ❌ {r['erro']}" if r.get('erro') else ""))
+            resultados.append(r)
+            if r.get('erro'):
+                break
+    finally:
+        server.shutdown()
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    relatorio = {
+        'benchmark': 'etl',
+        'commit': git_commit(),
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'maquina': machine_info(),
+        'config': {
+            'escala': args.escala, 'trimestres': args.trimestres, 'contas': args.contas,
+            'fracao_xlsx': args.fracao_xlsx, 'seed': args.seed, 'formato': args.formato,
+            'workers': int(os.getenv("CONSOLIDATOR_WORKERS", "1")),
+        },
+        'geracao': geracao,
+        'etapas': resultados,
+        'total_segundos': round(sum(r['segundos'] for r in resultados), 3),
+    }
+
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"📄 Resultados gravados em {args.saida}")
+    else:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    return relatorio
+
+if __name__ == "__main__":
+    main()
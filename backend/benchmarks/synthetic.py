@@ -0,0 +1,377 @@
+"""
+Dados sintéticos no formato do pipeline, para benchmarks.
+
+Escala 1 = volume aproximado atual da ANS (~1.000 operadoras; nas demonstrações contábeis,
+~600 contas por operadora/trimestre, das quais ~20 são despesas com eventos/sinistros).
+A escala multiplica o número de operadoras (e, junto, o de lançamentos).
+
+Dois pontos de entrada:
+* gerar_enriquecido / seed_database: já no formato de despesas_enriquecidas (API, aggregator, importer);
+* gerar_arquivos_ans: arquivos brutos no layout do FTP da ANS (ZIPs trimestrais + Cadop), a
+  entrada do pipeline inteiro (consolidator e transformer inclusive).
+
+Uso:
+    python benchmarks/synthetic.py --escala 10 --seed-db     # gera e carrega no banco (DB_*)
+    python benchmarks/synthetic.py --ans --trimestres 8 --pasta /tmp/ans
+    python etl/fake_ans_server.py /tmp/ans                    # serve no lugar da ANS (ver main.py)
+"""
+
+import os
+import sys
+import io
+import csv
+import shutil
+import argparse
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+
+# Permite rodar este arquivo direto (python benchmarks/synthetic.py) e ainda achar os pacotes do backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import formats, consolidator, transformer, aggregator
+from database import importer
+
+OPERADORAS_BASE = 1000
+LANCAMENTOS_POR_TRIMESTRE = 20
+TRIMESTRES = [(2024, 4), (2025, 1), (2025, 2)]
+
+UFS = ['SP', 'RJ', 'MG', 'RS', 'PR', 'BA', 'SC', 'PE', 'GO', 'CE', 'DF', 'ES', 'PA', 'MT',
+       'MS', 'AM', 'PB', 'RN', 'AL', 'MA', 'PI', 'SE', 'RO', 'TO', 'AC', 'AP', 'RR']
+# Concentração parecida com a real: muitas operadoras no Sudeste
+PESOS_UF = np.array([30, 12, 11, 7, 6, 4, 4, 3, 3, 3, 2, 2, 2, 2, 1.5, 1.5, 1, 1, 1, 1, 1, 1, .5, .5, .5, .5, .5])
+
+# Pedaços de nome (com acentos de propósito: a busca precisa ignorá-los)
+PREFIXOS = ['UNIMED', 'AMIL', 'BRADESCO', 'SUL AMÉRICA', 'HAPVIDA', 'NOTREDAME', 'PREVENT', 'CASSI',
+            'GEAP', 'SÃO FRANCISCO', 'SANTA CASA', 'PORTO', 'MEDSÊNIOR', 'CLINIPAM', 'PAX']
+SUFIXOS = ['SAÚDE', 'ASSISTÊNCIA MÉDICA', 'COOPERATIVA DE TRABALHO MÉDICO', 'ODONTOLOGIA',
+           'PLANOS DE SAÚDE', 'SEGURO SAÚDE', 'ADMINISTRADORA']
+DESCRICOES = ['EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA A SAÚDE MEDICO HOSPITALAR',
+              'EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA A SAÚDE ODONTOLÓGICA']
+
+def gerar_cnpjs(rng, n):
+    """CNPJs válidos (matriz 0001, dígitos verificadores pelo Módulo 11, como em transformer.validar_cnpjs)."""
+    raiz = rng.integers(0, 10, (n, 12))
+    raiz[:, 8:12] = [0, 0, 0, 1]
+
+    def digito(parte, pesos):
+        resto = (parte @ pesos) % 11
+        return np.where(resto < 2, 0, 11 - resto)
+
+    dv1 = digito(raiz, transformer.PESOS_DV1)
+    dv2 = digito(np.column_stack([raiz, dv1]), transformer.PESOS_DV2)
+    digitos = np.column_stack([raiz, dv1, dv2]).astype(np.uint8) + ord('0')
+    return [linha.tobytes().decode('ascii') for linha in digitos]
+
+def gerar_operadoras(escala=1, seed=42):
+    """DataFrame de operadoras: RegistroANS, CNPJ, RazaoSocial, UF."""
+    rng = np.random.default_rng(seed)
+    n = max(1, int(OPERADORAS_BASE * escala))
+    prefixos = rng.choice(PREFIXOS, n)
+    sufixos = rng.choice(SUFIXOS, n)
+    return pd.DataFrame({
+        'RegistroANS': pd.array([str(300000 + i) for i in range(n)], dtype='string'),
+        'CNPJ': pd.array(gerar_cnpjs(rng, n), dtype='string'),
+        # O número no fim garante nomes únicos (como na ANS, cada registro é uma empresa)
+        'RazaoSocial': pd.array([f"{p} {s} {i}" for i, (p, s) in enumerate(zip(prefixos, sufixos))], dtype='string'),
+        'UF': pd.array(rng.choice(UFS, n, p=PESOS_UF / PESOS_UF.sum()), dtype='string'),
+    })
+
+def gerar_enriquecido(escala=1, seed=42):
+    """Despesas no formato de despesas_enriquecidas (schema SCHEMA_ENRIQUECIDO)."""
+    rng = np.random.default_rng(seed)
+    ops = gerar_operadoras(escala, seed)
+    # Porte da operadora: algumas gigantes, muitas pequenas (lognormal)
+    porte = rng.lognormal(mean=11, sigma=1.5, size=len(ops))
+
+    partes = []
+    for ano, trimestre in TRIMESTRES:
+        idx = np.repeat(np.arange(len(ops)), LANCAMENTOS_POR_TRIMESTRE)
+        valores = porte[idx] * rng.lognormal(0, 0.4, len(idx))
+        parte = ops.iloc[idx].reset_index(drop=True)
+        parte['Ano'] = ano
+        parte['Trimestre'] = trimestre
+        parte['DESCRICAO'] = rng.choice(DESCRICOES, len(idx))
+        parte['ValorDespesas'] = np.round(valores, 2)
+        partes.append(parte)
+
+    df = pd.concat(partes, ignore_index=True)
+    return formats.apply_schema(df[list(formats.SCHEMA_ENRIQUECIDO)], formats.SCHEMA_ENRIQUECIDO)
+
+def apontar_para(pasta, raw_dir=None):
+    """
+    Faz as etapas lerem/gravarem na pasta do benchmark (não em data/processed).
+    :param raw_dir: Onde ficam os ZIPs e o Cadop baixado (padrão: <pasta>/raw).
+    """
+    raw_dir = raw_dir or os.path.join(pasta, "raw")
+    consolidator.RAW_DIR = raw_dir
+    consolidator.PROCESSED_DIR = pasta
+    consolidator.OUTPUT_FILE = os.path.join(pasta, "consolidado_despesas.csv")
+    transformer.RAW_DIR = raw_dir
+    transformer.PROCESSED_DIR = pasta
+    transformer.FILE_DESPESAS = consolidator.OUTPUT_FILE
+    transformer.FILE_ENRIQUECIDO = os.path.join(pasta, "despesas_enriquecidas.csv")
+    aggregator.INPUT_FILE = os.path.join(pasta, "despesas_enriquecidas.csv")
+    aggregator.OUTPUT_FILE = os.path.join(pasta, "agregado_operadoras.csv")
+    aggregator.CUBE_FILE = os.path.join(pasta, "cubo_trimestral.csv")
+    importer.FILE_DETALHADA = aggregator.INPUT_FILE
+    importer.FILE_OPERADORAS = aggregator.OUTPUT_FILE
+    importer.FILE_CUBO = aggregator.CUBE_FILE
+
+def seed_database(escala=1, seed=42, pasta=None, fmt='parquet'):
+    """
+    Gera os dados sintéticos e carrega no banco configurado (DB_*) pelo caminho normal:
+    aggregator (agregados + cubo) e importer (full refresh). Substitui os dados do banco!
+    :return: DataFrame de operadoras geradas (útil para montar termos de busca).
+    """
+    pasta = pasta or tempfile.mkdtemp(prefix="ans_bench_")
+    apontar_para(pasta)
+
+    print(f"🧪 Gerando dados sintéticos (escala {escala}) em {pasta}...")
+    df = gerar_enriquecido(escala, seed)
+    formats.write_table(df, aggregator.INPUT_FILE, formats.SCHEMA_ENRIQUECIDO, fmt, export_csv=False)
+    print(f"   {len(df)} lançamentos, {df['RegistroANS'].nunique()} operadoras")
+
+    aggregator.run_aggregation(fmt)
+    importer.load_data(full_refresh=True, fmt=fmt)
+    return gerar_operadoras(escala, seed)
+
+# --- Arquivos brutos da ANS (entrada do consolidator e do transformer) ---
+
+# Contas do plano contábil por operadora em cada trimestre; só LANCAMENTOS_POR_TRIMESTRE delas
+# são de eventos/sinistros (o consolidator descarta o resto)
+CONTAS_POR_OPERADORA = 600
+# Parte dos trimestres publicada em Excel em vez de CSV
+FRACAO_XLSX = 0.25
+# Operadoras presentes nas demonstrações mas não no Cadop (canceladas) e CNPJs com dígito errado no Cadop
+FRACAO_SEM_CADOP = 0.02
+FRACAO_CNPJ_INVALIDO = 0.02
+# Operadoras geradas por vez em cada arquivo (limita a memória da geração)
+BLOCO_OPERADORAS = 200
+
+# Mesmo layout do FTP da ANS (etl/fake_ans_server.py serve a pasta gerada)
+DIR_DEMONSTRACOES = "demonstracoes_contabeis"
+DIR_CADOP = "operadoras_de_plano_de_saude_ativas"
+ARQUIVO_CADOP = "Relatorio_cadop.csv"
+COLUNAS_DEMONSTRACOES = ['DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'DESCRICAO', 'VL_SALDO_FINAL']
+
+OUTRAS_CONTAS = [
+    ('11', 'DISPONÍVEL'),
+    ('12', 'CRÉDITOS DE OPERAÇÕES COM PLANOS DE ASSISTÊNCIA À SAÚDE'),
+    ('13', 'APLICAÇÕES FINANCEIRAS'),
+    ('21', 'PROVISÕES TÉCNICAS DE OPERAÇÕES DE ASSISTÊNCIA À SAÚDE'),
+    ('23', 'DÉBITOS DE OPERAÇÕES DE ASSISTÊNCIA À SAÚDE'),
+    ('25', 'PATRIMÔNIO LÍQUIDO'),
+    ('31', 'CONTRAPRESTAÇÕES EFETIVAS DE PLANO DE ASSISTÊNCIA À SAÚDE'),
+    ('43', 'DESPESAS DE COMERCIALIZAÇÃO'),
+    ('46', 'DESPESAS ADMINISTRATIVAS'),
+    ('61', 'TRIBUTOS DIRETOS DE OPERAÇÕES COM PLANOS DE ASSISTÊNCIA À SAÚDE'),
+]
+MODALIDADES = ['Cooperativa Médica', 'Medicina de Grupo', 'Seguradora Especializada em Saúde',
+               'Odontologia de Grupo', 'Autogestão', 'Filantropia', 'Administradora de Benefícios']
+
+def plano_de_contas(contas=CONTAS_POR_OPERADORA):
+    """(códigos, descrições) em ordem de código, como nos arquivos da ANS."""
+    eventos = min(contas, LANCAMENTOS_POR_TRIMESTRE)
+    plano = []
+    for i in range(contas):
+        if i < eventos:
+            grupo, descricao = '41', DESCRICOES[i % len(DESCRICOES)]
+        else:
+            grupo, descricao = OUTRAS_CONTAS[i % len(OUTRAS_CONTAS)]
+        plano.append((f"{grupo}{i:07d}", descricao))
+    plano.sort()
+    return np.array([c for c, _ in plano]), np.array([d for _, d in plano])
+
+def ultimos_trimestres(n, ultimo=TRIMESTRES[-1]):
+    """Os n trimestres terminando em 'ultimo', do mais antigo para o mais recente."""
+    ano, trimestre = ultimo
+    lista = []
+    for _ in range(n):
+        lista.append((ano, trimestre))
+        ano, trimestre = (ano, trimestre - 1) if trimestre > 1 else (ano - 1, 4)
+    return lista[::-1]
+
+def linhas_trimestre(registros, porte, ano, trimestre, codigos, descricoes, rng):
+    """Demonstração contábil de um bloco de operadoras: uma linha por operadora e conta."""
+    n = len(registros) * len(codigos)
+    valores = np.repeat(porte, len(codigos)) * rng.lognormal(0, 0.4, n)
+    return pd.DataFrame({
+        'DATA': f"{ano}-{3 * (trimestre - 1) + 1:02d}-01",
+        'REG_ANS': np.repeat(registros, len(codigos)),
+        'CD_CONTA_CONTABIL': np.tile(codigos, len(registros)),
+        'DESCRICAO': np.tile(descricoes, len(registros)),
+        'VL_SALDO_FINAL': np.round(valores, 2),
+    }, columns=COLUNAS_DEMONSTRACOES)
+
+def escrever_csv(z, nome, blocos):
+    """CSV da ANS: Latin-1, ';', tudo entre aspas e decimal ','."""
+    with io.TextIOWrapper(z.open(nome, 'w'), encoding='latin1', newline='') as texto:
+        for i, bloco in enumerate(blocos):
+            bloco.to_csv(texto, sep=';', decimal=',', float_format='%.2f', index=False,
+                         header=i == 0, quoting=csv.QUOTE_ALL)
+
+# Partes fixas de um .xlsx com uma planilha (o conteúdo vai em xl/worksheets/sheet1.xml)
+XLSX_ESTRUTURA = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Planilha1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'),
+}
+
+def celula_texto(serie):
+    return '<c t="inlineStr"><is><t>' + serie.map(escape) + '</t></is></c>'
+
+def escrever_xlsx(z, nome, blocos):
+    """
+    Planilha Excel com registro e valor numéricos. O XML da planilha é montado por bloco, com
+    operações vetorizadas: o openpyxl, célula a célula, levava ~1 min por trimestre na escala 1.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as xlsx:
+        for parte, conteudo in XLSX_ESTRUTURA.items():
+            xlsx.writestr(parte, conteudo)
+        with xlsx.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            cabecalho = ''.join(celula_texto(pd.Series(COLUNAS_DEMONSTRACOES)))
+            sheet.write(f'<row>{cabecalho}</row>'.encode('utf-8'))
+            for bloco in blocos:
+                linhas = ('<row>' + celula_texto(bloco['DATA'])
+                          + '<c><v>' + bloco['REG_ANS'].astype(str) + '</v></c>'
+                          + celula_texto(bloco['CD_CONTA_CONTABIL'])
+                          + celula_texto(bloco['DESCRICAO'])
+                          + '<c><v>' + bloco['VL_SALDO_FINAL'].map('{:.2f}'.format) + '</v></c></row>')
+                sheet.write(''.join(linhas).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+    z.writestr(nome, buffer.getvalue())
+
+def escrever_cadop(caminho, ops, rng):
+    """Cadastro de operadoras ativas (UTF-8, ';', entre aspas), com alguns CNPJs inválidos."""
+    cnpjs = ops['CNPJ'].astype(str).tolist()
+    for i in np.flatnonzero(rng.random(len(cnpjs)) < FRACAO_CNPJ_INVALIDO):
+        cnpjs[i] = cnpjs[i][:-1] + str((int(cnpjs[i][-1]) + 1) % 10)
+    pd.DataFrame({
+        'REGISTRO_OPERADORA': ops['RegistroANS'],
+        'CNPJ': cnpjs,
+        'Razao_Social': ops['RazaoSocial'],
+        'Modalidade': rng.choice(MODALIDADES, len(ops)),
+        'UF': ops['UF'],
+        'Data_Registro_ANS': pd.to_datetime('1999-01-01') + pd.to_timedelta(rng.integers(0, 9000, len(ops)), unit='D'),
+    }).to_csv(caminho, sep=';', index=False, encoding='utf-8', quoting=csv.QUOTE_ALL, date_format='%Y-%m-%d')
+
+def gerar_arquivos_ans(pasta, escala=1, trimestres=len(TRIMESTRES), seed=42,
+                       contas=CONTAS_POR_OPERADORA, fracao_xlsx=FRACAO_XLSX):
+    """
+    Grava em 'pasta' os arquivos brutos no layout do FTP da ANS:
+    demonstracoes_contabeis/<ano>/<t>T<ano>.zip (um CSV ou XLSX por trimestre) e
+    operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv.
+    :param trimestres: Quantos trimestres (os mais recentes até o último de TRIMESTRES).
+    :param fracao_xlsx: Parte dos trimestres (os mais antigos, espaçados) gravada em Excel.
+    :return: Resumo do que foi gerado (trimestres, linhas, bytes).
+    """
+    rng = np.random.default_rng(seed)
+    ops = gerar_operadoras(escala, seed)
+    extras = int(len(ops) * FRACAO_SEM_CADOP)
+    registros = np.array(ops['RegistroANS'].tolist() + [str(300000 + len(ops) + i) for i in range(extras)])
+    porte = rng.lognormal(mean=11, sigma=1.5, size=len(registros))
+    codigos, descricoes = plano_de_contas(contas)
+
+    lista = ultimos_trimestres(trimestres)
+    qtd_xlsx = int(round(len(lista) * fracao_xlsx))
+    em_excel = {lista[i] for i in np.linspace(0, len(lista) - 1, qtd_xlsx).astype(int)} if qtd_xlsx else set()
+
+    print(f"🧪 Gerando arquivos da ANS: {len(registros)} operadoras x {contas} contas x {len(lista)} trimestres em {pasta}...")
+    bytes_zip = 0
+    for ano, trimestre in lista:
+        nome = f"{trimestre}T{ano}"
+        pasta_ano = os.path.join(pasta, DIR_DEMONSTRACOES, str(ano))
+        os.makedirs(pasta_ano, exist_ok=True)
+        zip_path = os.path.join(pasta_ano, f"{nome}.zip")
+
+        blocos = (linhas_trimestre(registros[i:i + BLOCO_OPERADORAS], porte[i:i + BLOCO_OPERADORAS],
+                                   ano, trimestre, codigos, descricoes, rng)
+                  for i in range(0, len(registros), BLOCO_OPERADORAS))
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as z:
+            if (ano, trimestre) in em_excel:
+                escrever_xlsx(z, f"{nome}.xlsx", blocos)
+            else:
+                escrever_csv(z, f"{nome}.csv", blocos)
+        bytes_zip += os.path.getsize(zip_path)
+        print(f"   📦 {os.path.relpath(zip_path, pasta)} ({'xlsx' if (ano, trimestre) in em_excel else 'csv'})")
+
+    os.makedirs(os.path.join(pasta, DIR_CADOP), exist_ok=True)
+    escrever_cadop(os.path.join(pasta, DIR_CADOP, ARQUIVO_CADOP), ops, rng)
+
+    return {
+        'operadoras': len(registros),
+        'operadoras_sem_cadop': extras,
+        'contas_por_operadora': contas,
+        'trimestres': [f"{t}T{a}" for a, t in lista],
+        'trimestres_xlsx': [f"{t}T{a}" for a, t in lista if (a, t) in em_excel],
+        'linhas': len(registros) * contas * len(lista),
+        'linhas_eventos': len(registros) * min(contas, LANCAMENTOS_POR_TRIMESTRE) * len(lista),
+        'bytes_zip': bytes_zip,
+    }
+
+def simular_download(pasta, raw_dir):
+    """Copia os ZIPs gerados para raw_dir com os nomes que o scraper usa (<ano>_<t>T<ano>.zip)."""
+    os.makedirs(raw_dir, exist_ok=True)
+    raiz = os.path.join(pasta, DIR_DEMONSTRACOES)
+    for ano in sorted(os.listdir(raiz)):
+        for nome in sorted(os.listdir(os.path.join(raiz, ano))):
+            shutil.copyfile(os.path.join(raiz, ano, nome), os.path.join(raw_dir, f"{ano}_{nome}"))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dados sintéticos para benchmarks")
+    parser.add_argument("--escala", type=float, default=1, help="Múltiplo do volume atual (1, 10, 100...)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador (mesma semente = mesmos dados)")
+    parser.add_argument("--pasta", help="Onde gravar os arquivos (padrão: pasta temporária)")
+    parser.add_argument("--seed-db", action="store_true", help="Carrega no banco configurado em DB_* (substitui os dados)")
+    parser.add_argument("--ans", action="store_true", help="Gera os arquivos brutos (ZIPs trimestrais + Cadop)")
+    parser.add_argument("--trimestres", type=int, default=len(TRIMESTRES), help="Trimestres gerados (com --ans)")
+    parser.add_argument("--contas", type=int, default=CONTAS_POR_OPERADORA,
+                        help="Contas por operadora em cada trimestre (com --ans)")
+    parser.add_argument("--fracao-xlsx", type=float, default=FRACAO_XLSX,
+                        help="Parte dos trimestres gravada em Excel (com --ans)")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.ans:
+        pasta = args.pasta or tempfile.mkdtemp(prefix="ans_bench_")
+        resumo = gerar_arquivos_ans(pasta, args.escala, args.trimestres, args.seed, args.contas, args.fracao_xlsx)
+        print(f"📄 {resumo['linhas']} linhas em {len(resumo['trimestres'])} trimestres ({resumo['bytes_zip']} bytes)")
+    elif args.seed_db:
+        seed_database(args.escala, args.seed, args.pasta)
+    else:
+        pasta = args.pasta or tempfile.mkdtemp(prefix="ans_bench_")
+        apontar_para(pasta)
+        path = formats.write_table(gerar_enriquecido(args.escala, args.seed), aggregator.INPUT_FILE,
+                                   formats.SCHEMA_ENRIQUECIDO, 'parquet', export_csv=False)
+        print(f"📄 Arquivo gerado: {path}")
@@ -0,0 +1,20 @@
+import re
+import unicodedata
+import pandas as pd
+
+# Normalização usada na busca de operadoras por nome.
+# O importer grava a razão social já normalizada (coluna razao_social_busca) e a API
+# normaliza o termo buscado do mesmo jeito: "Saúde" e "SAUDE" viram "saude".
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e só letras/números separados por um espaço ("S.A." -> "s a")."""
+    # Nulo do pandas (pd.NA, NaN) também: str() daria "na"/"nan", que a busca acharia
+    if texto is None or (not isinstance(texto, str) and pd.isna(texto)):
+        return None
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', texto))
+
+def termos(busca):
+    """Palavras do termo buscado (todas precisam aparecer no nome)."""
+    return normalizar(busca).split() if busca else []
@@ -1,6 +1,15 @@
+import io
+import uuid
 import pandas as pd
 from sqlalchemy import create_engine, text
 import os
+import sys
+
+# Permite rodar este arquivo direto (python database/importer.py) e ainda achar o pacote 'etl'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import formats, aggregator
+from database import busca
 
 # Configurações do Banco
 # IMPORTANTE: No Docker, o host é 'db'. Localmente, é 'localhost'.
@@ -17,91 +26,554 @@ DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "../../data/processed")
 FILE_OPERADORAS = os.path.join(DATA_DIR, "agregado_operadoras.csv")
+FILE_CUBO = os.path.join(DATA_DIR, "cubo_trimestral.csv")
 FILE_DETALHADA = os.path.join(DATA_DIR, "despesas_enriquecidas.csv")
 
-def get_engine():
-    try:
-        return create_engine(DATABASE_URL)
-    except Exception as e:
-        print(f"❌ Erro ao conectar no banco: {e}")
-        return None
-
-def create_tables(engine):
-    print("🛠️  Verificando/Criando tabelas...")
-    sql_create = """
-    CREATE TABLE IF NOT EXISTS operadoras (
-        registro_ans TEXT PRIMARY KEY,
+# --- Estrutura das tabelas ---
+# As colunas ficam separadas das constraints/índices: na carga, as tabelas novas são criadas
+# "peladas" (COPY bem mais rápido) e as constraints/índices só são criados depois dos dados.
+TABLE_COLUMNS = {
+    'operadoras': """
+        registro_ans TEXT,
         cnpj TEXT,
         razao_social TEXT
-    );
-    CREATE TABLE IF NOT EXISTS despesas_detalhadas (
-        id SERIAL PRIMARY KEY,
-        registro_ans TEXT REFERENCES operadoras(registro_ans),
+    """,
+    'despesas_detalhadas': """
+        id SERIAL,
+        registro_ans TEXT,
         ano INT,
         trimestre INT,
         descricao TEXT,
         valor_despesa NUMERIC(15,2)
-    );
-    CREATE TABLE IF NOT EXISTS despesas_agregadas (
-        id SERIAL PRIMARY KEY,
+    """,
+    'despesas_agregadas': """
+        id SERIAL,
         razao_social TEXT,
         uf TEXT,
         total_despesas NUMERIC(15,2),
         media_trimestral NUMERIC(15,2),
-        desvio_padrao NUMERIC(15,2)
-    );
+        desvio_padrao NUMERIC(15,2),
+        razao_social_busca TEXT
+    """,
+    # Cubo trimestral do aggregator: 'nivel' diz se a linha é base (operadora_trimestre) ou subtotal
+    'cubo_despesas': """
+        id SERIAL,
+        nivel TEXT,
+        razao_social TEXT,
+        uf TEXT,
+        ano INT,
+        trimestre INT,
+        total_despesas NUMERIC(18,2),
+        qtd_lancamentos BIGINT,
+        qtd_operadoras INT,
+        media_trimestral NUMERIC(18,2),
+        media_por_operadora NUMERIC(18,2),
+        desvio_padrao NUMERIC(18,2),
+        -- Sem limite de magnitude: uma variação enorme (base pequena, troca de sinal) não derruba a carga
+        variacao_pct DOUBLE PRECISION
+    """,
+}
+
+# Tabelas pequenas, trocadas inteiras a cada carga (staging -> produção)
+SWAPPED_TABLES = ['despesas_agregadas', 'cubo_despesas']
+
+# Muda quando a estrutura das tabelas muda: entra nos parâmetros da etapa do pipeline (main.py),
+# então a próxima execução recarrega o banco mesmo sem arquivos novos
+SCHEMA_VERSION = 4
+
+# Partições de despesas_detalhadas: mesmas colunas, mas o id vem da sequência da tabela mãe
+PARTITION_COLUMNS = TABLE_COLUMNS['despesas_detalhadas'].replace(
+    "id SERIAL", "id INT NOT NULL DEFAULT nextval('despesas_detalhadas_id_seq')")
+
+# Controle da carga incremental: hash do conteúdo de cada trimestre carregado
+SQL_CARGAS = """
+    CREATE TABLE IF NOT EXISTS cargas_trimestres (
+        particao TEXT PRIMARY KEY,
+        ano INT,
+        trimestre INT,
+        hash TEXT,
+        linhas BIGINT,
+        carregado_em TIMESTAMP DEFAULT now()
+    )
+"""
+
+# Versão dos dados: muda a cada carga publicada. A API usa para invalidar o cache de respostas (ver api/cache.py)
+SQL_VERSAO = """
+    CREATE TABLE IF NOT EXISTS versao_dados (
+        id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        versao TEXT NOT NULL,
+        atualizado_em TIMESTAMP DEFAULT now()
+    )
+"""
+
+DETAIL_COLUMNS = ['registro_ans', 'ano', 'trimestre', 'descricao', 'valor_despesa']
+OPERADORAS_COLUMNS = ['registro_ans', 'cnpj', 'razao_social']
+AGREGADAS_COLUMNS = ['razao_social', 'uf', 'total_despesas', 'media_trimestral', 'desvio_padrao']
+CUBO_COLUMNS = ['nivel', 'razao_social', 'uf', 'ano', 'trimestre', 'total_despesas', 'qtd_lancamentos',
+                'qtd_operadoras', 'media_trimestral', 'media_por_operadora', 'desvio_padrao', 'variacao_pct']
+
+STAGING_SUFFIX = "_staging"
+NEW_SUFFIX = "_novo"
+
+# Partição que recebe linhas sem data válida (ano/trimestre nulos)
+DEFAULT_PARTITION = "despesas_detalhadas_sem_data"
+
+# Linhas enviadas por comando COPY (limita a memória do buffer CSV)
+COPY_CHUNK = int(os.getenv("IMPORTER_COPY_CHUNK", "100000"))
+
+def table_constraints(table, suffix="", trgm=False):
+    """
+    Constraints e índices das tabelas comuns (não particionadas), como (nome, SQL).
+    :param suffix: Sufixo do nome das tabelas/objetos (ex: "_staging").
+    :param trgm: Extensão pg_trgm disponível (índice de trigramas para a busca por nome).
+    """
+    t = lambda name: name + suffix
+    # Busca por trecho do nome (LIKE '%termo%'): só o índice de trigramas atende;
+    # sem pg_trgm, o btree ao menos atende busca por prefixo
+    busca_index = ("USING gin (razao_social_busca gin_trgm_ops)" if trgm
+                   else "(razao_social_busca text_pattern_ops)")
+    return {
+        'operadoras': [
+            (t('operadoras_pkey'), f"ALTER TABLE {t('operadoras')} ADD CONSTRAINT {t('operadoras_pkey')} PRIMARY KEY (registro_ans)"),
+        ],
+        'despesas_agregadas': [
+            (t('despesas_agregadas_pkey'), f"ALTER TABLE {t('despesas_agregadas')} ADD CONSTRAINT {t('despesas_agregadas_pkey')} PRIMARY KEY (id)"),
+            # Mesma ordem do ranking da API (/operadoras): paginação por cursor lê o índice direto
+            (t('idx_despesas_agregadas_total_id'), f"CREATE INDEX {t('idx_despesas_agregadas_total_id')} ON {t('despesas_agregadas')} (total_despesas DESC, id DESC)"),
+            (t('idx_despesas_agregadas_busca'), f"CREATE INDEX {t('idx_despesas_agregadas_busca')} ON {t('despesas_agregadas')} {busca_index}"),
+        ],
+        # Um índice por forma de consulta da API (/analises): sempre filtrando pelo nível
+        'cubo_despesas': [
+            (t('cubo_despesas_pkey'), f"ALTER TABLE {t('cubo_despesas')} ADD CONSTRAINT {t('cubo_despesas_pkey')} PRIMARY KEY (id)"),
+            (t('idx_cubo_periodo'), f"CREATE INDEX {t('idx_cubo_periodo')} ON {t('cubo_despesas')} (nivel, uf, ano, trimestre)"),
+            (t('idx_cubo_operadora'), f"CREATE INDEX {t('idx_cubo_operadora')} ON {t('cubo_despesas')} (nivel, razao_social, ano, trimestre)"),
+            (t('idx_cubo_desvio'), f"CREATE INDEX {t('idx_cubo_desvio')} ON {t('cubo_despesas')} (nivel, desvio_padrao DESC)"),
+            (t('idx_cubo_total'), f"CREATE INDEX {t('idx_cubo_total')} ON {t('cubo_despesas')} (nivel, total_despesas DESC)"),
+        ],
+    }[table]
+
+# --- Resumos do dashboard (materialized views) ---
+# Calculados uma vez por carga (dentro da publicação); a API só lê linhas prontas
+SUMMARY_VIEWS = {
+    # Total por operadora (Top 10 do dashboard)
+    'resumo_operadoras': """
+        SELECT o.registro_ans, o.razao_social, SUM(d.valor_despesa) AS total_despesas
+        FROM despesas_detalhadas d
+        JOIN operadoras o ON d.registro_ans = o.registro_ans
+        GROUP BY o.registro_ans, o.razao_social
+    """,
+    # Totais gerais (cards do topo do dashboard), sempre uma linha
+    'resumo_geral': """
+        SELECT
+            (SELECT SUM(valor_despesa) FROM despesas_detalhadas) AS total_gasto_geral,
+            (SELECT COUNT(*) FROM operadoras) AS total_operadoras_analisadas
+    """,
+    # Totais por ano
+    'resumo_anual': """
+        SELECT ano, SUM(valor_despesa) AS total_despesas, COUNT(*) AS qtd_lancamentos
+        FROM despesas_detalhadas
+        WHERE ano IS NOT NULL
+        GROUP BY ano
+    """,
+}
+
+SUMMARY_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_resumo_operadoras_registro ON resumo_operadoras (registro_ans)",
+    "CREATE INDEX IF NOT EXISTS idx_resumo_operadoras_total ON resumo_operadoras (total_despesas DESC)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_resumo_anual_ano ON resumo_anual (ano)",
+]
+
+def create_summaries(conn):
+    """Cria os resumos (e índices) que ainda não existem. Criados já com dados."""
+    for view, sql in SUMMARY_VIEWS.items():
+        conn.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS {sql}"))
+    for sql in SUMMARY_INDEXES:
+        conn.execute(text(sql))
+
+def refresh_summaries(conn):
+    """Recalcula os resumos. Chamado na mesma transação que publica os dados: resumo e detalhe nunca divergem."""
+    print("📊 Atualizando resumos do dashboard...")
+    create_summaries(conn)
+    for view in SUMMARY_VIEWS:
+        conn.execute(text(f"REFRESH MATERIALIZED VIEW {view}"))
+
+# --- Partições por trimestre ---
+
+def partition_name(ano, trimestre):
+    if ano is None or trimestre is None:
+        return DEFAULT_PARTITION
+    return f"despesas_detalhadas_{int(ano)}_t{int(trimestre)}"
+
+def partition_bounds(ano, trimestre):
+    """Cláusula do ATTACH PARTITION: um trimestre = faixa [(ano, t), (ano, t+1))."""
+    if ano is None or trimestre is None:
+        return "DEFAULT"
+    return f"FOR VALUES FROM ({int(ano)}, {int(trimestre)}) TO ({int(ano)}, {int(trimestre) + 1})"
+
+def partition_check(ano, trimestre):
+    """
+    CHECK equivalente ao limite da partição. Com ele o ATTACH não precisa varrer a tabela
+    para validar as linhas (o PostgreSQL prova pelo CHECK).
+    """
+    if ano is None or trimestre is None:
+        return "ano IS NULL OR trimestre IS NULL"
+    return f"ano IS NOT NULL AND trimestre IS NOT NULL AND ano = {int(ano)} AND trimestre = {int(trimestre)}"
+
+def create_detail_parent(conn):
+    """Tabela mãe particionada por (ano, trimestre): consultas com WHERE ano = X só leem as partições do ano."""
+    conn.execute(text(f"CREATE TABLE despesas_detalhadas ({TABLE_COLUMNS['despesas_detalhadas']}) "
+                      "PARTITION BY RANGE (ano, trimestre)"))
+    conn.execute(text("ALTER TABLE despesas_detalhadas ADD CONSTRAINT despesas_detalhadas_registro_ans_fkey "
+                      "FOREIGN KEY (registro_ans) REFERENCES operadoras(registro_ans)"))
+    # Índice particionado: cada partição tem o seu, criado antes do ATTACH
+    conn.execute(text("CREATE INDEX idx_despesas_detalhadas_registro_ans ON despesas_detalhadas (registro_ans)"))
+
+def relkind(conn, table):
+    """'p' = particionada, 'r' = tabela comum, None = não existe."""
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}).scalar()
+
+def enable_trgm(conn):
+    """Tenta habilitar pg_trgm (vem no contrib do PostgreSQL). Devolve se está disponível."""
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        return True
+    except Exception as e:
+        print(f"⚠️ pg_trgm indisponível, busca por nome sem índice de trigramas: {e.__class__.__name__}")
+        return False
+
+def has_trgm(conn):
+    return conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() is not None
+
+def get_engine():
+    try:
+        return create_engine(DATABASE_URL)
+    except Exception as e:
+        print(f"❌ Erro ao conectar no banco: {e}")
+        return None
+
+def create_tables(engine):
+    """Cria as tabelas (com constraints e índices) se ainda não existirem. Usado na 1ª execução e pela API."""
+    print("🛠️  Verificando/Criando tabelas...")
+    with engine.begin() as conn:
+        trgm = enable_trgm(conn)
+        for table in ['operadoras'] + SWAPPED_TABLES:
+            if relkind(conn, table):
+                continue
+            conn.execute(text(f"CREATE TABLE {table} ({TABLE_COLUMNS[table]})"))
+            for _, sql in table_constraints(table, trgm=trgm):
+                conn.execute(text(sql))
+
+        # Uma despesas_detalhadas antiga (não particionada) é convertida na publicação, sem deixar a API sem dados
+        if not relkind(conn, 'despesas_detalhadas'):
+            create_detail_parent(conn)
+
+        conn.execute(text(SQL_CARGAS))
+        conn.execute(text(SQL_VERSAO))
+        create_summaries(conn)
+
+def copy_dataframe(cursor, df, table, columns):
+    """
+    Envia o DataFrame para a tabela com COPY FROM STDIN (formato CSV), em blocos de COPY_CHUNK linhas.
+    Muito mais rápido que INSERT (to_sql): o PostgreSQL lê o fluxo direto, sem um comando por linha.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    for start in range(0, len(df), COPY_CHUNK):
+        buffer = io.StringIO()
+        df.iloc[start:start + COPY_CHUNK].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+    return len(df)
+
+def read_sources(fmt):
+    """Lê os arquivos do pipeline e devolve {tabela: DataFrame} só do que existir (colunas já com nomes do banco)."""
+    sources = {}
+
+    # 1. Operadoras e Despesas
+    if os.path.exists(formats.resolve(FILE_DETALHADA, fmt)):
+        print("📥 Lendo Despesas Detalhadas...")
+        # Tipos vêm do schema: registro_ans chega como texto (sem virar 123.0)
+        df_det = formats.read_table(FILE_DETALHADA, formats.SCHEMA_ENRIQUECIDO, fmt)
+
+        # A. Operadoras
+        df_ops = df_det[['RegistroANS', 'CNPJ', 'RazaoSocial']].drop_duplicates('RegistroANS')
+        df_ops.columns = OPERADORAS_COLUMNS
+        sources['operadoras'] = df_ops
+
+        # B. Despesas
+        df_desp = df_det[['RegistroANS', 'Ano', 'Trimestre', 'DESCRICAO', 'ValorDespesas']]
+        df_desp.columns = DETAIL_COLUMNS
+        sources['despesas_detalhadas'] = df_desp
+
+    # 2. Agregados
+    if os.path.exists(formats.resolve(FILE_OPERADORAS, fmt)):
+        print("📥 Lendo Dados Agregados...")
+        df_agg = formats.read_table(FILE_OPERADORAS, formats.SCHEMA_AGREGADO, fmt)
+        df_agg.columns = AGREGADAS_COLUMNS
+        # Nome normalizado para a busca da API (sem acentos/pontuação, minúsculas)
+        df_agg['razao_social_busca'] = df_agg['razao_social'].map(busca.normalizar)
+        sources['despesas_agregadas'] = df_agg
+
+    # 3. Cubo trimestral
+    if os.path.exists(formats.resolve(FILE_CUBO, fmt)):
+        print("📥 Lendo Cubo Trimestral...")
+        df_cubo = formats.read_table(FILE_CUBO, formats.SCHEMA_CUBO, fmt)
+        df_cubo.columns = CUBO_COLUMNS
+        sources['cubo_despesas'] = df_cubo
+
+    return sources
+
+def split_quarters(df):
+    """Divide as despesas por trimestre: {nome_partição: (ano, trimestre, DataFrame, hash do conteúdo)}."""
+    quarters = {}
+    for (ano, trimestre), group in df.groupby(['ano', 'trimestre'], dropna=False, sort=True):
+        ano = None if pd.isna(ano) else int(ano)
+        trimestre = None if pd.isna(trimestre) else int(trimestre)
+        # Hash independente da ordem das linhas: soma dos hashes de cada linha (+ quantidade)
+        digest = f"{int(pd.util.hash_pandas_object(group, index=False).sum()):x}-{len(group)}"
+        quarters[partition_name(ano, trimestre)] = (ano, trimestre, group, digest)
+    return quarters
+
+def plan_quarters(engine, quarters, full_refresh):
+    """
+    Decide o que fazer com cada trimestre comparando com o que já foi carregado.
+    :return: (trimestres a (re)carregar, partições a remover)
+    """
+    with engine.connect() as conn:
+        partitioned = relkind(conn, 'despesas_detalhadas') == 'p'
+        loaded = dict(conn.execute(text("SELECT particao, hash FROM cargas_trimestres")).fetchall()) if partitioned else {}
+
+    if full_refresh or not partitioned:
+        to_load = list(quarters)
+    else:
+        to_load = [name for name, (_, _, _, digest) in quarters.items() if loaded.get(name) != digest]
+
+    # Só o full_refresh apaga trimestres que sumiram dos arquivos; o incremental preserva o histórico
+    to_drop = [name for name in loaded if name not in quarters] if full_refresh else []
+    return to_load, to_drop
+
+# Colunas do nível base do cubo (operadora x UF x trimestre): a entrada do agregado e do cubo
+BASE_CUBO_COLUMNS = ['razao_social', 'uf', 'ano', 'trimestre', 'total_despesas', 'qtd_lancamentos']
+
+def retained_quarter_totals(engine, quarters):
+    """
+    Carga incremental: totais por operadora/trimestre (nível base do cubo em uso) dos trimestres já
+    carregados que não estão nos arquivos. Eles continuam em despesas_detalhadas. DataFrame vazio se não há nenhum.
     """
     with engine.connect() as conn:
-        conn.execute(text(sql_create))
-        conn.commit()
+        if relkind(conn, 'despesas_detalhadas') != 'p' or not relkind(conn, 'cubo_despesas'):
+            return pd.DataFrame(columns=BASE_CUBO_COLUMNS)
+        loaded = conn.execute(text(
+            "SELECT particao, ano, trimestre FROM cargas_trimestres WHERE ano IS NOT NULL AND trimestre IS NOT NULL"
+        )).fetchall()
+        retained = [(int(ano), int(trimestre)) for particao, ano, trimestre in loaded if particao not in quarters]
+        if not retained:
+            return pd.DataFrame(columns=BASE_CUBO_COLUMNS)
+
+        print(f"📅 Trimestres mantidos no banco (fora dos arquivos): {', '.join(f'{t}T{a}' for a, t in sorted(retained))}")
+        return pd.read_sql(text(f"""
+            SELECT razao_social, uf, ano, trimestre, total_despesas::float8 AS total_despesas, qtd_lancamentos
+            FROM cubo_despesas
+            WHERE nivel = :nivel AND (ano, trimestre) IN ({', '.join(f'({a}, {t})' for a, t in retained)})
+        """), conn, params={"nivel": aggregator.NIVEL_OPERADORA_TRIMESTRE})
 
-def load_data(full_refresh=True):
+def merge_retained_quarters(sources, retidos):
+    """
+    Refaz agregado e cubo juntando os totais trimestrais dos arquivos (nível base do cubo) com os
+    dos trimestres mantidos no banco, com as mesmas contas do aggregator. Sem isso, na carga
+    incremental o detalhe e os resumos teriam trimestres que o agregado e o cubo não têm.
+    Obs: os totais trimestrais saem do cubo já arredondados em centavos (diferença de no máximo meio
+    centavo por trimestre em relação ao aggregator, só quando há trimestres mantidos).
+    """
+    if retidos.empty or 'cubo_despesas' not in sources:
+        return sources
+    cubo = sources['cubo_despesas']
+    base = cubo.loc[cubo['nivel'] == aggregator.NIVEL_OPERADORA_TRIMESTRE, BASE_CUBO_COLUMNS]
+    trimestral = pd.concat([base, retidos[BASE_CUBO_COLUMNS]], ignore_index=True)
+    trimestral.columns = aggregator.CHAVES_TRIMESTRE + ['TotalDespesas', 'QtdLancamentos']
+
+    cube = aggregator.build_cube(trimestral)
+    cube.columns = CUBO_COLUMNS
+
+    df_agg = aggregator.estatisticas_operadoras(trimestral.rename(columns={'TotalDespesas': 'ValorDespesas'}))
+    df_agg = aggregator.formatar_agregado(df_agg)
+    df_agg.columns = AGREGADAS_COLUMNS
+    df_agg['razao_social_busca'] = df_agg['razao_social'].map(busca.normalizar)
+
+    return {**sources, 'cubo_despesas': cube, 'despesas_agregadas': df_agg}
+
+def stage_quarter(conn, cursor, name, ano, trimestre, df):
+    """Carrega um trimestre em uma tabela avulsa (<partição>_novo), com índice e CHECK prontos para o ATTACH."""
+    novo = name + NEW_SUFFIX
+    conn.execute(text(f"DROP TABLE IF EXISTS {novo}"))
+    conn.execute(text(f"CREATE TABLE {novo} ({PARTITION_COLUMNS})"))
+    copy_dataframe(cursor, df, novo, DETAIL_COLUMNS)
+    conn.execute(text(f"CREATE INDEX {novo}_registro_ans_idx ON {novo} (registro_ans)"))
+    conn.execute(text(f"ALTER TABLE {novo} ADD CONSTRAINT {novo}_limites CHECK ({partition_check(ano, trimestre)})"))
+    conn.execute(text(f"ANALYZE {novo}"))
+
+def load_staging(engine, sources, quarters, to_load):
+    """
+    Prepara tudo fora das tabelas em uso pela API:
+    - operadoras_staging e as tabelas trocadas inteiras (COPY, depois constraints/índices)
+    - uma tabela avulsa por trimestre novo/alterado
+    """
+    with engine.begin() as conn:
+        cursor = conn.connection.dbapi_connection.cursor()
+        trgm = has_trgm(conn)
+
+        for table in ['operadoras'] + SWAPPED_TABLES:
+            staging = table + STAGING_SUFFIX
+            conn.execute(text(f"DROP TABLE IF EXISTS {staging} CASCADE"))
+            conn.execute(text(f"CREATE TABLE {staging} ({TABLE_COLUMNS[table]})"))
+            if table in sources:
+                df = sources[table]
+                print(f"   🚚 {table}: {copy_dataframe(cursor, df, staging, list(df.columns))} linhas (COPY)")
+            for _, sql in table_constraints(table, STAGING_SUFFIX, trgm):
+                conn.execute(text(sql))
+            conn.execute(text(f"ANALYZE {staging}"))
+
+        for name in to_load:
+            ano, trimestre, df, _ = quarters[name]
+            stage_quarter(conn, cursor, name, ano, trimestre, df)
+            print(f"   🚚 {name}: {len(df)} linhas (COPY)")
+
+def swap_table(conn, table):
+    """Troca a tabela em uso pela de staging (constraints/índices/sequência voltam aos nomes oficiais)."""
+    conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+    conn.execute(text(f"ALTER TABLE {table}{STAGING_SUFFIX} RENAME TO {table}"))
+    for name, sql in table_constraints(table, STAGING_SUFFIX):
+        canonical = name[:-len(STAGING_SUFFIX)]
+        if sql.startswith("CREATE INDEX"):
+            conn.execute(text(f"ALTER INDEX {name} RENAME TO {canonical}"))
+        else:
+            conn.execute(text(f"ALTER TABLE {table} RENAME CONSTRAINT {name} TO {canonical}"))
+    # A sequência do SERIAL também (a antiga foi removida junto com a tabela antiga)
+    if 'id SERIAL' in TABLE_COLUMNS[table]:
+        seq = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+        conn.execute(text(f"ALTER SEQUENCE {seq} RENAME TO {table}_id_seq"))
+
+def drop_partition(conn, name):
+    if relkind(conn, name):
+        conn.execute(text(f"ALTER TABLE despesas_detalhadas DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+
+def attach_quarter(conn, name, ano, trimestre, digest, linhas):
+    """Substitui a partição do trimestre pela tabela <partição>_novo já carregada."""
+    novo = name + NEW_SUFFIX
+    drop_partition(conn, name)
+    conn.execute(text(f"ALTER TABLE {novo} RENAME TO {name}"))
+    conn.execute(text(f"ALTER INDEX {novo}_registro_ans_idx RENAME TO {name}_registro_ans_idx"))
+    conn.execute(text(f"ALTER TABLE despesas_detalhadas ATTACH PARTITION {name} {partition_bounds(ano, trimestre)}"))
+    if name == DEFAULT_PARTITION:
+        # Na partição DEFAULT o CHECK fica: evita varrer ela a cada novo trimestre anexado
+        conn.execute(text(f"ALTER TABLE {name} RENAME CONSTRAINT {novo}_limites TO {name}_limites"))
+    else:
+        conn.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {novo}_limites"))
+    conn.execute(text("""
+        INSERT INTO cargas_trimestres (particao, ano, trimestre, hash, linhas, carregado_em)
+        VALUES (:p, :a, :t, :h, :l, now())
+        ON CONFLICT (particao) DO UPDATE
+        SET hash = EXCLUDED.hash, linhas = EXCLUDED.linhas, carregado_em = EXCLUDED.carregado_em
+    """), {"p": name, "a": ano, "t": trimestre, "h": digest, "l": linhas})
+
+def stamp_version(conn):
+    """Grava uma nova versão dos dados. Quem cacheia respostas (API) compara com a versão que guardou."""
+    versao = uuid.uuid4().hex
+    conn.execute(text(SQL_VERSAO))
+    conn.execute(text("""
+        INSERT INTO versao_dados (id, versao, atualizado_em) VALUES (1, :v, now())
+        ON CONFLICT (id) DO UPDATE SET versao = EXCLUDED.versao, atualizado_em = EXCLUDED.atualizado_em
+    """), {"v": versao})
+    return versao
+
+def publish(engine, sources, quarters, to_load, to_drop, full_refresh):
+    """
+    Publica a carga em uma única transação: quem lê (API) vê os dados antigos até o COMMIT
+    e os novos logo depois, nunca tabelas vazias ou trimestres pela metade.
+    """
+    print("🔀 Publicando (staging -> produção)...")
+    with engine.begin() as conn:
+        if relkind(conn, 'despesas_detalhadas') != 'p':
+            # Migração: tabela antiga, não particionada (todos os trimestres foram preparados)
+            print("   🧱 Convertendo despesas_detalhadas para tabela particionada...")
+            conn.execute(text("DROP TABLE despesas_detalhadas CASCADE"))
+            conn.execute(text("DELETE FROM cargas_trimestres"))
+            create_detail_parent(conn)
+
+        # 1. Operadoras: upsert (a tabela não é trocada porque as partições apontam para ela)
+        if 'operadoras' in sources:
+            conn.execute(text(f"""
+                INSERT INTO operadoras ({', '.join(OPERADORAS_COLUMNS)})
+                SELECT {', '.join(OPERADORAS_COLUMNS)} FROM operadoras{STAGING_SUFFIX}
+                ON CONFLICT (registro_ans) DO UPDATE
+                SET cnpj = EXCLUDED.cnpj, razao_social = EXCLUDED.razao_social
+            """))
+
+        # 2. Trimestres: troca só as partições novas/alteradas
+        for name in to_drop:
+            print(f"   🗑️  Removendo {name}")
+            drop_partition(conn, name)
+            conn.execute(text("DELETE FROM cargas_trimestres WHERE particao = :p"), {"p": name})
+        for name in to_load:
+            ano, trimestre, df, digest = quarters[name]
+            attach_quarter(conn, name, ano, trimestre, digest, len(df))
+
+        if full_refresh and 'operadoras' in sources:
+            # Operadoras que sumiram do arquivo e não têm mais despesas
+            conn.execute(text(f"""
+                DELETE FROM operadoras o
+                WHERE NOT EXISTS (SELECT 1 FROM operadoras{STAGING_SUFFIX} s WHERE s.registro_ans = o.registro_ans)
+                  AND NOT EXISTS (SELECT 1 FROM despesas_detalhadas d WHERE d.registro_ans = o.registro_ans)
+            """))
+        conn.execute(text(f"DROP TABLE IF EXISTS operadoras{STAGING_SUFFIX}"))
+
+        # 3. Agregados e cubo: tabelas pequenas, troca inteira
+        for table in SWAPPED_TABLES:
+            if table in sources:
+                swap_table(conn, table)
+            else:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table}{STAGING_SUFFIX}"))
+
+        # 4. Resumos do dashboard (uma vez por carga)
+        refresh_summaries(conn)
+
+        # 5. Nova versão dos dados: visível junto com os dados (mesmo COMMIT)
+        stamp_version(conn)
+
+def load_data(full_refresh=True, fmt=formats.FORMAT):
     """
     Carrega dados para o banco.
-    :param full_refresh: Se True, limpa as tabelas antes de inserir.
+    :param full_refresh: Se True, recarrega todos os trimestres (e remove os que sumiram dos arquivos).
+                         Se False, só os trimestres novos ou com conteúdo diferente do já carregado.
+    :param fmt: Formato dos arquivos intermediários ("csv" ou "parquet").
+    :return: False se não conseguiu conectar no banco.
     """
     print(f"--- 🐘 Iniciando Carga (Modo Full Refresh: {full_refresh}) ---")
     
     engine = get_engine()
-    if not engine: return
+    if not engine: return False
 
     create_tables(engine)
 
-    # Limpeza (Truncate)
-    if full_refresh:
-        print("🧹 Limpando tabelas antigas...")
-        with engine.connect() as conn:
-            conn.execute(text("TRUNCATE operadoras, despesas_detalhadas, despesas_agregadas CASCADE;"))
-            conn.commit()
-
-    # 1. Carga de Operadoras e Despesas
-    if os.path.exists(FILE_DETALHADA):
-        print("📥 Carregando Despesas Detalhadas...")
-        # Lendo com encoding UTF-8 (padrão do Python ao salvar)
-        df_det = pd.read_csv(FILE_DETALHADA, sep=';', decimal=',')
-        
-        # A. Operadoras
-        df_ops = df_det[['RegistroANS', 'CNPJ', 'RazaoSocial']].drop_duplicates('RegistroANS').copy()
-        df_ops.columns = ['registro_ans', 'cnpj', 'razao_social']
-        try:
-            df_ops.to_sql('operadoras', engine, if_exists='append', index=False, method='multi', chunksize=1000)
-        except Exception:
-            pass # Se já existe, ignora (em full_refresh não deve acontecer)
+    sources = read_sources(fmt)
+    if not sources:
+        # Sem arquivos não há o que trocar: as tabelas atuais continuam servindo a API
+        print("⚠️ Nenhum arquivo para carregar. Banco mantido como está.")
+        return
 
-        # B. Despesas
-        df_desp = df_det[['RegistroANS', 'Ano', 'Trimestre', 'DESCRICAO', 'ValorDespesas']].copy()
-        df_desp.columns = ['registro_ans', 'ano', 'trimestre', 'descricao', 'valor_despesa']
-        df_desp.to_sql('despesas_detalhadas', engine, if_exists='append', index=False, chunksize=1000)
-    
-    # 2. Carga de Agregados
-    if os.path.exists(FILE_OPERADORAS):
-        print("📥 Carregando Dados Agregados...")
-        df_agg = pd.read_csv(FILE_OPERADORAS, sep=';', decimal=',')
-        df_agg.columns = ['razao_social', 'uf', 'total_despesas', 'media_trimestral', 'desvio_padrao']
-        df_agg.to_sql('despesas_agregadas', engine, if_exists='append', index=False)
+    quarters = split_quarters(sources['despesas_detalhadas']) if 'despesas_detalhadas' in sources else {}
+    to_load, to_drop = plan_quarters(engine, quarters, full_refresh)
+    print(f"📅 Trimestres: {len(quarters)} no arquivo, {len(to_load)} para carregar, "
+          f"{len(quarters) - len(to_load)} sem mudanças, {len(to_drop)} para remover")
+    if not full_refresh:
+        # O incremental nunca remove trimestres: agregado e cubo passam a cobrir também os que ficaram no banco
+        sources = merge_retained_quarters(sources, retained_quarter_totals(engine, quarters))
+
+    load_staging(engine, sources, quarters, to_load)
+    publish(engine, sources, quarters, to_load, to_drop, full_refresh)
 
     print("🏁 Carga concluída com sucesso.")
 
 if __name__ == "__main__":
     load_data(full_refresh=True)
-
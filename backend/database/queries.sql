@@ -48,4 +48,11 @@ SELECT
 FROM despesas_agregadas
 WHERE desvio_padrao > 0
 ORDER BY desvio_padrao DESC
-LIMIT 10;
\ No newline at end of file
+LIMIT 10;
+-- 5. AS MESMAS ANÁLISES PELO CUBO TRIMESTRAL (cubo_despesas)
+-- Objetivo: Responder sem varrer despesas_detalhadas. Gerado pelo aggregator, com subtotais por nível:
+-- operadora_trimestre, uf_trimestre, trimestre, operadora e uf. A API usa estas consultas em /analises/*.
+SELECT ano, trimestre, total_despesas, qtd_lancamentos, variacao_pct
+FROM cubo_despesas
+WHERE nivel = 'trimestre'
+ORDER BY ano, trimestre;
@@ -1,23 +1,232 @@
 import pandas as pd
+import numpy as np
 import os
+import sys
+
+# Permite rodar este arquivo direto (python etl/aggregator.py) e ainda achar o pacote 'etl'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import formats
 
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "../../data")
 INPUT_FILE = os.path.join(DATA_DIR, "processed/despesas_enriquecidas.csv")
 OUTPUT_FILE = os.path.join(DATA_DIR, "processed/agregado_operadoras.csv")
+CUBE_FILE = os.path.join(DATA_DIR, "processed/cubo_trimestral.csv")
 
-def run_aggregation():
-    print("--- 📊 Iniciando Agregação Estatística (Tarefa 2.3) ---")
-    
-    if not os.path.exists(INPUT_FILE):
-        print("❌ Erro: Arquivo enriquecido não encontrado. Rode o transformer.py antes.")
-        return
+# Só estas colunas entram na conta (no parquet as outras nem são lidas)
+COLS_AGREGACAO = ['RazaoSocial', 'UF', 'Ano', 'Trimestre', 'ValorDespesas']
+CHAVES_TRIMESTRE = ['RazaoSocial', 'UF', 'Ano', 'Trimestre']
+CHAVES_OPERADORA = ['RazaoSocial', 'UF']
+
+# Linhas lidas por vez no modo streaming (a memória passa a depender do número de grupos, não de linhas)
+CHUNK_SIZE = int(os.getenv("AGGREGATOR_CHUNK_SIZE", "200000"))
+
+# Níveis do cubo: linha base e subtotais (do mais detalhado para o mais geral)
+NIVEL_OPERADORA_TRIMESTRE = 'operadora_trimestre'
+NIVEL_UF_TRIMESTRE = 'uf_trimestre'
+NIVEL_TRIMESTRE = 'trimestre'
+NIVEL_OPERADORA = 'operadora'
+NIVEL_UF = 'uf'
+
+# Base mínima (em R$, em módulo) do trimestre anterior para calcular a variação: sobre uma base de centavos
+# (ou logo depois de um estorno) o percentual explode e não diz nada. Abaixo dela a variação fica nula.
+VARIACAO_BASE_MINIMA = float(os.getenv("AGGREGATOR_VARIACAO_BASE_MINIMA", "1.00"))
+
+def variacao_pct(df, grupo):
+    """Variação (%) do total em relação ao trimestre anterior disponível do mesmo grupo."""
+    df = df.sort_values(grupo + ['Ano', 'Trimestre'])
+    anterior = df.groupby(grupo)['TotalDespesas'].shift() if grupo else df['TotalDespesas'].shift()
+    # Trimestre anterior zerado (ou quase) não tem variação percentual
+    base = anterior.where(anterior.abs() >= VARIACAO_BASE_MINIMA)
+    df['VariacaoPct'] = ((df['TotalDespesas'] - anterior) / base * 100)
+    return df
+
+def build_cube(df_trimestral):
+    """
+    Monta o cubo a partir dos totais por operadora/UF/trimestre: a linha base mais os subtotais
+    por UF/trimestre, por trimestre, por operadora (média e desvio entre trimestres) e por UF.
+    A API responde as análises lendo só o nível que precisa, sem varrer as despesas detalhadas.
+    """
+    base = df_trimestral.copy()
+    base['QtdOperadoras'] = 1
+    base = variacao_pct(base, ['RazaoSocial', 'UF'])
+    base['Nivel'] = NIVEL_OPERADORA_TRIMESTRE
+
+    somas = {'TotalDespesas': 'sum', 'QtdLancamentos': 'sum', 'QtdOperadoras': 'sum'}
+
+    uf_trimestre = base.groupby(['UF', 'Ano', 'Trimestre']).agg(somas).reset_index()
+    uf_trimestre = variacao_pct(uf_trimestre, ['UF'])
+    uf_trimestre['Nivel'] = NIVEL_UF_TRIMESTRE
+
+    trimestre = base.groupby(['Ano', 'Trimestre']).agg(somas).reset_index()
+    trimestre = variacao_pct(trimestre, [])
+    trimestre['Nivel'] = NIVEL_TRIMESTRE
+
+    # Mesma conta do agregado_operadoras (desvio de operadora com um trimestre só = 0)
+    operadora = base.groupby(['RazaoSocial', 'UF']).agg(
+        TotalDespesas=('TotalDespesas', 'sum'),
+        QtdLancamentos=('QtdLancamentos', 'sum'),
+        MediaTrimestral=('TotalDespesas', 'mean'),
+        DesvioPadrao=('TotalDespesas', 'std'),
+    ).reset_index()
+    operadora['DesvioPadrao'] = operadora['DesvioPadrao'].fillna(0.0)
+    operadora['QtdOperadoras'] = 1
+    operadora['Nivel'] = NIVEL_OPERADORA
+
+    uf = operadora.groupby('UF').agg(
+        TotalDespesas=('TotalDespesas', 'sum'),
+        QtdLancamentos=('QtdLancamentos', 'sum'),
+        QtdOperadoras=('QtdOperadoras', 'sum'),
+    ).reset_index()
+    uf['MediaPorOperadora'] = uf['TotalDespesas'] / uf['QtdOperadoras']
+    uf['Nivel'] = NIVEL_UF
+
+    cube = pd.concat([base, uf_trimestre, trimestre, operadora, uf], ignore_index=True)
+    cube = cube.reindex(columns=list(formats.SCHEMA_CUBO))
+    cols_numericas = ['TotalDespesas', 'MediaTrimestral', 'MediaPorOperadora', 'DesvioPadrao', 'VariacaoPct']
+    cube[cols_numericas] = cube[cols_numericas].round(2)
+    return cube
+
+# --- Modo streaming ---
+
+class TotaisTrimestrais:
+    """
+    Totais por operadora/UF/trimestre acumulados bloco a bloco (memória proporcional ao número de grupos).
+    Cada grupo guarda a soma e a compensação da soma de Kahan, o mesmo algoritmo do groupby().sum()
+    do pandas, aplicado na mesma ordem das linhas: o total sai idêntico, bit a bit, ao do modo em
+    memória (somar parciais de cada bloco mudaria o último bit e, nos arredondamentos que caem
+    exatamente em meio centavo, o valor gravado).
+    """
+
+    def __init__(self):
+        self.grupos = None
+        self.soma = np.zeros(0)
+        self.compensacao = np.zeros(0)
+        self.quantidade = np.zeros(0, dtype=np.int64)
 
+    def codigos(self, chaves):
+        """Posição de cada linha nos arrays de estado (grupos novos entram no fim)."""
+        if self.grupos is None:
+            self.grupos = chaves[:0]
+        codigos = self.grupos.get_indexer(chaves)
+        novos = codigos < 0
+        if novos.any():
+            extras = chaves[novos].unique()
+            self.grupos = self.grupos.append(extras)
+            self.soma = np.concatenate([self.soma, np.zeros(len(extras))])
+            self.compensacao = np.concatenate([self.compensacao, np.zeros(len(extras))])
+            self.quantidade = np.concatenate([self.quantidade, np.zeros(len(extras), dtype=np.int64)])
+            codigos[novos] = self.grupos.get_indexer(chaves[novos])
+        return codigos
+
+    def add(self, df):
+        # Chave nula fica de fora, como no groupby do modo em memória
+        df = df.dropna(subset=CHAVES_TRIMESTRE)
+        if df.empty:
+            return
+        valores = pd.to_numeric(df['ValorDespesas'], errors='coerce').fillna(0).to_numpy('float64')
+        codigos = self.codigos(pd.MultiIndex.from_frame(df[CHAVES_TRIMESTRE]))
+        self.quantidade += np.bincount(codigos, minlength=len(self.quantidade))
+
+        # Uma rodada por posição da linha dentro do seu grupo: cada grupo aparece no máximo uma vez
+        # por rodada, então o passo de Kahan é vetorizado e a ordem das linhas do grupo é mantida
+        posicao = pd.Series(codigos).groupby(codigos).cumcount().to_numpy()
+        ordem = np.argsort(posicao, kind='stable')
+        limites = np.searchsorted(posicao[ordem], np.arange(posicao.max() + 2))
+        for inicio, fim in zip(limites[:-1], limites[1:]):
+            linhas = ordem[inicio:fim]
+            g = codigos[linhas]
+            y = valores[linhas] - self.compensacao[g]
+            t = self.soma[g] + y
+            self.compensacao[g] = t - self.soma[g] - y
+            self.soma[g] = t
+
+    def to_frame(self):
+        """Mesmo DataFrame (colunas, tipos e ordem) do groupby do modo em memória."""
+        if self.grupos is None:
+            return pd.DataFrame(columns=CHAVES_TRIMESTRE + ['ValorDespesas', 'QtdLancamentos'])
+        df = self.grupos.to_frame(index=False)
+        df['ValorDespesas'] = self.soma
+        df['QtdLancamentos'] = self.quantidade
+        return df.sort_values(CHAVES_TRIMESTRE, ignore_index=True)
+
+def totais_trimestrais_streaming(fmt, chunksize=CHUNK_SIZE):
+    """Lê o arquivo enriquecido em blocos e devolve os totais por operadora/UF/trimestre."""
+    totais = TotaisTrimestrais()
+    for bloco in formats.iter_table(INPUT_FILE, formats.SCHEMA_ENRIQUECIDO, fmt, columns=COLS_AGREGACAO,
+                                    chunksize=chunksize):
+        totais.add(bloco)
+    return totais.to_frame()
+
+# Acumuladores de média/desvio mescláveis: por grupo, (n, soma, compensação da soma, média, M2),
+# com M2 = soma dos quadrados dos desvios em relação à média. Dois acumuladores se juntam sem rever
+# as observações (Chan et al.), então partes calculadas separadamente (trimestres, workers) se
+# combinam no fim. Juntando uma observação por vez, as contas são as do pandas (Welford no std,
+# Kahan na soma) e o resultado é idêntico ao do groupby.
+
+def momentos(valores, chaves):
+    """Acumulador de um lote de observações (média do grupo, depois M2)."""
+    grupos = valores.groupby(chaves)
+    desvios = valores - grupos.transform('mean')
+    return pd.DataFrame({
+        'n': grupos.size(),
+        'soma': grupos.sum(),
+        'compensacao': 0.0,
+        'media': grupos.mean(),
+        'm2': (desvios ** 2).groupby(chaves).sum(),
+    })
+
+def combinar_momentos(a, b):
+    """Junta dois acumuladores (grupos que só aparecem em um deles passam como estão)."""
+    if a is None:
+        return b
+    a, b = a.align(b, join='outer', fill_value=0)
+    n = a['n'] + b['n']
+    delta = b['media'] - a['media']
+    media = a['media'] + delta * b['n'] / n
+    # Chan (lote com várias observações) ou Welford (uma observação: mesma conta do pandas)
+    m2 = np.where(b['n'] == 1,
+                  a['m2'] + (b['media'] - media) * delta,
+                  a['m2'] + b['m2'] + delta ** 2 * a['n'] * b['n'] / n)
+    y = b['soma'] - (a['compensacao'] + b['compensacao'])
+    soma = a['soma'] + y
+    return pd.DataFrame({
+        'n': n,
+        'soma': soma,
+        'compensacao': soma - a['soma'] - y,
+        'media': media,
+        'm2': m2,
+    }, index=a.index)
+
+def estatisticas_operadoras(df_trimestral):
+    """
+    Total, média e desvio padrão (amostral) dos totais trimestrais de cada operadora, juntando um
+    trimestre por vez. Desvio de operadora com um trimestre só fica NaN (zerado depois, como antes).
+    """
+    acumulado = None
+    for _, trimestre in df_trimestral.groupby(['Ano', 'Trimestre']):
+        valores = trimestre.set_index(CHAVES_OPERADORA)['ValorDespesas']
+        acumulado = combinar_momentos(acumulado, momentos(valores, CHAVES_OPERADORA))
+
+    if acumulado is None:
+        return pd.DataFrame(columns=CHAVES_OPERADORA + ['TotalDespesas', 'MediaTrimestral', 'DesvioPadrao'])
+    acumulado = acumulado.sort_index()
+    n = acumulado['n']
+    return pd.DataFrame({
+        'TotalDespesas': acumulado['soma'],
+        # soma / n, como o mean() do modo em memória
+        'MediaTrimestral': acumulado['soma'] / n,
+        'DesvioPadrao': np.sqrt(acumulado['m2'] / (n - 1)).where(n > 1),
+    }).reset_index()
+
+def agregar_em_memoria(fmt):
+    """Modo original: lê o arquivo inteiro e faz os dois groupby. :return: (df_trimestral, df_final)"""
     # 1. Carregamento
     print("📖 Lendo dados enriquecidos...")
-    # Importante: decimal=',' pois salvamos assim no passo anterior
-    df = pd.read_csv(INPUT_FILE, sep=';', decimal=',')
+    # O schema explícito cuida de decimal=',' (csv) e dos tipos de cada coluna
+    df = formats.read_table(INPUT_FILE, formats.SCHEMA_ENRIQUECIDO, fmt, columns=COLS_AGREGACAO)
     
     # Garante que ValorDespesas é numérico
     df['ValorDespesas'] = pd.to_numeric(df['ValorDespesas'], errors='coerce').fillna(0)
@@ -25,7 +234,9 @@ def run_aggregation():
     # 2. Agrupamento Intermediário (Por Trimestre)
     # Primeiro somamos quanto cada empresa gastou EM CADA trimestre/ano
     print("🧮 Calculando totais por trimestre...")
-    df_trimestral = df.groupby(['RazaoSocial', 'UF', 'Ano', 'Trimestre'])['ValorDespesas'].sum().reset_index()
+    df_trimestral = df.groupby(['RazaoSocial', 'UF', 'Ano', 'Trimestre'])['ValorDespesas'].agg(
+        ['sum', 'size']).reset_index()
+    df_trimestral.columns = ['RazaoSocial', 'UF', 'Ano', 'Trimestre', 'ValorDespesas', 'QtdLancamentos']
     
     # 3. Agregação Final (Estatísticas por Operadora)
     # Agora calculamos a média e desvio padrão baseados nos trimestres
@@ -36,11 +247,13 @@ def run_aggregation():
         MediaTrimestral='mean',
         DesvioPadrao='std'
     ).reset_index()
+    return df_trimestral, df_final
 
+def formatar_agregado(df_final):
+    """Tratamento de nulos, arredondamento e ordenação do agregado por operadora (também usado pelo importer)."""
     # 4. Tratamento de Nulos (Trade-off acordado)
     # Se a empresa só tem dados de 1 trimestre, o desvio padrão é NaN.
     # Decisão: Substituir por 0.0
-    nulos_antes = df_final['DesvioPadrao'].isna().sum()
     df_final['DesvioPadrao'] = df_final['DesvioPadrao'].fillna(0.0)
     
     # 5. Formatação e Ordenação
@@ -50,13 +263,44 @@ def run_aggregation():
     
     # Ordenar pelas que mais gastaram (Fica mais bonito no relatório)
     df_final.sort_values(by='TotalDespesas', ascending=False, inplace=True)
+    return df_final
+
+def run_aggregation(fmt=formats.FORMAT, streaming=False, chunksize=CHUNK_SIZE):
+    """
+    :param streaming: Lê o arquivo em blocos e acumula só os totais por grupo (memória proporcional ao
+        número de operadoras/trimestres, não de lançamentos). O resultado é o mesmo do modo em memória.
+    :return: False se o arquivo enriquecido não existe.
+    """
+    print(f"--- 📊 Iniciando Agregação Estatística (Tarefa 2.3) (Streaming: {streaming}) ---")
+    
+    if not os.path.exists(formats.resolve(INPUT_FILE, fmt)):
+        print("❌ Erro: Arquivo enriquecido não encontrado. Rode o transformer.py antes.")
+        return False
+
+    if streaming:
+        print(f"📖 Lendo dados enriquecidos em blocos de {chunksize} linhas...")
+        df_trimestral = totais_trimestrais_streaming(fmt, chunksize)
+
+        print("📉 Calculando estatísticas finais (Média e Desvio Padrão) com acumuladores...")
+        df_final = estatisticas_operadoras(df_trimestral)
+    else:
+        df_trimestral, df_final = agregar_em_memoria(fmt)
+
+    nulos_antes = df_final['DesvioPadrao'].isna().sum()
+    df_final = formatar_agregado(df_final)
 
     # 6. Salvamento
-    df_final.to_csv(OUTPUT_FILE, index=False, sep=';', decimal=',')
+    output_path = formats.write_table(df_final, OUTPUT_FILE, formats.SCHEMA_AGREGADO, fmt)
+
+    # 7. Cubo trimestral (análises da API)
+    print("🧊 Montando cubo trimestral (operadora x UF x ano x trimestre + subtotais)...")
+    cube = build_cube(df_trimestral.rename(columns={'ValorDespesas': 'TotalDespesas'}))
+    cube_path = formats.write_table(cube, CUBE_FILE, formats.SCHEMA_CUBO, fmt)
     
     print("-" * 30)
     print(f"✅ Agregação Concluída!")
-    print(f"📄 Arquivo gerado: {OUTPUT_FILE}")
+    print(f"📄 Arquivo gerado: {output_path}")
+    print(f"🧊 Cubo gerado: {cube_path} ({len(cube)} linhas)")
     print(f"📊 Total de Operadoras Agrupadas: {len(df_final)}")
     print(f"🛠️  Desvios Padrão corrigidos (NaN -> 0): {nulos_antes}")
     
@@ -1,79 +1,169 @@
 import os
+import sys
+import shutil
+import tempfile
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import re
 
+# Permite rodar este arquivo direto (python etl/consolidator.py) e ainda achar o pacote 'etl'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import formats, readers, xlsx_reader
+from etl.formats import TableWriter
+
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RAW_DIR = os.path.join(BASE_DIR, "../../data/raw")
 PROCESSED_DIR = os.path.join(BASE_DIR, "../../data/processed")
+OUTPUT_FILE = os.path.join(PROCESSED_DIR, "consolidado_despesas.csv")
 
 # Termos para filtrar "Despesas com Eventos/Sinistros"
 # A classe 4 no plano de contas da ANS geralmente é despesa assistencial
 TERMOS_FILTRO = ["EVENTO", "SINISTRO"]
 
+# Colunas obrigatórias na fonte e colunas que vão para o consolidado
+REQUIRED_COLS = ['DATA', 'REG_ANS', 'DESCRICAO', 'VL_SALDO_FINAL']
+COLS_FINAL = list(formats.SCHEMA_CONSOLIDADO)
+
+# Linhas lidas por vez no modo streaming (controla o pico de memória)
+CHUNK_SIZE = int(os.getenv("CONSOLIDATOR_CHUNK_SIZE", "100000"))
+
+# Processos usados no modo paralelo (1 = serial)
+WORKERS = int(os.getenv("CONSOLIDATOR_WORKERS", "1"))
+
 def setup_directories():
     if not os.path.exists(PROCESSED_DIR):
         os.makedirs(PROCESSED_DIR)
 
-def process_file_content(f, filename, file_ext):
-    """Lê o arquivo (CSV ou Excel) e retorna um DataFrame filtrado"""
-    try:
-        # Define parâmetros de leitura baseados na nossa inspeção
-        # A ANS usa pt-br: decimal com vírgula, milhar com ponto
-        if 'csv' in file_ext or 'txt' in file_ext:
-            df = pd.read_csv(f, sep=';', encoding='latin1', thousands='.', decimal=',')
-        else: # Excel
-            df = pd.read_excel(f)
-
-        # Normaliza nomes de colunas (tudo maiúsculo para evitar erro 'Descricao' vs 'DESCRICAO')
-        df.columns = [c.upper().strip() for c in df.columns]
-
-        # Verifica se tem as colunas essenciais
-        required_cols = ['DATA', 'REG_ANS', 'DESCRICAO', 'VL_SALDO_FINAL']
-        if not all(col in df.columns for col in required_cols):
-            return None
-
-        # --- FILTRO 1: Linhas que contenham EVENTO ou SINISTRO na descrição ---
+def is_required_col(col):
+    """Projeção: só as colunas de REQUIRED_COLS são lidas do arquivo (as demais nem são decodificadas)."""
+    return str(col).upper().strip() in REQUIRED_COLS
+
+def match_descricoes(descricoes, cache):
+    """
+    Aplica o regex EVENTO/SINISTRO uma vez por descrição distinta (não uma vez por linha).
+    O cache (descrição -> bool) é reaproveitado entre os blocos do mesmo arquivo, já que o
+    plano de contas se repete em todas as operadoras.
+    :return: máscara booleana alinhada com 'descricoes'.
+    """
+    novas = pd.Series(descricoes.dropna().unique())
+    novas = novas[~novas.isin(list(cache))]
+    if not novas.empty:
         # Regex: Procura qualquer um dos termos ignorando maiúsculas/minúsculas
         regex_termo = '|'.join(TERMOS_FILTRO)
-        df_filtered = df[df['DESCRICAO'].str.contains(regex_termo, case=False, na=False)].copy()
-
-        # Se sobrou dado, adiciona metadados
-        if not df_filtered.empty:
-            # Extrai Ano e Trimestre da coluna DATA (formato YYYY-MM-DD ou similar)
-            df_filtered['DATA'] = pd.to_datetime(df_filtered['DATA'], errors='coerce')
-            df_filtered['Ano'] = df_filtered['DATA'].dt.year
-            df_filtered['Trimestre'] = df_filtered['DATA'].dt.quarter
-            
-            # Nota: Usamos REG_ANS temporariamente pois não temos CNPJ ainda
-            df_filtered.rename(columns={
-                'REG_ANS': 'RegistroANS', 
-                'VL_SALDO_FINAL': 'ValorDespesas'
-            }, inplace=True)
-            
-            # Seleciona apenas o que interessa
-            cols_final = ['RegistroANS', 'Ano', 'Trimestre', 'DESCRICAO', 'ValorDespesas']
-            return df_filtered[cols_final]
-            
+        cache.update(zip(novas, novas.str.contains(regex_termo, case=False, na=False, regex=True)))
+    aceitas = [d for d, ok in cache.items() if ok]
+    return descricoes.isin(aceitas).to_numpy()
+
+def parse_valor(serie):
+    """Converte VL_SALDO_FINAL no padrão pt-br (milhar '.', decimal ',') para float. Excel já vem numérico."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64')
+    texto = serie.astype('string').str.strip().str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    valores = pd.to_numeric(texto, errors='coerce')
+    if serie.dtype == object:
+        # Coluna mista (Excel com células numéricas e de texto): número fica como está ("-10.5" sem o
+        # ponto viraria -105). Sem isso o resultado dependeria de quais linhas caem no mesmo bloco.
+        numero = serie.map(lambda v: pd.api.types.is_number(v) and not isinstance(v, bool)).to_numpy(bool)
+        if numero.any():
+            valores[numero] = serie[numero].astype('float64')
+    return valores
+
+def filter_despesas(df, cache=None):
+    """
+    Aplica o filtro EVENTO/SINISTRO e adiciona Ano/Trimestre. Retorna None se nada sobrar.
+    Filtra primeiro e converte depois: valor, registro e data só são convertidos nas linhas que sobram.
+    """
+    # Normaliza nomes de colunas (tudo maiúsculo para evitar erro 'Descricao' vs 'DESCRICAO')
+    df.columns = [c.upper().strip() for c in df.columns]
+
+    # --- FILTRO 1: Linhas que contenham EVENTO ou SINISTRO na descrição ---
+    mask = match_descricoes(df['DESCRICAO'], cache if cache is not None else {})
+    if not mask.any():
+        return None
+    df_filtered = df.loc[mask, REQUIRED_COLS].copy()
+
+    # Extrai Ano e Trimestre da coluna DATA (formato YYYY-MM-DD ou similar)
+    # Int64 (inteiro com nulos) mantém "2024" no CSV mesmo quando algum bloco tem data inválida
+    df_filtered['DATA'] = pd.to_datetime(df_filtered['DATA'], errors='coerce')
+    df_filtered['Ano'] = df_filtered['DATA'].dt.year.astype('Int64')
+    df_filtered['Trimestre'] = df_filtered['DATA'].dt.quarter.astype('Int64')
+
+    # REG_ANS é código numérico: "005711" e "5711" são a mesma operadora
+    df_filtered['REG_ANS'] = pd.to_numeric(df_filtered['REG_ANS'], errors='coerce').astype('Int64')
+    df_filtered['VL_SALDO_FINAL'] = parse_valor(df_filtered['VL_SALDO_FINAL'])
+
+    # Nota: Usamos REG_ANS temporariamente pois não temos CNPJ ainda
+    df_filtered.rename(columns={
+        'REG_ANS': 'RegistroANS',
+        'VL_SALDO_FINAL': 'ValorDespesas'
+    }, inplace=True)
+
+    # Seleciona apenas o que interessa
+    return df_filtered[COLS_FINAL]
+
+def iter_file_chunks(f, file_ext, chunksize=CHUNK_SIZE, key=None):
+    """
+    Lê o arquivo (CSV ou Excel) em blocos e devolve (yield) só as linhas filtradas.
+    Com chunksize=None o arquivo é lido de uma vez (um único bloco).
+    Só as colunas obrigatórias são lidas, todas como texto: a conversão de números e datas
+    fica para depois do filtro (a maior parte das linhas é descartada).
+    :param key: Chave do cache de dialetos (readers.member_key), para não detectar de novo o mesmo arquivo.
+    """
+    # Define parâmetros de leitura baseados na nossa inspeção
+    # A ANS usa pt-br: decimal com vírgula, milhar com ponto (convertido em parse_valor)
+    if 'csv' in file_ext or 'txt' in file_ext:
+        # Encoding e separador detectados no início do arquivo (etl/readers.py)
+        reader = readers.read_csv(f, key=key, usecols=is_required_col, dtype=str, chunksize=chunksize)
+        if chunksize is None:
+            reader = [reader]
+    elif file_ext == 'xlsx':
+        reader = iter_excel_chunks(f, chunksize)
+    else: # .xls (formato antigo, não tem leitura em blocos, vem inteiro)
+        reader = [pd.read_excel(f, usecols=is_required_col)]
+
+    cache = {}
+    for df in reader:
+        # Verifica se tem as colunas essenciais (se o 1º bloco não tem, nenhum terá)
+        columns = [c.upper().strip() for c in df.columns]
+        if not all(col in columns for col in REQUIRED_COLS):
+            return
+
+        df_filtered = filter_despesas(df, cache)
+        if df_filtered is not None:
+            yield df_filtered
+
+def iter_excel_chunks(f, chunksize=CHUNK_SIZE):
+    """
+    Lê a planilha em streaming (etl/xlsx_reader.py): o filtro EVENTO/SINISTRO é aplicado linha a linha
+    e só as linhas aceitas viram DataFrame, em blocos de até 'chunksize' linhas (None = um bloco só).
+    Memória e tempo ficam próximos aos do mesmo trimestre em CSV.
+    """
+    for linhas in xlsx_reader.iter_rows(f, REQUIRED_COLS, 'DESCRICAO', TERMOS_FILTRO,
+                                        normalize=lambda c: str(c).upper().strip(), date_columns=['DATA'],
+                                        batch_size=chunksize):
+        yield pd.DataFrame(linhas, columns=REQUIRED_COLS)
+
+def process_file_content(f, filename, file_ext, key=None):
+    """Lê o arquivo (CSV ou Excel) e retorna um DataFrame filtrado"""
+    try:
+        parts = list(iter_file_chunks(f, file_ext, chunksize=None, key=key))
+        if parts:
+            return parts[0]
         return None
 
     except Exception as e:
         print(f"   ❌ Erro ao processar {filename}: {e}")
         return None
 
-def consolidate_data():
-    setup_directories()
-    print("--- 🚀 Iniciando Consolidação de Dados ---")
-    
-    all_data = []
-    
-    zip_files = [f for f in os.listdir(RAW_DIR) if f.endswith('.zip')]
-    
+def iter_members(zip_files):
+    """Percorre os ZIPs e devolve (nome_zip, nome_arquivo, extensão) dos arquivos de dados"""
     for zip_name in zip_files:
         print(f"📦 Processando: {zip_name}")
         zip_path = os.path.join(RAW_DIR, zip_name)
-        
+
         try:
             with zipfile.ZipFile(zip_path, 'r') as z:
                 for file in z.namelist():
@@ -81,19 +171,150 @@ def consolidate_data():
                     ext = file.split('.')[-1].lower()
                     if ext not in ['csv', 'txt', 'xlsx', 'xls']:
                         continue
-                        
-                    print(f"   📄 Lendo: {file}")
-                    with z.open(file) as f:
-                        df_part = process_file_content(f, file, ext)
-                        if df_part is not None:
-                            print(f"      ✅ Dados extraídos: {len(df_part)} linhas")
-                            all_data.append(df_part)
-                        else:
-                            print(f"      ⚠️ Ignorado (Sem colunas ou dados relevantes)")
-                            
+                    yield z, file, ext
+
         except Exception as e:
             print(f"❌ Erro crítico no zip {zip_name}: {e}")
 
+def stream_to_sink(zip_files, sink, chunksize=CHUNK_SIZE, fmt=formats.FORMAT):
+    """
+    Modo streaming: lê cada arquivo em blocos e já grava as linhas filtradas no destino.
+    Só um bloco fica em memória por vez, independente de quantos ZIPs existam.
+    :param sink: caminho do arquivo de saída ou objeto de arquivo (texto, só no formato csv) já aberto.
+    :return: total de linhas gravadas.
+    """
+    with TableWriter(sink, formats.SCHEMA_CONSOLIDADO, fmt) as writer:
+        for z, file, ext in iter_members(zip_files):
+            print(f"   📄 Lendo: {file}")
+            linhas, erro = write_member(z, file, ext, writer, chunksize=chunksize)
+            if erro:
+                # Blocos anteriores ao erro já foram gravados (não dá para "desgravar" no streaming)
+                print(f"   ❌ Erro ao processar {file}: {erro}")
+            report_member(linhas)
+
+    return writer.rows
+
+def write_member(z, file, ext, writer, chunksize=CHUNK_SIZE):
+    """
+    Grava no TableWriter as linhas filtradas de um arquivo do ZIP (o writer cuida do cabeçalho).
+    :return: (linhas gravadas, mensagem de erro ou None)
+    """
+    linhas = 0
+    try:
+        with z.open(file) as f:
+            for chunk in iter_file_chunks(f, ext, chunksize=chunksize, key=readers.member_key(z, file)):
+                writer.write(chunk)
+                linhas += len(chunk)
+    except Exception as e:
+        return linhas, str(e)
+    return linhas, None
+
+def report_member(linhas):
+    if linhas:
+        print(f"      ✅ Dados extraídos: {linhas} linhas")
+    else:
+        print(f"      ⚠️ Ignorado (Sem colunas ou dados relevantes)")
+
+def process_member_to_part(zip_path, file, ext, part_path, chunksize=CHUNK_SIZE, fmt=formats.FORMAT):
+    """Executado no processo filho: consolida um único arquivo do ZIP em um arquivo parcial (sem cabeçalho)."""
+    with zipfile.ZipFile(zip_path, 'r') as z, \
+            TableWriter(part_path, formats.SCHEMA_CONSOLIDADO, fmt, header=False) as writer:
+        return write_member(z, file, ext, writer, chunksize=chunksize)
+
+def parallel_to_sink(zip_files, sink, workers=WORKERS, chunksize=CHUNK_SIZE, fmt=formats.FORMAT):
+    """
+    Modo paralelo: distribui os arquivos de cada ZIP entre processos filhos.
+    Cada filho grava um arquivo parcial em disco; o pai junta as partes na mesma ordem do
+    modo serial (ZIPs em ordem alfabética, arquivos na ordem do ZIP), então o resultado é idêntico.
+    :return: total de linhas gravadas.
+    """
+    tasks = [(z.filename, file, ext) for z, file, ext in iter_members(zip_files)]
+    parts_dir = tempfile.mkdtemp(prefix="consolidacao_", dir=PROCESSED_DIR)
+
+    try:
+        with TableWriter(sink, formats.SCHEMA_CONSOLIDADO, fmt) as writer, \
+                ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(process_member_to_part, zip_path, file, ext,
+                                os.path.join(parts_dir, f"part_{i:06d}"), chunksize, fmt)
+                for i, (zip_path, file, ext) in enumerate(tasks)
+            ]
+
+            # Junta na ordem das tarefas (não na ordem de término) para manter o resultado determinístico
+            for i, ((zip_path, file, ext), future) in enumerate(zip(tasks, futures)):
+                linhas, erro = future.result()
+                print(f"   📄 {os.path.basename(zip_path)} -> {file}")
+                if erro:
+                    print(f"   ❌ Erro ao processar {file}: {erro}")
+                report_member(linhas)
+
+                part_path = formats.resolve(os.path.join(parts_dir, f"part_{i:06d}"), fmt)
+                writer.append_part(part_path, linhas)
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    return writer.rows
+
+def describe_output(output_path, fmt):
+    if isinstance(output_path, (str, os.PathLike)):
+        return formats.resolve(output_path, fmt)
+    return getattr(output_path, 'name', output_path)
+
+def export_csv(output_path, fmt):
+    """No formato parquet, gera também o CSV se PIPELINE_EXPORT_CSV=1."""
+    if fmt != 'csv' and formats.EXPORT_CSV and isinstance(output_path, (str, os.PathLike)):
+        print(f"📤 Exportando CSV: {formats.export_to_csv(output_path, formats.SCHEMA_CONSOLIDADO, fmt)}")
+
+def consolidate_data(streaming=False, output_path=OUTPUT_FILE, chunksize=CHUNK_SIZE, workers=WORKERS,
+                     fmt=formats.FORMAT):
+    """
+    Consolida os arquivos contábeis de data/raw em um único arquivo (CSV ou Parquet).
+    :param streaming: Se True, lê em blocos e grava direto no destino (memória constante).
+    :param output_path: Arquivo (ou objeto de arquivo, só em csv) de saída. A extensão segue o formato.
+    :param workers: Processos em paralelo. Com mais de 1, usa o modo paralelo (que também é streaming).
+    :param fmt: Formato intermediário ("csv" ou "parquet"), ver etl/formats.py.
+    :return: False se nenhum dado foi consolidado.
+    """
+    setup_directories()
+    print(f"--- 🚀 Iniciando Consolidação de Dados (Streaming: {streaming}, Workers: {workers}, Formato: {fmt}) ---")
+
+    # Ordem fixa: o resultado não depende da ordem em que o sistema lista os arquivos
+    zip_files = sorted(f for f in os.listdir(RAW_DIR) if f.endswith('.zip'))
+
+    if streaming or workers > 1:
+        if workers > 1:
+            total = parallel_to_sink(zip_files, output_path, workers, chunksize, fmt)
+        else:
+            total = stream_to_sink(zip_files, output_path, chunksize, fmt)
+        if total:
+            export_csv(output_path, fmt)
+            print("-" * 30)
+            print(f"✅ SUCESSO! Arquivo gerado: {describe_output(output_path, fmt)}")
+            print(f"📊 Total de Registros: {total}")
+        else:
+            print("❌ Nenhum dado foi consolidado.")
+            return False
+        return
+
+    all_data = []
+
+    for z, file, ext in iter_members(zip_files):
+        print(f"   📄 Lendo: {file}")
+        try:
+            with z.open(file) as f:
+                df_part = process_file_content(f, file, ext, key=readers.member_key(z, file))
+        except Exception as e:
+            print(f"   ❌ Erro ao processar {file}: {e}")
+            df_part = None
+
+        if df_part is not None:
+            print(f"      ✅ Dados extraídos: {len(df_part)} linhas")
+            all_data.append(df_part)
+        else:
+            print(f"      ⚠️ Ignorado (Sem colunas ou dados relevantes)")
+
     # Consolidação Final
     if all_data:
         df_final = pd.concat(all_data, ignore_index=True)
@@ -103,15 +324,17 @@ def consolidate_data():
         # Vamos assumir que queremos o valor absoluto para análise, ou mantemos original.
         # Por enquanto, mantemos original.
         
-        output_csv = os.path.join(PROCESSED_DIR, "consolidado_despesas.csv")
-        df_final.to_csv(output_csv, index=False, sep=';', decimal=',')
+        with TableWriter(output_path, formats.SCHEMA_CONSOLIDADO, fmt) as writer:
+            writer.write(df_final)
+        export_csv(output_path, fmt)
         
         print("-" * 30)
-        print(f"✅ SUCESSO! Arquivo gerado: {output_csv}")
+        print(f"✅ SUCESSO! Arquivo gerado: {describe_output(output_path, fmt)}")
         print(f"📊 Total de Registros: {len(df_final)}")
         print(f"⚠️ Nota: As colunas CNPJ e RazaoSocial não constam na fonte. Usamos 'RegistroANS'.")
     else:
         print("❌ Nenhum dado foi consolidado.")
+        return False
 
 if __name__ == "__main__":
     consolidate_data()
\ No newline at end of file
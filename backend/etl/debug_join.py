@@ -1,5 +1,10 @@
-import pandas as pd
 import os
+import sys
+
+# Permite rodar este arquivo direto (python etl/debug_join.py) e ainda achar o pacote 'etl'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import readers
 
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,7 +17,7 @@ def debug_keys():
     # 1. Analisa Despesas (Lado Esquerdo do Join)
     print(f"\n1. ARQUIVO DESPESAS ({FILE_DESPESAS})")
     try:
-        df_desp = pd.read_csv(FILE_DESPESAS, sep=';', decimal=',')
+        df_desp = readers.read_csv(FILE_DESPESAS, decimal=',')
         print(f"   Colunas encontradas: {list(df_desp.columns)}")
         if 'RegistroANS' in df_desp.columns:
             exemplo = df_desp['RegistroANS'].iloc[0]
@@ -26,8 +31,8 @@ def debug_keys():
     # 2. Analisa Cadop (Lado Direito do Join)
     print(f"\n2. ARQUIVO CADOP ({FILE_CADOP})")
     try:
-        # Tenta ler como o transformer leu
-        df_cadop = pd.read_csv(FILE_CADOP, sep=';', encoding='latin1', dtype=str)
+        # Lê como o transformer lê (encoding e separador detectados)
+        df_cadop = readers.read_csv(FILE_CADOP, dtype=str)
         
         # Limpa nomes das colunas para facilitar leitura
         df_cadop.columns = [c.strip().upper() for c in df_cadop.columns]
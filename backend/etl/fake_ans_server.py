@@ -0,0 +1,175 @@
+"""
+Servidor HTTP local que imita as páginas de índice do FTP da ANS (dadosabertos.ans.gov.br/FTP/PDA).
+Serve uma pasta local com listagens no estilo Apache e suporta ETag, Last-Modified,
+If-None-Match/If-Modified-Since (304) e Range/If-Range (206), como o servidor real.
+Arquivos que não são ZIP (o CSV do Cadop) vão com gzip quando o cliente aceita (Accept-Encoding).
+
+Uso:
+    python etl/fake_ans_server.py <pasta> [porta]
+    ANS_BASE_URL=http://localhost:8089/demonstracoes_contabeis/ python main.py
+"""
+
+import os
+import sys
+import gzip
+import html
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+def file_etag(path):
+    stat = os.stat(path)
+    return '"' + hashlib.md5(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest() + '"'
+
+def gzip_etag(etag):
+    """Validador da versão comprimida (outra codificação, outro ETag forte)."""
+    return etag[:-1] + '-gzip"'
+
+def accepts_gzip(accept_encoding):
+    """Accept-Encoding inclui gzip (com q > 0)?"""
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        if coding.strip().lower() == 'gzip':
+            q = params.strip().partition('=')[2]
+            try:
+                return float(q) > 0 if q else True
+            except ValueError:
+                return False
+    return False
+
+def make_handler(root):
+    class FakeANSHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.handle_request(send_body=False)
+
+        def do_GET(self):
+            self.handle_request(send_body=True)
+
+        def handle_request(self, send_body):
+            path = os.path.normpath(os.path.join(root, unquote(self.path.split('?')[0]).lstrip('/')))
+            if not path.startswith(os.path.abspath(root)) or not os.path.exists(path):
+                self.send_error(404)
+                return
+            if os.path.isdir(path):
+                self.send_listing(path, send_body)
+            else:
+                self.send_file(path, send_body)
+
+        def send_listing(self, path, send_body):
+            items = []
+            for name in sorted(os.listdir(path)):
+                href = name + '/' if os.path.isdir(os.path.join(path, name)) else name
+                items.append(f'<tr><td><a href="{html.escape(href)}">{html.escape(href)}</a></td></tr>')
+            body = (f"<html><head><title>Index of {html.escape(self.path)}</title></head><body>"
+                    f"<h1>Index of {html.escape(self.path)}</h1><table>"
+                    f'<tr><td><a href="../">Parent Directory</a></td></tr>{"".join(items)}'
+                    "</table></body></html>").encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def not_modified(self, etag, mtime):
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match:
+                return etag in [t.strip() for t in if_none_match.split(',')]
+            if_modified_since = self.headers.get('If-Modified-Since')
+            if if_modified_since:
+                try:
+                    return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def send_file(self, path, send_body):
+            size = os.path.getsize(path)
+            mtime = os.path.getmtime(path)
+            etag = file_etag(path)
+            last_modified = formatdate(mtime, usegmt=True)
+
+            if self.not_modified(etag, mtime) or self.not_modified(gzip_etag(etag), mtime):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            range_header = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            use_range = range_header and range_header.startswith('bytes=') and (
+                not if_range or if_range in (etag, last_modified))
+
+            if not use_range and not path.lower().endswith('.zip') and accepts_gzip(self.headers.get('Accept-Encoding')):
+                self.send_gzip(path, gzip_etag(etag), last_modified, send_body)
+                return
+
+            if use_range:
+                first, _, last = range_header[len('bytes='):].partition('-')
+                start = int(first) if first else 0
+                end = min(int(last), size - 1) if last else size - 1
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f"bytes */{size}")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            if not send_body:
+                return
+            with open(path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    block = f.read(min(64 * 1024, remaining))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+
+        def send_gzip(self, path, etag, last_modified, send_body):
+            with open(path, 'rb') as f:
+                body = gzip.compress(f.read())
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+    return FakeANSHandler
+
+def start_server(root, port=0):
+    """Sobe o servidor em uma thread e devolve (server, url_base). Use server.shutdown() para parar."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(os.path.abspath(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python etl/fake_ans_server.py <pasta> [porta]")
+        sys.exit(1)
+    root = sys.argv[1]
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8089
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(os.path.abspath(root)))
+    print(f"🌐 Servindo {os.path.abspath(root)} em http://127.0.0.1:{port}/")
+    server.serve_forever()
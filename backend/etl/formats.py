@@ -0,0 +1,212 @@
+import os
+import shutil
+import pandas as pd
+
+# Formato dos arquivos intermediários entre as etapas do pipeline
+# "csv"     -> ';' e decimal ',' (padrão antigo, legível no Excel)
+# "parquet" -> colunar, tipado e comprimido (bem mais rápido para a próxima etapa ler)
+FORMAT = os.getenv("PIPELINE_FORMAT", "csv").lower()
+
+# Com formato parquet, grava também uma cópia em CSV para quem consome o arquivo fora do pipeline
+EXPORT_CSV = os.getenv("PIPELINE_EXPORT_CSV", "0") == "1"
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+# --- Schemas explícitos (coluna -> dtype do pandas) ---
+# RegistroANS é texto: é um código, não um número (evita virar 123.0 no caminho)
+SCHEMA_CONSOLIDADO = {
+    'RegistroANS': 'string',
+    'Ano': 'Int64',
+    'Trimestre': 'Int64',
+    'DESCRICAO': 'string',
+    'ValorDespesas': 'float64',
+}
+
+SCHEMA_ENRIQUECIDO = {
+    **SCHEMA_CONSOLIDADO,
+    'CNPJ': 'string',
+    'RazaoSocial': 'string',
+    'UF': 'string',
+}
+
+SCHEMA_AGREGADO = {
+    'RazaoSocial': 'string',
+    'UF': 'string',
+    'TotalDespesas': 'float64',
+    'MediaTrimestral': 'float64',
+    'DesvioPadrao': 'float64',
+}
+
+# Cubo trimestral (operadora x UF x ano x trimestre) com os subtotais ("Nivel" diz qual é a linha;
+# colunas que não fazem parte do nível ficam vazias)
+SCHEMA_CUBO = {
+    'Nivel': 'string',
+    'RazaoSocial': 'string',
+    'UF': 'string',
+    'Ano': 'Int64',
+    'Trimestre': 'Int64',
+    'TotalDespesas': 'float64',
+    'QtdLancamentos': 'Int64',
+    'QtdOperadoras': 'Int64',
+    'MediaTrimestral': 'float64',
+    'MediaPorOperadora': 'float64',
+    'DesvioPadrao': 'float64',
+    'VariacaoPct': 'float64',
+}
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt} (use {', '.join(FORMATS)})")
+    return fmt
+
+def resolve(path, fmt=FORMAT):
+    """Troca a extensão do caminho pela do formato (consolidado.csv -> consolidado.parquet)."""
+    root, _ = os.path.splitext(path)
+    return root + FORMATS[check_format(fmt)]
+
+def apply_schema(df, schema):
+    """Converte as colunas conhecidas para o tipo do schema. Colunas extras passam como estão."""
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'float64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif dtype == 'Int64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def read_table(path, schema, fmt=FORMAT, columns=None):
+    """
+    Lê um arquivo intermediário no formato escolhido, já com os tipos do schema.
+    :param path: Caminho base (a extensão é ajustada para o formato).
+    :param columns: Lê só estas colunas (no parquet nem chega a decodificar as outras).
+    """
+    path = resolve(path, fmt)
+    if fmt == 'parquet':
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        dtypes = {c: t for c, t in schema.items() if t != 'float64'}
+        df = pd.read_csv(path, sep=';', decimal=',', dtype=dtypes, usecols=columns)
+    return apply_schema(df, schema)
+
+def iter_table(path, schema, fmt=FORMAT, columns=None, chunksize=100000):
+    """
+    Lê um arquivo intermediário em blocos de até 'chunksize' linhas, já com os tipos do schema.
+    Só um bloco fica em memória por vez.
+    """
+    path = resolve(path, fmt)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield apply_schema(batch.to_pandas(), schema)
+        return
+
+    dtypes = {c: t for c, t in schema.items() if t != 'float64'}
+    with pd.read_csv(path, sep=';', decimal=',', dtype=dtypes, usecols=columns, chunksize=chunksize) as reader:
+        for df in reader:
+            yield apply_schema(df, schema)
+
+def write_table(df, path, schema, fmt=FORMAT, export_csv=EXPORT_CSV):
+    """Grava o DataFrame no formato escolhido. Retorna o caminho gravado."""
+    with TableWriter(path, schema, fmt) as writer:
+        writer.write(df)
+    if fmt != 'csv' and export_csv:
+        export_to_csv(path, schema, fmt)
+    return writer.path
+
+def export_to_csv(path, schema, fmt=FORMAT):
+    """Gera a versão CSV (';' e decimal ',') de um arquivo intermediário, lendo em blocos."""
+    if fmt == 'csv':
+        return resolve(path, 'csv')
+
+    import pyarrow.parquet as pq
+
+    with TableWriter(path, schema, 'csv') as writer:
+        for batch in pq.ParquetFile(resolve(path, fmt)).iter_batches():
+            writer.write(batch.to_pandas())
+    return writer.path
+
+class TableWriter:
+    """
+    Grava um arquivo intermediário aos poucos (bloco a bloco), em CSV ou Parquet.
+    :param target: Caminho base ou, só no CSV, um objeto de arquivo (texto) já aberto.
+    :param header: No CSV, escreve o cabeçalho antes do primeiro bloco.
+    """
+
+    def __init__(self, target, schema, fmt=FORMAT, header=True):
+        self.schema = schema
+        self.fmt = check_format(fmt)
+        self.header = header
+        self.rows = 0
+        self._own_file = isinstance(target, (str, os.PathLike))
+        self._parquet = None
+
+        if not self._own_file:
+            if self.fmt != 'csv':
+                raise ValueError("Objeto de arquivo como destino só é suportado no formato csv")
+            self.path = getattr(target, 'name', None)
+            self._out = target
+        else:
+            self.path = resolve(target, self.fmt)
+            self._out = None
+            if self.fmt == 'csv':
+                self._out = open(self.path, 'w', encoding='utf-8', newline='')
+            elif os.path.exists(self.path):
+                # O ParquetWriter só cria o arquivo no primeiro bloco; não deixa sobrar o da execução anterior
+                os.remove(self.path)
+
+    def write_header(self):
+        """Escreve o cabeçalho do CSV (se ainda não foi escrito)."""
+        if self.fmt == 'csv' and self.header:
+            self._out.write(pd.DataFrame(columns=list(self.schema)).to_csv(index=False, sep=';'))
+            self.header = False
+
+    def write(self, df):
+        if df is None or df.empty:
+            return
+        df = apply_schema(df, self.schema)
+
+        if self.fmt == 'csv':
+            df.to_csv(self._out, index=False, header=self.header, sep=';', decimal=',')
+            self.header = False
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        self.rows += len(df)
+
+    def append_part(self, part_path, rows):
+        """Anexa um arquivo parcial gravado por outro TableWriter (sem cabeçalho) no mesmo formato."""
+        if not rows:
+            return
+        if self.fmt == 'csv':
+            self.write_header()
+            with open(part_path, 'r', encoding='utf-8', newline='') as part:
+                shutil.copyfileobj(part, self._out)
+            self.rows += rows
+        else:
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(part_path).iter_batches():
+                self.write(batch.to_pandas())
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        if self._own_file and self._out is not None:
+            self._out.close()
+            self._out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
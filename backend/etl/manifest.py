@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+
+# Caminhos
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(BASE_DIR, "../../data"))
+MANIFEST_FILE = os.path.join(DATA_DIR, "processed/pipeline_manifest.json")
+
+# Tamanho do bloco lido ao calcular o hash (não carrega o arquivo inteiro na memória)
+HASH_BLOCK = 1024 * 1024
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+class Manifest:
+    """
+    Registro do que cada etapa do pipeline leu, gravou e com quais parâmetros.
+    Uma etapa só precisa rodar de novo se o hash de alguma entrada/saída ou algum parâmetro mudou.
+    Os hashes ficam em cache por (tamanho, mtime) para não reler ZIPs grandes a cada execução.
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.stages = {}
+        self.hash_cache = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.stages = data.get('stages', {})
+                self.hash_cache = data.get('hash_cache', {})
+            except (ValueError, OSError) as e:
+                # Manifesto corrompido: começa do zero (tudo roda de novo)
+                print(f"⚠️ Manifesto ilegível ({e}), ignorando.")
+
+    def key(self, path):
+        """Caminho relativo à pasta data (o manifesto continua válido se o projeto mudar de lugar)."""
+        path = os.path.abspath(path)
+        try:
+            return os.path.relpath(path, DATA_DIR)
+        except ValueError:
+            return path
+
+    def file_hash(self, path):
+        """Hash do conteúdo do arquivo (None se não existir), reaproveitando o cache se não mudou."""
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = self.key(path)
+        cached = self.hash_cache.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+
+        digest = sha256_file(path)
+        self.hash_cache[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def hashes(self, paths):
+        return {self.key(p): self.file_hash(p) for p in sorted(paths)}
+
+    def is_fresh(self, stage, inputs, outputs, params):
+        """True se a etapa já rodou com exatamente estas entradas/parâmetros e as saídas estão intactas."""
+        record = self.stages.get(stage)
+        if not record:
+            return False
+        if record.get('params') != params:
+            return False
+        if record.get('inputs') != self.hashes(inputs):
+            return False
+        current_outputs = self.hashes(outputs)
+        if any(h is None for h in current_outputs.values()):
+            return False
+        return record.get('outputs') == current_outputs
+
+    def record(self, stage, inputs, outputs, params):
+        self.stages[stage] = {
+            'inputs': self.hashes(inputs),
+            'outputs': self.hashes(outputs),
+            'params': params,
+        }
+        self.save()
+
+    def forget(self, stage):
+        """Remove o registro da etapa (ex: falhou no meio, precisa rodar de novo)."""
+        if self.stages.pop(stage, None) is not None:
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'stages': self.stages, 'hash_cache': self.hash_cache}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -1,7 +1,11 @@
 import os
+import sys
 import zipfile
-import pandas as pd
-import io
+
+# Permite rodar este arquivo direto (python etl/processor.py) e ainda achar o pacote 'etl'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import readers
 
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -35,11 +39,13 @@ def inspect_zips():
                         # Abre o arquivo direto da memória (sem descompactar no disco)
                         with z.open(file) as f:
                             # Tenta ler as primeiras 3 linhas para ver a cara dos dados
-                            # ANS costuma usar encoding latin1 (cp1252) e separador ponto-e-vírgula
-                            df_preview = pd.read_csv(
-                                f, 
-                                sep=';',          # Tentativa comum da ANS
-                                encoding='latin1', # Encoding padrão de órgãos gov.br
+                            # Encoding e separador detectados (ANS costuma usar latin1 e ';')
+                            key = readers.member_key(z, file)
+                            dialeto = readers.detect(f, key=key)
+                            print(f"       🔤 Encoding: {dialeto.encoding} | Separador: '{dialeto.sep}'")
+                            df_preview = readers.read_csv(
+                                f,
+                                key=key,
                                 nrows=3            # Só precisamos ver o topo
                             )
                             
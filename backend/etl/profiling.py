@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import platform
+import subprocess
+import cProfile
+import pstats
+import io
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage (CPU vem do time.process_time, sem pico de memória)
+    resource = None
+
+# Caminhos
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(BASE_DIR, "../../data"))
+# Um relatório JSON por execução do pipeline
+REPORT_DIR = os.getenv("PIPELINE_REPORT_DIR", os.path.join(DATA_DIR, "processed/relatorios"))
+
+# Linhas do cProfile/tracemalloc copiadas para o relatório (o arquivo completo fica ao lado)
+PROFILE_TOP = 25
+# Profundidade das pilhas guardadas pelo tracemalloc
+TRACEMALLOC_FRAMES = 10
+
+# --- Medidas do processo ---
+
+def git_commit():
+    """Commit atual (None fora de um repositório git, ex: na imagem Docker)."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=BASE_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+def machine_info():
+    return {'python': platform.python_version(), 'sistema': platform.platform(), 'cpus': os.cpu_count()}
+
+def proc_status_kb(field):
+    """Campo de /proc/self/status em KB (só Linux)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def reset_peak_rss():
+    """
+    Zera o pico de RSS do processo (VmHWM) para medir só a etapa que vai rodar.
+    :return: False se não for possível (fora do Linux): o pico medido será o do processo inteiro.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """Pico de RSS do processo, em MB (os filhos ficam em children_peak_rss_kb)."""
+    # ru_maxrss (KB no Linux) não é zerado pelo clear_refs nem pelo exec: o VmHWM é preferido
+    proprio = proc_status_kb("VmHWM")
+    if proprio is None and resource is not None:
+        proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if proprio is None:
+        return None
+    return round(proprio / 1024, 1)
+
+def children_peak_rss_kb():
+    """
+    Maior pico de RSS entre os filhos já encerrados (ex: workers do consolidator), em KB.
+    Nunca é zerado: vale o maior desde o início do processo. None fora do Linux/Unix.
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+def cpu_seconds():
+    """CPU (usuário + sistema) do processo e dos filhos já encerrados."""
+    if resource is None:
+        return time.process_time()
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return proprio.ru_utime + proprio.ru_stime + filhos.ru_utime + filhos.ru_stime
+
+def io_counters():
+    """Bytes lidos/escritos pelo processo (arquivos, rede e banco), de /proc/self/io. (None, None) fora do Linux."""
+    try:
+        with open("/proc/self/io") as f:
+            valores = dict(line.split(": ") for line in f.read().splitlines())
+        return int(valores['rchar']), int(valores['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+# --- Arquivos ---
+
+def count_rows(path):
+    """
+    Linhas de dados de um arquivo tabular: Parquet pelos metadados, CSV contando quebras de linha
+    (menos o cabeçalho). None para outros tipos (ZIP, por exemplo).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if ext == '.csv':
+        linhas = 0
+        ultimo = b"\n"
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                linhas += block.count(b"\n")
+                ultimo = block[-1:]
+        # Última linha sem quebra no fim também conta
+        linhas += ultimo != b"\n"
+        return max(linhas - 1, 0)
+    return None
+
+def describe_files(paths):
+    """Quantidade, bytes e linhas (dos arquivos tabulares) de uma lista de arquivos."""
+    existentes = [p for p in paths if os.path.exists(p)]
+    contagens = [count_rows(p) for p in existentes]
+    conhecidas = [c for c in contagens if c is not None]
+    return {
+        'arquivos': len(existentes),
+        'bytes': sum(os.path.getsize(p) for p in existentes),
+        'linhas': sum(conhecidas) if conhecidas else None,
+    }
+
+class RunReport:
+    """
+    Relatório JSON de uma execução do pipeline: para cada etapa, tempo, CPU, pico de memória,
+    linhas/bytes de entrada e saída e I/O do processo. O arquivo é regravado ao fim de cada etapa
+    (se o pipeline cair no meio, o que já rodou fica registrado).
+    :param profile_stages: Etapas executadas sob o cProfile (gera <relatorio>_<etapa>.prof).
+    :param tracemalloc_stages: Etapas com snapshot do tracemalloc (gera <relatorio>_<etapa>.tracemalloc).
+    """
+
+    def __init__(self, path=None, params=None, profile_stages=(), tracemalloc_stages=()):
+        self.started = datetime.now(timezone.utc)
+        self.path = path or os.path.join(REPORT_DIR, f"pipeline_{self.started:%Y%m%dT%H%M%SZ}.json")
+        self.profile_stages = set(profile_stages)
+        self.tracemalloc_stages = set(tracemalloc_stages)
+        self.data = {
+            'inicio': self.started.isoformat(timespec='seconds'),
+            'fim': None,
+            'status': 'em_andamento',
+            'commit': git_commit(),
+            'maquina': machine_info(),
+            'parametros': params or {},
+            'etapas': [],
+        }
+
+    def artifact_path(self, stage, ext):
+        return f"{os.path.splitext(self.path)[0]}_{stage}{ext}"
+
+    def skip(self, stage, motivo):
+        self.data['etapas'].append({'etapa': stage, 'status': 'pulada', 'motivo': motivo})
+        self.save()
+
+    @contextmanager
+    def stage(self, stage, inputs=None, outputs=None):
+        """
+        Mede o bloco como a etapa 'stage'.
+        :param inputs: Função que devolve os arquivos de entrada (descritos antes de rodar).
+        :param outputs: Função que devolve os arquivos de saída (descritos depois).
+        """
+        entry = {'etapa': stage, 'status': 'executada'}
+        self.data['etapas'].append(entry)
+        entradas = describe_files(inputs()) if inputs else None
+
+        profiler = cProfile.Profile() if stage in self.profile_stages else None
+        trace = stage in self.tracemalloc_stages
+        pico_da_etapa = reset_peak_rss()
+        filhos_inicio = children_peak_rss_kb()
+        lidos, escritos = io_counters()
+        cpu_inicio = cpu_seconds()
+        inicio = time.perf_counter()
+        if trace:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        if profiler:
+            profiler.enable()
+        try:
+            yield entry
+        except BaseException as e:
+            entry['status'] = 'erro'
+            entry['erro'] = str(e)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            segundos = time.perf_counter() - inicio
+            cpu = cpu_seconds() - cpu_inicio
+            snapshot = None
+            if trace:
+                snapshot = tracemalloc.take_snapshot()
+                _, pico_traced = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            lidos_fim, escritos_fim = io_counters()
+            filhos_fim = children_peak_rss_kb()
+
+            entry.update({
+                'segundos': round(segundos, 3),
+                'cpu_segundos': round(cpu, 3),
+                'pico_rss_mb': peak_rss_mb(),
+                # 'processo': não deu para zerar o pico antes da etapa (vale o maior desde o início)
+                'pico_rss_escopo': 'etapa' if pico_da_etapa else 'processo',
+                # Pico dos processos filhos só quando passou do maior de antes da etapa (senão é de
+                # uma etapa anterior e fica None: o valor do sistema não tem como ser zerado)
+                'pico_rss_filhos_mb': (round(filhos_fim / 1024, 1)
+                                       if filhos_fim is not None and filhos_fim > filhos_inicio else None),
+                'io_lidos_bytes': lidos_fim - lidos if lidos is not None else None,
+                'io_escritos_bytes': escritos_fim - escritos if escritos is not None else None,
+                'entradas': entradas,
+                'saidas': describe_files(outputs()) if outputs else None,
+            })
+            if profiler:
+                entry['cprofile'] = self.dump_profile(stage, profiler)
+            if snapshot:
+                entry['tracemalloc'] = self.dump_tracemalloc(stage, snapshot, pico_traced)
+            self.save()
+
+    def dump_profile(self, stage, profiler):
+        """Grava o .prof (abre com snakeviz ou pstats) e copia as funções mais caras para o relatório."""
+        path = self.artifact_path(stage, ".prof")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        texto = io.StringIO()
+        pstats.Stats(profiler, stream=texto).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        return {'arquivo': path, 'top_cumulativo': texto.getvalue().splitlines()}
+
+    def dump_tracemalloc(self, stage, snapshot, pico):
+        """Grava o snapshot (tracemalloc.Snapshot.load) e as linhas com mais memória ainda alocada no fim da etapa."""
+        path = self.artifact_path(stage, ".tracemalloc")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        snapshot.dump(path)
+        return {
+            'arquivo': path,
+            'pico_mb': round(pico / 1024 / 1024, 1),
+            'top_alocacoes_vivas': [str(stat) for stat in snapshot.statistics('lineno')[:PROFILE_TOP]],
+        }
+
+    def finish(self, status):
+        fim = datetime.now(timezone.utc)
+        self.data['fim'] = fim.isoformat(timespec='seconds')
+        self.data['status'] = status
+        self.data['duracao_segundos'] = round((fim - self.started).total_seconds(), 3)
+        self.save()
+        return self.path
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
@@ -0,0 +1,103 @@
+"""
+Leitura de CSVs de fora do pipeline (ANS, Cadop) com encoding e separador detectados.
+
+Antes cada módulo fixava o seu: o consolidator e o processor liam tudo como Latin-1 (um arquivo
+em UTF-8 viraria "MÃ‰DICA") e o transformer lia o Cadop inteiro como UTF-8 e, se falhasse, lia tudo
+de novo como Latin-1. Aqui o dialeto sai de uma amostra do início do arquivo e o arquivo é
+decodificado uma vez só. Se a amostra é UTF-8, um byte Latin-1 que apareça mais adiante é
+decodificado como Latin-1 (em vez de derrubar a leitura no meio).
+"""
+
+import os
+import re
+import codecs
+from collections import namedtuple
+import pandas as pd
+
+# Bytes do início do arquivo usados na detecção
+SAMPLE_SIZE = 64 * 1024
+
+# Separadores aceitos (o que mais aparece no cabeçalho ganha); sem nenhum, vale o padrão da ANS
+DELIMITERS = [';', ',', '\t', '|']
+DEFAULT_SEP = ';'
+
+# Texto UTF-8 que já foi lido como Latin-1/cp1252 uma vez ("SAÃšDE", "MÃ‰DICA"): 'Ã' ou 'Â' seguido
+# do segundo byte de um caractere acentuado (0x80-0xBF) lido em um desses dois encodings
+CONTINUACAO = bytes(range(0x80, 0xC0))
+MOJIBAKE = re.compile('[ÃÂ][' + re.escape(CONTINUACAO.decode('latin1') + CONTINUACAO.decode('cp1252', errors='ignore')) + ']')
+
+Dialect = namedtuple('Dialect', ['encoding', 'sep', 'errors', 'mojibake'])
+
+def latin1_fallback(erro):
+    """Handler de erro: o trecho que não é UTF-8 válido é decodificado como Latin-1."""
+    return erro.object[erro.start:erro.end].decode('latin1'), erro.end
+
+codecs.register_error('latin1_fallback', latin1_fallback)
+
+# Dialeto já detectado: chave (caminho, tamanho, mtime) de arquivo ou (zip, membro, CRC, tamanho) de membro de ZIP
+cache = {}
+
+def file_key(path):
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+def member_key(z, name):
+    """Chave de cache de um arquivo dentro de um ZIP (o CRC já é o hash do conteúdo)."""
+    info = z.getinfo(name)
+    return (os.path.abspath(z.filename), name, info.CRC, info.file_size)
+
+def sniff(sample):
+    """Detecta encoding e separador de uma amostra (bytes) do início do arquivo."""
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding, errors = 'utf-8-sig', 'latin1_fallback'
+    else:
+        try:
+            # A amostra pode terminar no meio de um caractere: o decoder incremental ignora o fim incompleto
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            encoding, errors = 'utf-8', 'latin1_fallback'
+        except UnicodeDecodeError:
+            encoding, errors = 'latin1', 'strict'
+
+    texto = sample.decode(encoding, errors='ignore' if errors == 'strict' else errors)
+    # Separador dentro de um nome entre aspas não conta
+    cabecalho = re.sub(r'"[^"]*"', '', texto.split('\n', 1)[0])
+    contagens = {d: cabecalho.count(d) for d in DELIMITERS}
+    sep = max(DELIMITERS, key=contagens.get) if any(contagens.values()) else DEFAULT_SEP
+    return Dialect(encoding, sep, errors, bool(MOJIBAKE.search(texto)))
+
+def read_sample(source, size=SAMPLE_SIZE):
+    """Lê o início de um caminho ou de um arquivo binário aberto, sem consumir o arquivo."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read(size)
+    pos = source.tell()
+    sample = source.read(size)
+    source.seek(pos)
+    return sample
+
+def detect(source, key=None):
+    """
+    Dialeto do arquivo, do cache quando já foi detectado.
+    :param source: Caminho ou arquivo binário aberto (com seek, ex: membro de ZIP).
+    :param key: Chave de cache de um arquivo aberto (ver member_key). Caminhos usam file_key.
+    """
+    if key is None and isinstance(source, (str, os.PathLike)):
+        key = file_key(source)
+    if key is not None and key in cache:
+        return cache[key]
+
+    dialeto = sniff(read_sample(source))
+    if dialeto.mojibake:
+        print(f"   ⚠️ Texto com cara de mojibake (UTF-8 já convertido como Latin-1) em {getattr(source, 'name', source)}")
+    if key is not None:
+        cache[key] = dialeto
+    return dialeto
+
+def read_csv(source, key=None, **kwargs):
+    """
+    pd.read_csv com encoding e separador detectados (um 'sep' explícito em kwargs prevalece).
+    Aceita os mesmos parâmetros (chunksize, usecols, dtype...). Membro de ZIP: passe key=member_key(z, nome).
+    """
+    dialeto = detect(source, key)
+    kwargs.setdefault('sep', dialeto.sep)
+    return pd.read_csv(source, encoding=dialeto.encoding, encoding_errors=dialeto.errors, **kwargs)
@@ -1,90 +1,330 @@
 import os
+import json
+import zipfile
+import threading
+from email.utils import formatdate
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import re
 
 # Configurações baseadas na sua navegação visual
-BASE_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
+# ANS_BASE_URL permite apontar para um servidor local (ver etl/fake_ans_server.py)
+BASE_URL = os.getenv("ANS_BASE_URL", "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/")
+# Cadastro de operadoras (Cadop); ANS_CADOP_URL também permite apontar para o servidor local
+URL_BASE_CADOP = os.getenv("ANS_CADOP_URL", "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/")
 OUTPUT_DIR = "../data/raw"
 
-def setup_directories():
+# Downloads simultâneos (e tamanho do pool de conexões)
+DOWNLOAD_WORKERS = int(os.getenv("SCRAPER_WORKERS", "4"))
+
+# Bytes gravados por vez (arquivos da ANS têm dezenas de MB, 8 KB era pouco)
+CHUNK_SIZE = 1024 * 1024
+
+# Quantos ZIPs (os mais recentes) baixar
+MAX_ARQUIVOS = 3
+
+# Sessão compartilhada: reaproveita conexões (keep-alive) entre listagens e downloads
+_session = None
+_session_lock = threading.Lock()
+
+def make_session(pool_size=DOWNLOAD_WORKERS):
+    """Cria uma Session com pool de conexões e retentativas para erros temporários do servidor."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "HEAD"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+def setup_directories(output_dir=None):
     """Garante que a pasta de download existe"""
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+    output_dir = output_dir or OUTPUT_DIR
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
 
-def get_soup(url):
+def get_soup(url, session=None):
     """Função auxiliar para baixar e fazer o parse do HTML"""
+    session = session or get_session()
     try:
-        response = requests.get(url)
+        response = session.get(url, timeout=60)
         response.raise_for_status()
         return BeautifulSoup(response.text, 'html.parser')
     except Exception as e:
         print(f"Erro ao acessar {url}: {e}")
         return None
 
-def download_file(url, filename):
-    """Baixa o arquivo salvando na pasta data/raw"""
-    local_path = os.path.join(OUTPUT_DIR, filename)
-    
-    # Se o arquivo já existe, pula (bom para testes repetidos)
+# --- Metadados do download (arquivo "<nome>.meta.json" ao lado do arquivo baixado) ---
+# Guardam ETag/Last-Modified (para perguntar ao servidor "mudou?") e o tamanho verificado.
+
+def meta_path(local_path):
+    return local_path + ".meta.json"
+
+def load_meta(local_path):
+    try:
+        with open(meta_path(local_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_meta(local_path, meta):
+    with open(meta_path(local_path), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+def conditional_headers(meta):
+    """Cabeçalhos para o servidor responder 304 se o arquivo não mudou."""
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+def verify_file(path, expected_size=None):
+    """
+    Confere se o arquivo baixado está completo: tamanho igual ao anunciado pelo servidor
+    e, se for ZIP, estrutura íntegra (CRC de todos os membros).
+    :return: mensagem de erro ou None se estiver ok.
+    """
+    size = os.path.getsize(path)
+    if expected_size is not None and size != expected_size:
+        return f"tamanho {size} diferente do esperado {expected_size}"
+    if path.lower().endswith('.zip') or path.lower().endswith('.zip.part'):
+        try:
+            with zipfile.ZipFile(path) as z:
+                bad = z.testzip()
+            if bad:
+                return f"membro corrompido no ZIP: {bad}"
+        except zipfile.BadZipFile as e:
+            return f"ZIP inválido: {e}"
+    return None
+
+def total_size(response, offset):
+    """Tamanho total do arquivo remoto a partir do Content-Range (206) ou Content-Length (200)."""
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length')
+    return offset + int(length) if length and length.isdigit() else None
+
+def discard_part(part_path):
+    """Apaga o .part e os metadados dele (download recomeça do zero na próxima vez)."""
+    for path in (part_path, meta_path(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def download_file(url, filename, output_dir=None, session=None):
+    """
+    Baixa o arquivo salvando na pasta data/raw.
+    - Se já existe e o servidor diz que não mudou (ETag/If-Modified-Since -> 304), não baixa de novo.
+    - Download interrompido fica em "<nome>.part" e continua de onde parou (HTTP Range).
+    - Só vira o arquivo final depois de verificado (tamanho e, para ZIP, integridade).
+    """
+    output_dir = output_dir or OUTPUT_DIR
+    session = session or get_session()
+    local_path = os.path.join(output_dir, filename)
+    part_path = local_path + ".part"
+    meta = load_meta(local_path)
+
+    # Sem compressão na transferência: Content-Length/Content-Range e o offset do Range contam os bytes
+    # que vão para o disco (com gzip contariam os bytes comprimidos e a verificação falharia sempre)
+    headers = {'Accept-Encoding': 'identity'}
+    offset = 0
+    if os.path.exists(local_path) and not meta and verify_file(local_path):
+        # Arquivo sem metadados e que não passa na verificação (ex: sobra de um crash antigo): baixa de novo
+        print(f"Arquivo local inválido, baixando de novo: {filename}")
+        os.remove(local_path)
+
     if os.path.exists(local_path):
-        print(f"Arquivo já existe: {filename}")
-        return local_path
+        conditional = conditional_headers(meta)
+        if not conditional:
+            # Arquivo de uma versão antiga do scraper (sem metadados): usa a data dele
+            mtime = os.path.getmtime(local_path)
+            conditional['If-Modified-Since'] = formatdate(mtime, usegmt=True)
+        headers.update(conditional)
+    elif os.path.exists(part_path):
+        offset = os.path.getsize(part_path)
+        part_meta = load_meta(part_path)
+        headers['Range'] = f"bytes={offset}-"
+        # If-Range: se o arquivo remoto mudou desde o início do download, o servidor manda ele inteiro (200)
+        if part_meta.get('etag') or part_meta.get('last_modified'):
+            headers['If-Range'] = part_meta.get('etag') or part_meta.get('last_modified')
 
-    print(f"Baixando {filename}...")
     try:
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            with open(local_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        with session.get(url, stream=True, headers=headers, timeout=60) as r:
+            if r.status_code == 304:
+                print(f"Arquivo já existe e não mudou: {filename}")
+                return local_path
+
+            if r.status_code == 416 and offset:
+                # Range além do fim: o .part já tem o arquivo inteiro, só falta verificar
+                expected = total_size(r, 0)
+            else:
+                r.raise_for_status()
+                # Servidor que comprime mesmo assim: o corpo gravado (descomprimido) não tem o tamanho anunciado
+                # e o Range conta bytes comprimidos, então não dá para conferir o tamanho nem retomar
+                compressed = r.headers.get('Content-Encoding', 'identity').lower() not in ('', 'identity')
+                if r.status_code == 206 and compressed:
+                    discard_part(part_path)
+                    print(f"Servidor respondeu o Range comprimido, recomeçando na próxima vez: {filename}")
+                    return None
+                if r.status_code == 206:
+                    print(f"Retomando {filename} a partir de {offset} bytes...")
+                    mode = 'ab'
+                else:
+                    print(f"Baixando {filename}...")
+                    mode, offset = 'wb', 0
+
+                expected = None if compressed else total_size(r, offset)
+                new_meta = {
+                    'url': url,
+                    'etag': r.headers.get('ETag'),
+                    'last_modified': r.headers.get('Last-Modified'),
+                }
+                if mode == 'ab':
+                    new_meta = load_meta(part_path) or new_meta
+                save_meta(part_path, new_meta)
+
+                with open(part_path, mode) as f:
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+
+        erro = verify_file(part_path, expected)
+        if erro:
+            # .part corrompido não serve para retomar: começa do zero na próxima vez
+            discard_part(part_path)
+            print(f"Falha na verificação de {filename}: {erro}")
+            return None
+
+        final_meta = load_meta(part_path)
+        final_meta['size'] = os.path.getsize(part_path)
+        os.replace(part_path, local_path)
+        save_meta(local_path, final_meta)
+        if os.path.exists(meta_path(part_path)):
+            os.remove(meta_path(part_path))
         print(f"Sucesso: {local_path}")
         return local_path
     except Exception as e:
         print(f"Falha no download de {url}: {e}")
         return None
 
-def main_scraper():
-    setup_directories()
-    print("Iniciando scraper dos dados da ANS...")
-    
+def list_zips(session=None, limit=MAX_ARQUIVOS):
+    """Percorre as listagens de ano (da mais recente para a mais antiga) e devolve [(url, nome_local)]."""
     # 1. Acessa a raiz para listar os Anos
-    soup = get_soup(BASE_URL)
+    soup = get_soup(BASE_URL, session)
     if not soup:
-        return
+        return []
 
     # Pega links que parecem anos (4 dígitos + barra)
     links = [a.get('href') for a in soup.find_all('a') if a.get('href')]
     anos = sorted([l.strip('/') for l in links if re.match(r'^\d{4}/$', l)], reverse=True)
-    
-    arquivos_baixados = []
-    
+
+    alvos = []
+
     # 2. Itera pelos anos (do mais recente para o antigo)
     for ano in anos:
-        if len(arquivos_baixados) >= 3:
+        if len(alvos) >= limit:
             break
-            
+
         print(f"Verificando ano {ano}...")
         url_ano = f"{BASE_URL}{ano}/"
-        soup_ano = get_soup(url_ano)
-        
+        soup_ano = get_soup(url_ano, session)
+
         if not soup_ano:
             continue
 
         # 3. Pega os ZIPs dentro do ano
         links_arquivos = [a.get('href') for a in soup_ano.find_all('a') if a.get('href')]
         zips = sorted([f for f in links_arquivos if f.lower().endswith('.zip')], reverse=True)
-        
+
         for zip_name in zips:
-            if len(arquivos_baixados) >= 3:
+            if len(alvos) >= limit:
                 break
-            
-            full_url = f"{url_ano}{zip_name}"
             # O nome do arquivo salvo será algo como "2025_3T2025.zip" para evitar conflitos
-            download_file(full_url, f"{ano}_{zip_name}")
-            arquivos_baixados.append(f"{ano}/{zip_name}")
+            alvos.append((f"{url_ano}{zip_name}", f"{ano}_{zip_name}"))
+
+    return alvos
+
+def get_cadop_url(session=None, base_url=None):
+    """Entra na página e descobre o nome real do arquivo CSV"""
+    base_url = base_url or URL_BASE_CADOP
+    print(f"🔎 Buscando arquivo em: {base_url}")
+    soup = get_soup(base_url, session)
+    if not soup:
+        print("❌ Erro ao acessar página do Cadop.")
+        return None
+
+    for a in soup.find_all('a'):
+        href = a.get('href')
+        if href and href.lower().endswith('.csv'):
+            print(f"   ✅ Arquivo encontrado: {href}")
+            return f"{base_url}{href}"
+
+    print("❌ Nenhum CSV encontrado na página do Cadop.")
+    return None
+
+def find_cadop(output_dir=None):
+    """Último Cadop baixado (o CSV da pasta de download) ou None."""
+    output_dir = output_dir or OUTPUT_DIR
+    cached = sorted(f for f in os.listdir(output_dir) if f.lower().endswith('.csv')) if os.path.isdir(output_dir) else []
+    return os.path.join(output_dir, cached[-1]) if cached else None
+
+def download_cadop(output_dir=None, session=None, base_url=None):
+    """
+    Baixa o Cadop com a mesma rotina dos ZIPs: retomada (Range), pula se não mudou
+    (ETag/If-Modified-Since) e só aceita o arquivo depois de verificado.
+    Sem acesso à ANS, devolve o último Cadop baixado (se houver).
+    """
+    output_dir = output_dir or OUTPUT_DIR
+    target_url = get_cadop_url(session, base_url)
+    if not target_url:
+        cached = find_cadop(output_dir)
+        if cached:
+            print(f"📂 Usando Cadop em cache: {os.path.basename(cached)}")
+        return cached
+
+    filename = target_url.split('/')[-1]
+    local_path = os.path.join(output_dir, filename)
+    setup_directories(output_dir)
+    path = download_file(target_url, filename, output_dir=output_dir, session=session)
+    if not path and os.path.exists(local_path):
+        print(f"📂 Download falhou, usando arquivo em cache: {filename}")
+        return local_path
+    return path
+
+def main_scraper(workers=DOWNLOAD_WORKERS, output_dir=None):
+    setup_directories(output_dir)
+    print("Iniciando scraper dos dados da ANS...")
+
+    session = get_session()
+    # Cadop antes dos ZIPs: é entrada do transformer e precisa ser conferido mesmo sem trimestre novo
+    download_cadop(output_dir, session)
+
+    alvos = list_zips(session)
+    if not alvos:
+        return
+
+    # 4. Baixa em paralelo (I/O de rede), com no máximo 'workers' downloads ao mesmo tempo
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        resultados = list(executor.map(
+            lambda alvo: download_file(alvo[0], alvo[1], output_dir, session), alvos))
+
+    arquivos_baixados = [nome for (_, nome), path in zip(alvos, resultados) if path]
+    falhas = [nome for (_, nome), path in zip(alvos, resultados) if not path]
 
     print("-" * 30)
-    print(f"Processo finalizado. {len(arquivos_baixados)} arquivos baixados.")
+    print(f"Processo finalizado. {len(arquivos_baixados)} arquivos disponíveis.")
     print(arquivos_baixados)
-
+    if falhas:
+        print(f"⚠️ Falharam (serão retomados na próxima execução): {falhas}")
@@ -1,8 +1,12 @@
 import pandas as pd
+import numpy as np
 import os
-import requests
-from bs4 import BeautifulSoup
-import re
+import sys
+
+# Permite rodar este arquivo direto (python etl/transformer.py) e ainda achar o pacote 'etl'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import formats, readers, scraper
 
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,102 +14,64 @@ DATA_DIR = os.path.join(BASE_DIR, "../../data")
 RAW_DIR = os.path.join(DATA_DIR, "raw")
 PROCESSED_DIR = os.path.join(DATA_DIR, "processed")
 FILE_DESPESAS = os.path.join(PROCESSED_DIR, "consolidado_despesas.csv")
-
-# URL oficial da ANS
-URL_BASE_CADOP = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/"
-
-def get_cadop_url():
-    """Entra na página e descobre o nome real do arquivo CSV"""
-    try:
-        print(f"🔎 Buscando arquivo em: {URL_BASE_CADOP}")
-        response = requests.get(URL_BASE_CADOP)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        for a in soup.find_all('a'):
-            href = a.get('href')
-            if href and href.lower().endswith('.csv'):
-                print(f"   ✅ Arquivo encontrado: {href}")
-                return f"{URL_BASE_CADOP}{href}"
-                
-        print("❌ Nenhum CSV encontrado na página do Cadop.")
-        return None
-    except Exception as e:
-        print(f"❌ Erro ao acessar página do Cadop: {e}")
-        return None
-
-def download_cadop():
-    target_url = get_cadop_url()
-    if not target_url: return None
-
-    filename = target_url.split('/')[-1]
-    local_path = os.path.join(RAW_DIR, filename)
-    
-    if os.path.exists(local_path):
-        print(f"📂 Arquivo já existe em cache: {filename}")
-        return local_path
-
-    print(f"📥 Baixando {filename}...")
-    try:
-        r = requests.get(target_url, stream=True)
-        r.raise_for_status()
-        with open(local_path, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-        print("✅ Download concluído.")
-        return local_path
-    except Exception as e:
-        print(f"❌ Erro no download: {e}")
-        return None
-
-def validar_cnpj(cnpj):
-    """Valida CNPJ (Algoritmo Módulo 11)"""
-    # Remove tudo que não é dígito
-    cnpj = re.sub(r'[^0-9]', '', str(cnpj))
-    
-    # Validações básicas de tamanho e sequência repetida
-    if len(cnpj) != 14 or cnpj == cnpj[0] * len(cnpj):
-        return False
-
-    def calc_digito(doc, pesos):
-        soma = sum(int(d) * p for d, p in zip(doc, pesos))
-        resto = soma % 11
-        return 0 if resto < 2 else 11 - resto
-
-    pesos1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    pesos2 = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-
-    if calc_digito(cnpj[:12], pesos1) != int(cnpj[12]):
-        return False
-    if calc_digito(cnpj[:13], pesos2) != int(cnpj[13]):
-        return False
-    return True
-
-def run_transformation():
+FILE_ENRIQUECIDO = os.path.join(PROCESSED_DIR, "despesas_enriquecidas.csv")
+
+# Pesos do Módulo 11 para o 1º e o 2º dígito verificador
+PESOS_DV1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_DV2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+def validar_cnpjs(serie):
+    """
+    Valida CNPJs (Algoritmo Módulo 11) de uma Series inteira de uma vez.
+    Os dígitos viram uma matriz (n x 14) e os dois DVs saem de um produto matricial.
+    Retorna uma Series booleana com o mesmo índice (nulos são inválidos).
+    """
+    digitos = serie.astype('string').str.replace(r'[^0-9]', '', regex=True).fillna('')
+    valido = pd.Series(False, index=serie.index)
+
+    tamanho_ok = (digitos.str.len() == 14).to_numpy()
+    if not tamanho_ok.any():
+        return valido
+
+    # Cada CNPJ (14 caracteres ASCII) vira uma linha da matriz de dígitos
+    texto = ''.join(digitos[tamanho_ok].tolist()).encode('ascii')
+    matriz = (np.frombuffer(texto, dtype=np.uint8) - ord('0')).reshape(-1, 14).astype(np.int64)
+
+    def calc_digito(parte, pesos):
+        resto = (parte @ pesos) % 11
+        return np.where(resto < 2, 0, 11 - resto)
+
+    dv1 = calc_digito(matriz[:, :12], PESOS_DV1)
+    dv2 = calc_digito(matriz[:, :13], PESOS_DV2)
+    repetido = (matriz == matriz[:, :1]).all(axis=1)
+
+    valido[tamanho_ok] = (dv1 == matriz[:, 12]) & (dv2 == matriz[:, 13]) & ~repetido
+    return valido
+
+def run_transformation(fmt=formats.FORMAT):
+    """:return: False se não deu para gerar o arquivo enriquecido (sem despesas ou sem Cadop)."""
     print("--- 🔄 Iniciando Transformação e Enriquecimento ---")
     
-    if not os.path.exists(FILE_DESPESAS):
+    if not os.path.exists(formats.resolve(FILE_DESPESAS, fmt)):
         print("❌ Erro: Arquivo de despesas não encontrado.")
-        return
+        return False
 
-    # 1. Carrega Despesas
+    # 1. Carrega Despesas (já tipadas: RegistroANS chega como texto)
     print("📖 Lendo arquivo de despesas...")
-    df_despesas = pd.read_csv(FILE_DESPESAS, sep=';', decimal=',')
+    df_despesas = formats.read_table(FILE_DESPESAS, formats.SCHEMA_CONSOLIDADO, fmt)
     
-    # 2. Carrega Cadop
-    cadop_path = download_cadop()
-    if not cadop_path: return
+    # 2. Carrega Cadop (baixado pelo scraper em data/raw)
+    cadop_path = scraper.find_cadop(RAW_DIR)
+    if not cadop_path:
+        print("❌ Erro: Cadop não encontrado em data/raw. Rode o scraper.py antes.")
+        return False
 
     print("📖 Lendo Cadastro de Operadoras...")
     
-    # Tenta ler primeiro como UTF-8 (Padrão moderno)
-    try:
-        df_cadop = pd.read_csv(cadop_path, sep=';', encoding='utf-8', dtype=str, on_bad_lines='skip')
-        print("   ✅ Arquivo lido como UTF-8.")
-    except UnicodeDecodeError:
-        # Se falhar, tenta como Latin-1 (Padrão antigo/Windows)
-        print("   ⚠️ UTF-8 falhou, tentando fallback para Latin-1...")
-        df_cadop = pd.read_csv(cadop_path, sep=';', encoding='latin1', dtype=str, on_bad_lines='skip')
+    # Encoding (UTF-8 ou Latin-1) e separador detectados pelo início do arquivo: uma leitura só
+    dialeto = readers.detect(cadop_path)
+    df_cadop = readers.read_csv(cadop_path, dtype=str, on_bad_lines='skip')
+    print(f"   ✅ Arquivo lido como {dialeto.encoding} (separador '{dialeto.sep}').")
     
     # Normaliza nomes das colunas (remove espaços e poe em maiúsculo)
     df_cadop.columns = [c.strip().upper() for c in df_cadop.columns]
@@ -135,7 +101,7 @@ def run_transformation():
 
     if 'RegistroANS' not in map_cols:
         print("❌ ERRO CRÍTICO: Não foi possível identificar a coluna REGISTRO_OPERADORA.")
-        return
+        return False
 
     # Seleciona e renomeia
     df_cadop = df_cadop[list(map_cols.values())].rename(columns={v: k for k, v in map_cols.items()})
@@ -146,13 +112,16 @@ def run_transformation():
     df_despesas['RegistroANS'] = df_despesas['RegistroANS'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
     df_cadop['RegistroANS'] = df_cadop['RegistroANS'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
 
-    # 3. JOIN
+    # 3. Validação (uma vez por operadora, no lado do Cadop, antes do JOIN)
+    print("🕵️ Validando CNPJs...")
+    if 'CNPJ' not in df_cadop.columns:
+        df_cadop['CNPJ'] = pd.NA
+    df_cadop['CNPJ_Valido'] = validar_cnpjs(df_cadop['CNPJ'])
+
+    # 4. JOIN (o resultado da validação vem junto; sem match no Cadop = inválido)
     print("🔗 Realizando o Cruzamento (Left Join)...")
     df_merged = pd.merge(df_despesas, df_cadop, on='RegistroANS', how='left')
-    
-    # 4. Validação
-    print("🕵️ Validando CNPJs...")
-    df_merged['CNPJ_Valido'] = df_merged['CNPJ'].apply(lambda x: validar_cnpj(x) if pd.notna(x) else False)
+    df_merged['CNPJ_Valido'] = df_merged['CNPJ_Valido'].fillna(False).astype(bool)
     
     # Estatísticas
     total = len(df_merged)
@@ -165,11 +134,10 @@ def run_transformation():
     print(f"   ✅ CNPJs Válidos (Match ok): {len(validos)}")
     print(f"   ❌ Inválidos ou Sem Match: {len(invalidos)}")
     
-    # Salva Válidos
-    file_validos = os.path.join(PROCESSED_DIR, "despesas_enriquecidas.csv")
-    validos.drop(columns=['CNPJ_Valido']).to_csv(file_validos, index=False, sep=';', decimal=',')
+    # Salva Válidos (formato intermediário: é a entrada do aggregator e do importer)
+    formats.write_table(validos.drop(columns=['CNPJ_Valido']), FILE_ENRIQUECIDO, formats.SCHEMA_ENRIQUECIDO, fmt)
     
-    # Salva Inválidos (Relatório de Inconsistência)
+    # Salva Inválidos (Relatório de Inconsistência, sempre em CSV para leitura humana)
     file_erros = os.path.join(PROCESSED_DIR, "inconsistencias.csv")
     invalidos.to_csv(file_erros, index=False, sep=';', decimal=',')
     
@@ -1,5 +1,11 @@
 import pandas as pd
 import os
+import sys
+
+# Permite rodar este arquivo direto (python etl/validator.py) e ainda achar o pacote 'etl'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl import readers
 
 # Caminho do arquivo processado
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,8 +18,8 @@ def validate_output():
         print("❌ Arquivo não encontrado!")
         return
 
-    # Lê o arquivo usando o mesmo separador que usamos para salvar (;)
-    df = pd.read_csv(FILE_PATH, sep=';', decimal=',')
+    # Separador e encoding detectados (o consolidator grava ';' em UTF-8)
+    df = readers.read_csv(FILE_PATH, decimal=',')
     
     print(f"📊 Total de linhas: {len(df)}")
     print(f"🗂️ Colunas: {list(df.columns)}")
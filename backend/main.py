@@ -1,49 +1,157 @@
 import sys
 import os
+import glob
+import argparse
 
 # Adiciona o diretório atual ao path para garantir que o Python encontre os módulos 'etl' e 'database'
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from etl import scraper, consolidator, transformer, aggregator
+from etl import scraper, consolidator, transformer, aggregator, formats
+from etl.manifest import Manifest
+from etl.profiling import RunReport
 from database import importer
 
-def main_pipeline():
+STAGES = ['scraper', 'consolidator', 'transformer', 'aggregator', 'importer']
+
+def raw_files(pattern):
+    return glob.glob(os.path.join(consolidator.RAW_DIR, pattern))
+
+def build_stages(fmt=formats.FORMAT):
+    """
+    Define cada etapa: função, arquivos de entrada, arquivos de saída e parâmetros.
+    Entradas/saídas são funções porque os arquivos só aparecem depois que a etapa anterior roda.
+    O scraper não tem entradas locais: ele é quem descobre se a ANS publicou algo novo (ZIPs e Cadop), então sempre roda.
+    """
+    file_consolidado = formats.resolve(consolidator.OUTPUT_FILE, fmt)
+    file_enriquecido = formats.resolve(transformer.FILE_ENRIQUECIDO, fmt)
+    file_agregado = formats.resolve(aggregator.OUTPUT_FILE, fmt)
+    file_cubo = formats.resolve(aggregator.CUBE_FILE, fmt)
+    file_inconsistencias = os.path.join(transformer.PROCESSED_DIR, "inconsistencias.csv")
+
+    return {
+        'scraper': {
+            'titulo': "Scraper (Download)",
+            'run': scraper.main_scraper,
+            'always': True,
+            # Só para o relatório (o scraper não passa pelo manifesto)
+            'outputs': lambda: raw_files("*.zip") + raw_files("*.csv"),
+        },
+        'consolidator': {
+            'titulo': "Consolidação",
+            # streaming=True lê os arquivos em blocos: memória constante mesmo com muitos trimestres
+            'run': lambda: consolidator.consolidate_data(streaming=True, output_path=consolidator.OUTPUT_FILE, fmt=fmt),
+            'inputs': lambda: raw_files("*.zip"),
+            'outputs': lambda: [file_consolidado],
+            'params': {'fmt': fmt},
+        },
+        'transformer': {
+            'titulo': "Transformação",
+            'run': lambda: transformer.run_transformation(fmt),
+            # O Cadop (CSV baixado pelo scraper em data/raw) também é entrada: cadastro novo = enriquecimento novo
+            'inputs': lambda: [file_consolidado] + raw_files("*.csv"),
+            'outputs': lambda: [file_enriquecido, file_inconsistencias],
+            'params': {'fmt': fmt},
+        },
+        'aggregator': {
+            'titulo': "Agregação Estatística",
+            # streaming=True lê o enriquecido em blocos: memória proporcional ao número de operadoras/trimestres
+            'run': lambda: aggregator.run_aggregation(fmt, streaming=True),
+            'inputs': lambda: [file_enriquecido],
+            'outputs': lambda: [file_agregado, file_cubo],
+            'params': {'fmt': fmt},
+        },
+        'importer': {
+            'titulo': "Carga no Banco de Dados (PostgreSQL)",
+            # full_refresh=False: só os trimestres novos/alterados são (re)carregados (partições por trimestre)
+            'run': lambda: importer.load_data(full_refresh=False, fmt=fmt),
+            'inputs': lambda: [file_enriquecido, file_agregado, file_cubo],
+            'outputs': lambda: [],
+            'params': {'fmt': fmt, 'full_refresh': False, 'schema': importer.SCHEMA_VERSION, 'db': f"{importer.DB_HOST}:{importer.DB_PORT}/{importer.DB_NAME}"},
+        },
+    }
+
+def main_pipeline(force=False, from_stage=None, manifest=None, report=None):
+    """
+    Roda as etapas em ordem, pulando as que não têm nada novo (ver etl/manifest.py).
+    :param force: Roda todas as etapas, mesmo sem mudanças.
+    :param from_stage: Começa nesta etapa (forçada junto com as seguintes); as anteriores não rodam.
+    :param report: RunReport que recebe as medidas de cada etapa (ver etl/profiling.py).
+    """
     print("\n" + "="*50)
     print("🚀 INICIANDO PIPELINE DE DADOS - INTUITIVE CARE")
     print("="*50 + "\n")
 
+    manifest = manifest or Manifest()
+    stages = build_stages()
+    start = STAGES.index(from_stage) if from_stage else 0
+    report = report or RunReport(params={'force': force, 'from_stage': from_stage, 'fmt': formats.FORMAT})
+
     try:
-        # Passo 1: Coleta
-        print(">>> [1/5] Executando Scraper (Download)...")
-        scraper.main_scraper()
-        
-        # Passo 2: Consolidação (Extração e Limpeza)
-        print("\n>>> [2/5] Executando Consolidação...")
-        consolidator.consolidate_data()
-        
-        # Passo 3: Transformação (Enriquecimento e Validação)
-        print("\n>>> [3/5] Executando Transformação...")
-        transformer.run_transformation()
-        
-        # Passo 4: Agregação (Cálculos Estatísticos)
-        print("\n>>> [4/5] Executando Agregação Estatística...")
-        aggregator.run_aggregation()
-        
-        # Passo 5: Carga no Banco
-        print("\n>>> [5/5] Carga no Banco de Dados (PostgreSQL)...")
-        # full_refresh=True garante que limpamos o banco antes de inserir para evitar duplicatas
-        importer.load_data(full_refresh=True)
-
-        print("\n" + "="*50)
+        for i, name in enumerate(STAGES):
+            stage = stages[name]
+            prefix = f"[{i + 1}/{len(STAGES)}]"
+
+            if i < start:
+                print(f">>> {prefix} {stage['titulo']}: pulado (--from-stage {from_stage}).\n")
+                report.skip(name, 'from_stage')
+                continue
+
+            forced = force or (from_stage is not None and i >= start)
+            if stage.get('always'):
+                fresh = False
+            else:
+                inputs, outputs = stage['inputs'](), stage['outputs']()
+                fresh = not forced and manifest.is_fresh(name, inputs, outputs, stage['params'])
+
+            if fresh:
+                print(f">>> {prefix} {stage['titulo']}: sem mudanças nas entradas, pulando.\n")
+                report.skip(name, 'sem_mudancas')
+                continue
+
+            print(f">>> {prefix} Executando {stage['titulo']}...")
+            try:
+                with report.stage(name, stage.get('inputs'), stage.get('outputs')) as medidas:
+                    # As etapas avisam falha (sem entrada, nada gerado...) devolvendo False
+                    if stage['run']() is False:
+                        raise RuntimeError(f"etapa '{name}' falhou, veja as mensagens acima")
+            except Exception:
+                manifest.forget(name)
+                raise
+            filhos = f", filhos {medidas['pico_rss_filhos_mb']} MB" if medidas['pico_rss_filhos_mb'] else ""
+            print(f"⏱️  {medidas['segundos']} s (CPU {medidas['cpu_segundos']} s, pico {medidas['pico_rss_mb']} MB{filhos})\n")
+
+            if not stage.get('always'):
+                # Hashes das entradas são recalculados aqui (cache por mtime, barato se nada mudou)
+                manifest.record(name, stage['inputs'](), stage['outputs'](), stage['params'])
+
+        print("="*50)
         print("✅ SUCESSO! Pipeline finalizado.")
         print("📊 Banco de dados populado e pronto para a API.")
+        print(f"📄 Relatório da execução: {report.finish('sucesso')}")
         print("="*50)
 
     except Exception as e:
         print(f"\n❌ ERRO CRÍTICO NO PIPELINE: {e}")
+        print(f"📄 Relatório da execução: {report.finish('erro')}")
         # Encerra com código de erro 1 para o Docker saber que falhou
         sys.exit(1)
 
-if __name__ == "__main__":
-    main_pipeline()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline ETL de despesas da ANS")
+    parser.add_argument("--force", action="store_true",
+                        help="Roda todas as etapas, mesmo sem mudanças nas entradas")
+    parser.add_argument("--from-stage", choices=STAGES,
+                        help="Começa nesta etapa e força ela e as seguintes")
+    parser.add_argument("--report",
+                        help="Caminho do relatório JSON (padrão: data/processed/relatorios/pipeline_<data>.json)")
+    parser.add_argument("--profile", action="append", choices=STAGES, default=[], metavar="ETAPA",
+                        help="Roda a etapa sob o cProfile (pode repetir)")
+    parser.add_argument("--tracemalloc", action="append", choices=STAGES, default=[], metavar="ETAPA",
+                        help="Guarda um snapshot do tracemalloc da etapa (pode repetir; deixa a etapa mais lenta)")
+    return parser.parse_args(argv)
 
+if __name__ == "__main__":
+    args = parse_args()
+    report = RunReport(args.report, params={'force': args.force, 'from_stage': args.from_stage, 'fmt': formats.FORMAT},
+                       profile_stages=args.profile, tracemalloc_stages=args.tracemalloc)
+    main_pipeline(force=args.force, from_stage=args.from_stage, report=report)
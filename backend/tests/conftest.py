@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Mesmo truque dos scripts: os testes importam 'etl', 'api' e 'database' a partir de backend/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+"""Modo streaming do aggregator (TotaisTrimestrais e acumuladores de momentos) contra o groupby em memória."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl import aggregator
+from etl.aggregator import CHAVES_TRIMESTRE, CHAVES_OPERADORA
+
+LINHAS = 300
+
+@pytest.fixture
+def lancamentos():
+    """Lançamentos sintéticos com os tipos do arquivo enriquecido (inclui chaves e valores nulos)."""
+    rng = np.random.default_rng(7)
+    ops = [(f"OPERADORA {i}", ["SP", "RJ", "MG", "BA"][i % 4]) for i in range(6)]
+    escolhidas = rng.integers(0, len(ops), LINHAS)
+    df = pd.DataFrame({
+        'RazaoSocial': [ops[i][0] for i in escolhidas],
+        'UF': [ops[i][1] for i in escolhidas],
+        'Ano': rng.choice([2024, 2025], LINHAS),
+        'Trimestre': rng.integers(1, 5, LINHAS),
+        # Centavos com sinais misturados: a ordem das somas faz diferença no último bit
+        'ValorDespesas': np.round(rng.normal(0, 1e6, LINHAS), 2),
+    }).astype({'RazaoSocial': 'string', 'UF': 'string', 'Ano': 'Int64', 'Trimestre': 'Int64'})
+    df.loc[rng.choice(LINHAS, 5, replace=False), 'UF'] = pd.NA
+    df.loc[rng.choice(LINHAS, 5, replace=False), 'Trimestre'] = pd.NA
+    df.loc[rng.choice(LINHAS, 5, replace=False), 'ValorDespesas'] = np.nan
+    return df
+
+def em_memoria(df):
+    """Mesmas contas do agregar_em_memoria."""
+    df = df.copy()
+    df['ValorDespesas'] = pd.to_numeric(df['ValorDespesas'], errors='coerce').fillna(0)
+    df_trimestral = df.groupby(CHAVES_TRIMESTRE)['ValorDespesas'].agg(['sum', 'size']).reset_index()
+    df_trimestral.columns = CHAVES_TRIMESTRE + ['ValorDespesas', 'QtdLancamentos']
+    df_final = df_trimestral.groupby(CHAVES_OPERADORA)['ValorDespesas'].agg(
+        TotalDespesas='sum', MediaTrimestral='mean', DesvioPadrao='std').reset_index()
+    return df_trimestral, df_final
+
+def em_blocos(df, chunksize):
+    totais = aggregator.TotaisTrimestrais()
+    for inicio in range(0, len(df), chunksize):
+        totais.add(df.iloc[inicio:inicio + chunksize])
+    return totais.to_frame()
+
+@pytest.mark.parametrize("chunksize", [1, 7, LINHAS])
+def test_totais_trimestrais_iguais_ao_groupby(lancamentos, chunksize):
+    esperado, _ = em_memoria(lancamentos)
+    pd.testing.assert_frame_equal(em_blocos(lancamentos, chunksize), esperado, check_exact=True)
+
+@pytest.mark.parametrize("chunksize", [1, 7, LINHAS])
+def test_estatisticas_iguais_ao_groupby(lancamentos, chunksize):
+    _, esperado = em_memoria(lancamentos)
+    obtido = aggregator.estatisticas_operadoras(em_blocos(lancamentos, chunksize))
+    pd.testing.assert_frame_equal(obtido, esperado, check_exact=True)
+
+def test_combinar_momentos_de_lotes(lancamentos):
+    """Lotes com várias observações (fórmula de Chan) dão o mesmo que o groupby do conjunto todo."""
+    valores = lancamentos.dropna(subset=CHAVES_OPERADORA).set_index(CHAVES_OPERADORA)['ValorDespesas'].fillna(0)
+    acumulado = None
+    for inicio in range(0, len(valores), 7):
+        acumulado = aggregator.combinar_momentos(acumulado, aggregator.momentos(valores.iloc[inicio:inicio + 7], CHAVES_OPERADORA))
+    acumulado = acumulado.sort_index()
+
+    grupos = valores.groupby(CHAVES_OPERADORA)
+    assert (acumulado['n'] == grupos.size()).all()
+    np.testing.assert_allclose(acumulado['soma'], grupos.sum(), rtol=1e-12)
+    np.testing.assert_allclose(acumulado['media'], grupos.mean(), rtol=1e-9)
+    np.testing.assert_allclose(np.sqrt(acumulado['m2'] / (acumulado['n'] - 1)), grupos.std(), rtol=1e-9)
+
+def test_combinar_com_vazio():
+    a = aggregator.momentos(pd.Series([1.0, 2.0], index=pd.MultiIndex.from_tuples(
+        [("A", "SP"), ("A", "SP")], names=CHAVES_OPERADORA)), CHAVES_OPERADORA)
+    assert aggregator.combinar_momentos(None, a) is a
+
+def cubo(totais):
+    """Cubo de uma operadora só, com os totais trimestrais dados em ordem (2025T1, T2, ...)."""
+    return aggregator.build_cube(pd.DataFrame({
+        'RazaoSocial': 'OPERADORA', 'UF': 'SP', 'Ano': 2025,
+        'Trimestre': range(1, len(totais) + 1), 'TotalDespesas': totais, 'QtdLancamentos': 1,
+    }))
+
+def test_variacao_sobre_trimestre_anterior():
+    base = cubo([1000.0, 1500.0, 750.0])
+    base = base[base['Nivel'] == aggregator.NIVEL_OPERADORA_TRIMESTRE]
+    assert base['VariacaoPct'].tolist()[1:] == [50.0, -50.0]
+    assert pd.isna(base['VariacaoPct'].iloc[0])
+
+@pytest.mark.parametrize("anterior", [0.0, 0.03, -0.5])
+def test_variacao_com_trimestre_anterior_minusculo(anterior):
+    """Centavos seguidos de milhões: sem base mínima seriam ~1e10 %, fora de qualquer NUMERIC(12,2)."""
+    base = cubo([anterior, 3_000_000.0])
+    assert base['VariacaoPct'].isna().all()
+
+def test_variacao_com_troca_de_sinal():
+    # Estorno no trimestre anterior: base acima do mínimo, percentual grande mas finito
+    base = cubo([-2.0, 50_000_000.0])
+    variacao = base.loc[base['Nivel'] == aggregator.NIVEL_OPERADORA_TRIMESTRE, 'VariacaoPct'].iloc[1]
+    assert np.isfinite(variacao) and variacao < -1e9
@@ -0,0 +1,497 @@
+"""Partes da API que não precisam de banco (as rotas são chamadas direto no app ASGI, sem servidor)."""
+
+import io
+import gzip
+import json
+import time
+import zlib
+import base64
+import asyncio
+from decimal import Decimal
+
+import brotli
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from fastapi import HTTPException
+
+from api import export
+from api import main as api_main
+from api.main import app, encode_cursor, decode_cursor
+from database import busca
+from api.cache import response_cache, data_version, make_etag
+from api.compression import CompressionMiddleware, negotiate
+from api.serialization import Tabela, to_json
+
+def esquema_200(rota):
+    return app.openapi()["paths"][rota]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+def test_openapi_documenta_registros_e_colunar():
+    for rota, campos in [("/dashboard/top-10", {"razao_social", "registro_ans", "total_despesas"}),
+                         ("/dashboard/anual", {"ano", "total_despesas", "qtd_lancamentos"})]:
+        registros, colunar = esquema_200(rota)["oneOf"]
+        assert registros["type"] == "array" and set(registros["items"]["properties"]) == campos
+        assert colunar["type"] == "object" and set(colunar["properties"]) == campos
+        assert all(p["type"] == "array" for p in colunar["properties"].values())
+
+# --- Chamadas ao app ASGI ---
+
+VERSAO = "teste"
+
+def preparar_cache(corpo, chave="/operadoras?"):
+    """Versão já "lida" do banco e a resposta da rota já guardada: o banco nunca é consultado."""
+    data_version.value = VERSAO
+    data_version.checked_at = time.monotonic() + 3600
+    response_cache.set_version(VERSAO)
+    etag = make_etag(VERSAO, chave)
+    response_cache.put(chave, (etag, corpo, {"content-type": "application/json"}))
+    return etag
+
+def chamar(asgi, path, headers=None, query=b""):
+    """Chama um app ASGI direto: devolve (status, cabeçalhos, corpo)."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query, "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    mensagens = []
+
+    async def principal():
+        # Como um servidor de verdade: o pedido chega uma vez; depois, receive() só volta quando
+        # o cliente desconecta (aqui, quando a resposta termina)
+        fim = asyncio.Event()
+        pedidos = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if pedidos:
+                return pedidos.pop()
+            await fim.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            mensagens.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                fim.set()
+
+        await asgi(scope, receive, send)
+
+    asyncio.run(principal())
+    inicio = next(m for m in mensagens if m["type"] == "http.response.start")
+    corpo = b"".join(m.get("body", b"") for m in mensagens if m["type"] == "http.response.body")
+    return inicio["status"], {k.decode().lower(): v.decode() for k, v in inicio["headers"]}, corpo
+
+@pytest.fixture
+def sem_banco():
+    """Versão dos dados fixa e cache vazio: as rotas cacheadas não vão ao banco perguntar a versão."""
+    data_version.value = VERSAO
+    data_version.checked_at = time.monotonic() + 3600
+    response_cache.set_version(VERSAO)
+    response_cache.entries.clear()
+    response_cache.size = 0
+
+def rota_fixa(corpo, etag='"abc"', content_type="application/json", status=200):
+    """App ASGI que sempre devolve o mesmo corpo (o que a rota + cache entregariam)."""
+    async def asgi(scope, receive, send):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type.encode()), (b"etag", etag.encode())]})
+        await send({"type": "http.response.body", "body": corpo})
+    return asgi
+
+GRANDE = b'{"dados": "' + b"operadora " * 500 + b'"}'
+
+def test_etag_muda_com_a_codificacao():
+    app_comprimido = CompressionMiddleware(rota_fixa(GRANDE))
+    etags = {}
+    for aceita in ["br", "gzip", "identity"]:
+        _, headers, _ = chamar(app_comprimido, "/x", {"Accept-Encoding": aceita})
+        etags[aceita] = headers["etag"]
+    assert etags == {"br": '"abc-br"', "gzip": '"abc-gzip"', "identity": '"abc"'}
+
+def test_etag_fraco_nao_muda():
+    _, headers, _ = chamar(CompressionMiddleware(rota_fixa(GRANDE, etag='W/"abc"')), "/x", {"Accept-Encoding": "br"})
+    assert headers["content-encoding"] == "br" and headers["etag"] == 'W/"abc"'
+
+def test_resposta_pequena_fica_com_o_etag_original():
+    _, headers, _ = chamar(CompressionMiddleware(rota_fixa(b"{}")), "/x", {"Accept-Encoding": "br"})
+    assert "content-encoding" not in headers and headers["etag"] == '"abc"'
+
+def test_if_none_match_com_sufixo_chega_sem_sufixo_na_rota():
+    recebido = {}
+
+    async def rota(scope, receive, send):
+        recebido.update(dict(scope["headers"]))
+        await rota_fixa(b"", status=304)(scope, receive, send)
+
+    status, headers, _ = chamar(CompressionMiddleware(rota), "/x",
+                                {"Accept-Encoding": "br", "If-None-Match": '"abc-br", W/"xyz-br"'})
+    assert recebido[b"if-none-match"] == b'"abc", W/"xyz-br"'
+    # O 304 devolve o ETag que o cliente tem (o da versão em brotli)
+    assert status == 304 and headers["etag"] == '"abc-br"'
+    assert "accept-encoding" in headers["vary"].lower()
+
+def test_304_do_cache_com_etag_comprimido():
+    """Fluxo completo: o ETag recebido numa resposta em brotli, reenviado, dá 304."""
+    etag = preparar_cache(b'{"items": "' + b"x" * 4000 + b'", "next_cursor": null}')
+    status, headers, _ = chamar(app, "/operadoras", {"Accept-Encoding": "br"})
+    assert status == 200 and headers["content-encoding"] == "br"
+    assert headers["etag"] == etag[:-1] + '-br"'
+
+    status, headers, _ = chamar(app, "/operadoras", {"Accept-Encoding": "br", "If-None-Match": headers["etag"]})
+    assert status == 304 and headers["etag"] == etag[:-1] + '-br"'
+    # O mesmo ETag não vale para a versão em gzip
+    status, _, _ = chamar(app, "/operadoras", {"Accept-Encoding": "gzip", "If-None-Match": etag[:-1] + '-br"'})
+    assert status == 200
+
+# --- Compressão (CompressionMiddleware) ---
+
+@pytest.mark.parametrize("aceita, esperado", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip;q=0.5", "gzip"),
+    ("BR", "br"),
+    ("*", "br"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("identity", None),
+    ("gzip;q=lixo", None),
+    ("", None),
+])
+def test_negotiate(aceita, esperado):
+    assert negotiate(aceita) == esperado
+
+DESCOMPRIME = {"br": brotli.decompress, "gzip": gzip.decompress}
+
+@pytest.mark.parametrize("aceita, codificacao", [("br, gzip", "br"), ("gzip", "gzip"), ("identity", None), ("", None)])
+def test_comprime_com_a_codificacao_aceita(aceita, codificacao):
+    _, headers, corpo = chamar(CompressionMiddleware(rota_fixa(GRANDE)), "/x", {"Accept-Encoding": aceita})
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers.get("content-encoding") == codificacao
+    if codificacao:
+        assert int(headers["content-length"]) == len(corpo) < len(GRANDE)
+        assert DESCOMPRIME[codificacao](corpo) == GRANDE
+    else:
+        assert corpo == GRANDE
+
+def test_vary_da_rota_e_mantido():
+    async def rota(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"), (b"vary", b"Origin")]})
+        await send({"type": "http.response.body", "body": GRANDE})
+
+    _, headers, _ = chamar(CompressionMiddleware(rota), "/x", {"Accept-Encoding": "gzip"})
+    assert headers["vary"] == "Origin, Accept-Encoding"
+
+@pytest.mark.parametrize("content_type", ["application/vnd.apache.parquet", "application/zip", "image/png"])
+def test_conteudo_ja_comprimido_passa_direto(content_type):
+    _, headers, corpo = chamar(CompressionMiddleware(rota_fixa(GRANDE, content_type=content_type)), "/x",
+                               {"Accept-Encoding": "br"})
+    assert "content-encoding" not in headers and corpo == GRANDE and headers["etag"] == '"abc"'
+
+def test_resposta_ja_codificada_passa_direto():
+    comprimido = gzip.compress(GRANDE)
+
+    async def rota(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"), (b"content-encoding", b"gzip")]})
+        await send({"type": "http.response.body", "body": comprimido})
+
+    _, headers, corpo = chamar(CompressionMiddleware(rota), "/x", {"Accept-Encoding": "br"})
+    assert headers["content-encoding"] == "gzip" and corpo == comprimido
+
+@pytest.mark.parametrize("codificacao", ["br", "gzip"])
+def test_resposta_em_pedacos(codificacao):
+    """Cada pedaço sai comprimido e já pode ser lido pelo cliente, sem esperar o fim da resposta."""
+    pedacos = [b"id;descricao\n"] + [f"{i};EVENTOS/ SINISTROS CONHECIDOS\n".encode() * 50 for i in range(5)]
+    enviados = []
+
+    async def rota(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/csv; charset=utf-8"), (b"content-length", b"999")]})
+        for i, pedaco in enumerate(pedacos):
+            await send({"type": "http.response.body", "body": pedaco, "more_body": i < len(pedacos) - 1})
+
+    async def send(message):
+        enviados.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": "/x", "headers": [(b"accept-encoding", codificacao.encode())]}
+    asyncio.run(CompressionMiddleware(rota)(scope, receive, send))
+
+    inicio, *corpos = enviados
+    headers = dict(inicio["headers"])
+    assert headers[b"content-encoding"] == codificacao.encode() and b"content-length" not in headers
+    assert len(corpos) == len(pedacos) and [c["more_body"] for c in corpos] == [True] * (len(pedacos) - 1) + [False]
+
+    if codificacao == "br":
+        leitor = brotli.Decompressor()
+        lidos = [leitor.process(c["body"]) for c in corpos]
+    else:
+        leitor = zlib.decompressobj(31)
+        lidos = [leitor.decompress(c["body"]) for c in corpos]
+    assert lidos == pedacos
+
+# --- Cursor da paginação (keyset) ---
+
+@pytest.mark.parametrize("total, id", [(Decimal("1234567.89"), 42), (Decimal("-10.50"), 1), (Decimal("0"), 7),
+                                       (1234.5, 3), (1e16, 99999999)])
+def test_cursor_ida_e_volta(total, id):
+    cursor = encode_cursor(total, id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (Decimal(str(total)), id)
+
+def b64(texto):
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+@pytest.mark.parametrize("cursor", ["lixo!", b64("123.45"), b64("abc|1"), b64("1.5|x"), b64("1|2|3"),
+                                    b64("NaN|1"), b64("Infinity|1"), "_w", encode_cursor(10, 5)[:-2]])
+def test_cursor_adulterado_da_400(cursor):
+    with pytest.raises(HTTPException) as erro:
+        decode_cursor(cursor)
+    assert erro.value.status_code == 400
+
+@pytest.mark.parametrize("query", [b"cursor=" + b64("abc|1").encode(), b"cursor=" + encode_cursor(10, 5).encode() + b"&ordem=relevancia&busca=x"])
+def test_rota_com_cursor_invalido(sem_banco, query):
+    """O cursor é conferido antes de qualquer consulta: 400 sem ir ao banco."""
+    status, _, corpo = chamar(app, "/operadoras", query=query)
+    assert status == 400
+    assert b"Cursor" in corpo
+
+# --- Normalização da busca por nome ---
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Saúde", "saude"),
+    ("SAÚDE", "saude"),
+    ("São Francisco Sistemas de Saúde S.A.", "sao francisco sistemas de saude s a"),
+    ("MEDSÊNIOR - Assistência Médica Ltda.", "medsenior assistencia medica ltda"),
+    ("  Amil   Assistência\tMédica\n", "amil assistencia medica"),
+    ("Çaçá & Cia. (filial 2)", "caca cia filial 2"),
+    ("ＵＮＩＭＥＤ", "unimed"),  # largura total (NFKD)
+    ("...", ""),
+    (123456, "123456"),
+])
+def test_normalizar(texto, esperado):
+    assert busca.normalizar(texto) == esperado
+
+@pytest.mark.parametrize("nulo", [None, pd.NA, np.nan, float("nan")])
+def test_normalizar_nulos(nulo):
+    assert busca.normalizar(nulo) is None
+
+def test_normalizar_coluna_com_nulos():
+    """Como o importer monta razao_social_busca: nome nulo não vira "na"."""
+    nomes = pd.Series(["Unimed Saúde", pd.NA], dtype="string")
+    normalizados = nomes.map(busca.normalizar)
+    assert normalizados.iloc[0] == "unimed saude" and pd.isna(normalizados.iloc[1])
+
+def test_termos():
+    assert busca.termos("  Sul-América  Saúde ") == ["sul", "america", "saude"]
+    assert busca.termos("") == [] and busca.termos(None) == []
+    assert busca.termos("!!!") == []
+
+# --- Exportação (/export/despesas) com o banco trocado por lotes fixos ---
+
+LOTES = [
+    [(1, "300001", 2025, 1, "EVENTOS/ SINISTROS CONHECIDOS", Decimal("1234.56")),
+     (2, "300002", 2025, 1, 'DESCRIÇÃO COM ; E "ASPAS"', Decimal("-10.50"))],
+    [(3, "300001", 2025, 2, "SINISTROS", None)],
+]
+
+@pytest.fixture
+def exportacao(monkeypatch):
+    """fetch_batches devolve LOTES em vez de ler o banco; guarda o SQL e os parâmetros pedidos."""
+    consultas = []
+
+    async def lotes_fixos(sql, params, batch=export.EXPORT_BATCH):
+        consultas.append((sql, params))
+        for lote in LOTES:
+            yield lote
+
+    monkeypatch.setattr(export, "fetch_batches", lotes_fixos)
+    return consultas
+
+def exportar(query, headers=None):
+    return chamar(app, "/export/despesas", headers, query)
+
+def test_exportar_csv(exportacao):
+    status, cabecalhos, corpo = exportar(b"")
+    assert status == 200
+    assert cabecalhos["content-type"] == "text/csv; charset=utf-8"
+    assert cabecalhos["content-disposition"] == 'attachment; filename="despesas_detalhadas.csv"'
+    df = pd.read_csv(io.BytesIO(corpo), sep=";", decimal=",", dtype={"registro_ans": str})
+    assert df.columns.tolist() == export.EXPORT_COLUMNS
+    assert df["id"].tolist() == [1, 2, 3]
+    assert df["registro_ans"].tolist() == ["300001", "300002", "300001"]
+    assert df["descricao"].iloc[1] == 'DESCRIÇÃO COM ; E "ASPAS"'
+    assert df["valor_despesa"].iloc[:2].tolist() == [1234.56, -10.5] and pd.isna(df["valor_despesa"].iloc[2])
+    assert exportacao == [("SELECT id, registro_ans, ano, trimestre, descricao, valor_despesa FROM despesas_detalhadas ", {})]
+
+def test_exportar_ndjson(exportacao):
+    status, cabecalhos, corpo = exportar(b"formato=ndjson")
+    assert status == 200
+    assert cabecalhos["content-type"] == "application/x-ndjson"
+    assert cabecalhos["content-disposition"] == 'attachment; filename="despesas_detalhadas.ndjson"'
+    linhas = [json.loads(linha) for linha in corpo.splitlines()]
+    assert len(linhas) == 3
+    assert linhas[0] == {"id": 1, "registro_ans": "300001", "ano": 2025, "trimestre": 1,
+                         "descricao": "EVENTOS/ SINISTROS CONHECIDOS", "valor_despesa": 1234.56}
+    assert linhas[2]["valor_despesa"] is None
+
+def test_exportar_parquet(exportacao):
+    status, cabecalhos, corpo = exportar(b"formato=parquet", {"Accept-Encoding": "br, gzip"})
+    assert status == 200
+    assert cabecalhos["content-type"] == "application/vnd.apache.parquet"
+    assert cabecalhos["content-disposition"] == 'attachment; filename="despesas_detalhadas.parquet"'
+    # Parquet já vem comprimido (zstd): passa pelo CompressionMiddleware sem Content-Encoding
+    assert "content-encoding" not in cabecalhos
+    arquivo = pq.ParquetFile(io.BytesIO(corpo))
+    assert arquivo.num_row_groups == len(LOTES)
+    tabela = arquivo.read()
+    assert tabela.schema == export.PARQUET_SCHEMA
+    assert tabela.column("valor_despesa").to_pylist() == [Decimal("1234.56"), Decimal("-10.50"), None]
+    assert tabela.column("registro_ans").to_pylist() == ["300001", "300002", "300001"]
+
+def test_exportar_csv_com_gzip(exportacao, monkeypatch):
+    # Corpo pequeno: sem baixar o mínimo, os pedaços da exportação ficariam sem compressão
+    monkeypatch.setattr("api.compression.COMPRESS_MIN_SIZE", 0)
+    _, _, identidade = exportar(b"formato=csv")
+    _, cabecalhos, corpo = exportar(b"formato=csv", {"Accept-Encoding": "gzip"})
+    assert cabecalhos["content-encoding"] == "gzip"
+    assert "accept-encoding" in cabecalhos["vary"].lower()
+    assert gzip.decompress(corpo) == identidade
+
+def test_exportar_formato_invalido(exportacao):
+    status, _, corpo = exportar(b"formato=xlsx")
+    assert status == 422
+    assert json.loads(corpo)["detail"][0]["loc"] == ["query", "formato"]
+    assert exportacao == []
+
+def test_exportar_com_filtros(exportacao):
+    status, _, _ = exportar(b"formato=ndjson&ano=2025&trimestre=2&registro_ans=300001")
+    assert status == 200
+    sql, params = exportacao[0]
+    assert sql.endswith("FROM despesas_detalhadas WHERE ano = :ano AND trimestre = :trimestre AND registro_ans = :registro_ans")
+    assert params == {"ano": 2025, "trimestre": 2, "registro_ans": "300001"}
+
+@pytest.mark.parametrize("filtros, where", [
+    ({}, ""),
+    ({"ano": 2024}, "WHERE ano = :ano"),
+    ({"trimestre": 3, "registro_ans": "123456"}, "WHERE trimestre = :trimestre AND registro_ans = :registro_ans"),
+])
+def test_build_query(filtros, where):
+    sql, params = export.build_query(**filtros)
+    assert sql == f"SELECT {', '.join(export.EXPORT_COLUMNS)} FROM despesas_detalhadas {where}"
+    assert params == filtros
+
+# --- /dashboard (consultas em paralelo) com as consultas trocadas por esperas ---
+
+ESPERA = 0.2
+
+@pytest.fixture
+def dashboard_sem_banco(sem_banco, monkeypatch):
+    """Cada dados_* espera ESPERA segundos e devolve dados fixos; guarda a sessão que recebeu."""
+    sessoes = []
+
+    class Sessao:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+    def consulta(resultado):
+        async def dados(db, *args):
+            sessoes.append(db)
+            await asyncio.sleep(ESPERA)
+            return resultado
+        return dados
+
+    monkeypatch.setattr(api_main, "AsyncSessionLocal", Sessao)
+    monkeypatch.setattr(api_main, "dados_operadoras", consulta(
+        {"data": Tabela(["razao_social", "total_despesas"], [("OPERADORA A", Decimal("10.50"))]), "next_cursor": None}))
+    monkeypatch.setattr(api_main, "dados_top_10", consulta(
+        Tabela(["razao_social", "registro_ans", "total_despesas"], [("OPERADORA A", "300001", 10.5)])))
+    monkeypatch.setattr(api_main, "dados_resumo", consulta({"total_gasto_geral": 10.5, "total_operadoras_analisadas": 1}))
+    monkeypatch.setattr(api_main, "dados_anual", consulta(Tabela(["ano", "total_despesas", "qtd_lancamentos"], [])))
+    return sessoes
+
+def test_dashboard_junta_as_consultas(dashboard_sem_banco):
+    status, _, corpo = chamar(app, "/dashboard")
+    assert status == 200
+    assert json.loads(corpo) == {
+        "operadoras": {"data": [{"razao_social": "OPERADORA A", "total_despesas": 10.5}], "next_cursor": None},
+        "top_10": [{"razao_social": "OPERADORA A", "registro_ans": "300001", "total_despesas": 10.5}],
+        "resumo": {"total_gasto_geral": 10.5, "total_operadoras_analisadas": 1},
+        "anual": [],
+    }
+
+def test_dashboard_colunar(dashboard_sem_banco):
+    _, _, corpo = chamar(app, "/dashboard", query=b"colunar=true")
+    dados = json.loads(corpo)
+    assert dados["top_10"] == {"razao_social": ["OPERADORA A"], "registro_ans": ["300001"], "total_despesas": [10.5]}
+    assert dados["anual"] == {"ano": [], "total_despesas": [], "qtd_lancamentos": []}
+
+def test_dashboard_consultas_em_paralelo(dashboard_sem_banco):
+    inicio = time.perf_counter()
+    status, _, _ = chamar(app, "/dashboard", query=b"busca=unimed")
+    decorrido = time.perf_counter() - inicio
+    assert status == 200
+    # Quatro esperas de ESPERA: em série seriam 4 * ESPERA
+    assert decorrido < 2 * ESPERA
+    # Uma sessão (conexão) por consulta
+    assert len(dashboard_sem_banco) == 4 and len({id(s) for s in dashboard_sem_banco}) == 4
+
+# --- Tabela (registros ou colunas) ---
+
+TABELA = Tabela(["ano", "total_despesas", "qtd_lancamentos"], [(2025, Decimal("1234.56"), 10), (2024, Decimal("-0.50"), 3)])
+
+def test_tabela_registros():
+    assert TABELA.registros() == [{"ano": 2025, "total_despesas": Decimal("1234.56"), "qtd_lancamentos": 10},
+                                  {"ano": 2024, "total_despesas": Decimal("-0.50"), "qtd_lancamentos": 3}]
+
+def test_tabela_colunar():
+    assert TABELA.colunar() == {"ano": (2025, 2024), "total_despesas": (Decimal("1234.56"), Decimal("-0.50")),
+                                "qtd_lancamentos": (10, 3)}
+
+def test_tabela_vazia():
+    vazia = Tabela(["ano", "total_despesas"], [])
+    assert vazia.registros() == []
+    assert vazia.colunar() == {"ano": [], "total_despesas": []}
+    assert json.loads(to_json(vazia, colunar=True)) == {"ano": [], "total_despesas": []}
+
+def test_to_json_registros_e_colunar():
+    conteudo = {"data": TABELA, "total": Decimal("1234.06")}
+    assert json.loads(to_json(conteudo)) == {
+        "data": [{"ano": 2025, "total_despesas": 1234.56, "qtd_lancamentos": 10},
+                 {"ano": 2024, "total_despesas": -0.5, "qtd_lancamentos": 3}],
+        "total": 1234.06,
+    }
+    assert json.loads(to_json(conteudo, colunar=True)) == {
+        "data": {"ano": [2025, 2024], "total_despesas": [1234.56, -0.5], "qtd_lancamentos": [10, 3]},
+        "total": 1234.06,
+    }
+
+def test_to_json_tipo_desconhecido():
+    with pytest.raises(TypeError):
+        to_json({"x": object()})
+
+@pytest.mark.parametrize("colunar", [b"", b"colunar=false", b"colunar=true"])
+def test_rota_com_colunar(sem_banco, monkeypatch, colunar):
+    async def dados_anual(db):
+        return TABELA
+
+    async def sem_sessao():
+        yield None
+
+    monkeypatch.setattr(api_main, "dados_anual", dados_anual)
+    app.dependency_overrides[api_main.get_async_db] = sem_sessao
+    try:
+        status, _, corpo = chamar(app, "/dashboard/anual", query=colunar)
+    finally:
+        app.dependency_overrides.clear()
+    assert status == 200
+    esperado = TABELA.colunar() if colunar == b"colunar=true" else TABELA.registros()
+    assert corpo == to_json(esperado)
@@ -0,0 +1,63 @@
+"""Respostas servidas pelo cache (HIT e 304) também levam os cabeçalhos de CORS."""
+
+import asyncio
+import time
+
+from api.main import app
+from api.cache import response_cache, data_version, cache_key, make_etag
+
+ORIGEM = "http://localhost:5173"
+VERSAO = "teste"
+ROTA = "/operadoras"
+
+class Requisicao:
+    """O mínimo que cache_key precisa para montar a chave."""
+    def __init__(self, path):
+        self.url = type("URL", (), {"path": path})()
+        self.query_params = type("Params", (), {"multi_items": lambda self: []})()
+
+def get(path, headers):
+    """Chama o app ASGI direto (sem servidor): devolve (status, cabeçalhos)."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    mensagens = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        mensagens.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    inicio = next(m for m in mensagens if m["type"] == "http.response.start")
+    return inicio["status"], {k.decode().lower(): v.decode() for k, v in inicio["headers"]}
+
+def preparar_cache():
+    # Versão já "lida" do banco e a resposta da rota já guardada: o banco nunca é consultado
+    data_version.value = VERSAO
+    data_version.checked_at = time.monotonic() + 3600
+    response_cache.set_version(VERSAO)
+    chave = cache_key(Requisicao(ROTA))
+    etag = make_etag(VERSAO, chave)
+    response_cache.put(chave, (etag, b'{"data":[]}', {"content-type": "application/json"}))
+    return etag
+
+def test_hit_do_cache_tem_cors():
+    etag = preparar_cache()
+    status, headers = get(ROTA, {"Origin": ORIGEM})
+    assert status == 200
+    assert headers["x-cache"] == "HIT"
+    assert headers["etag"] == etag
+    assert headers["access-control-allow-origin"] == ORIGEM
+    assert "etag" in headers["access-control-expose-headers"].lower()
+
+def test_304_tem_cors():
+    etag = preparar_cache()
+    status, headers = get(ROTA, {"Origin": ORIGEM, "If-None-Match": etag})
+    assert status == 304
+    assert headers["access-control-allow-origin"] == ORIGEM
+    assert "etag" in headers["access-control-expose-headers"].lower()
@@ -0,0 +1,91 @@
+"""Modos do consolidator (em memória, streaming e paralelo) com arquivos sintéticos da ANS."""
+
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from etl import consolidator, formats
+from benchmarks import synthetic
+
+MODOS = {
+    'memoria': dict(streaming=False),
+    # Bloco pequeno de propósito: vários blocos por arquivo, inclusive no Excel
+    'streaming': dict(streaming=True, chunksize=37),
+    'paralelo': dict(streaming=True, chunksize=37, workers=3),
+}
+
+def zip_com(caminho, membros):
+    with zipfile.ZipFile(caminho, 'w') as z:
+        for nome, conteudo in membros.items():
+            z.writestr(nome, conteudo)
+
+@pytest.fixture(scope="module")
+def arquivos_ans(tmp_path_factory):
+    """ZIPs trimestrais no layout da ANS (CSV e XLSX), mais um ZIP sem nenhuma linha de despesa."""
+    pasta = tmp_path_factory.mktemp("ans")
+    resumo = synthetic.gerar_arquivos_ans(str(pasta), escala=0.02, trimestres=4, contas=40, fracao_xlsx=0.5)
+    assert resumo['trimestres_xlsx']
+    raw = pasta / "raw"
+    synthetic.simular_download(str(pasta), str(raw))
+    zip_com(raw / "2025_sem_despesas.zip", {
+        # Colunas certas, nenhuma descrição de evento/sinistro
+        '4T2025.csv': "DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_FINAL\n2025-10-01;123456;311;RECEITA;1,00\n",
+        'leiame.pdf': b"%PDF-1.4",
+    })
+    return raw
+
+def consolidar(raw, destino, monkeypatch, fmt, modo):
+    monkeypatch.setattr(consolidator, 'RAW_DIR', str(raw))
+    monkeypatch.setattr(consolidator, 'PROCESSED_DIR', str(destino))
+    saida = str(destino / f"consolidado_{modo}.csv")
+    resultado = consolidator.consolidate_data(output_path=saida, fmt=fmt, **MODOS[modo])
+    return resultado, saida
+
+@pytest.mark.parametrize("fmt", ['csv', 'parquet'])
+def test_modos_dao_o_mesmo_resultado(arquivos_ans, tmp_path, monkeypatch, fmt):
+    saidas = {}
+    for modo in MODOS:
+        resultado, saida = consolidar(arquivos_ans, tmp_path, monkeypatch, fmt, modo)
+        assert resultado is not False
+        saidas[modo] = formats.read_table(saida, formats.SCHEMA_CONSOLIDADO, fmt)
+
+    esperado = saidas['memoria']
+    assert len(esperado) > 0
+    assert esperado['Trimestre'].nunique() == 4
+    for modo in ['streaming', 'paralelo']:
+        # Mesma ordem do modo serial, não só o mesmo conjunto de linhas
+        pd.testing.assert_frame_equal(saidas[modo], esperado, obj=modo)
+
+    # Nenhuma sobra das partes do modo paralelo
+    assert not [n for n in os.listdir(tmp_path) if n.startswith("consolidacao_")]
+
+def test_paralelo_com_excel_e_zip_sem_linhas(tmp_path, monkeypatch):
+    """Um XLSX, um ZIP que não rende linha nenhuma e um CSV: cada membro vai para um processo."""
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    codigos, descricoes = synthetic.plano_de_contas(12)
+    rng = synthetic.np.random.default_rng(5)
+    bloco = synthetic.linhas_trimestre(synthetic.np.arange(300000, 300010), synthetic.np.full(10, 1e5),
+                                       2025, 1, codigos, descricoes, rng)
+    with zipfile.ZipFile(raw / "2025_1T2025.zip", 'w') as z:
+        synthetic.escrever_xlsx(z, "1T2025.xlsx", [bloco])
+    zip_com(raw / "2025_2T2025.zip", {'leiame.txt': "nada aqui\n"})
+    with zipfile.ZipFile(raw / "2025_3T2025.zip", 'w') as z:
+        synthetic.escrever_csv(z, "3T2025.csv", [bloco.assign(DATA='2025-07-01')])
+
+    resultados = {modo: consolidar(raw, tmp_path, monkeypatch, 'csv', modo) for modo in MODOS}
+    lidos = {modo: formats.read_table(saida, formats.SCHEMA_CONSOLIDADO, 'csv')
+             for modo, (_, saida) in resultados.items()}
+    assert sorted(lidos['paralelo']['Trimestre'].unique()) == [1, 3]
+    pd.testing.assert_frame_equal(lidos['paralelo'], lidos['memoria'])
+    pd.testing.assert_frame_equal(lidos['streaming'], lidos['memoria'])
+
+@pytest.mark.parametrize("modo", list(MODOS))
+def test_sem_dados_devolve_false(tmp_path, monkeypatch, modo):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    zip_com(raw / "2025_1T2025.zip", {'leiame.txt': "nada aqui\n"})
+    resultado, _ = consolidar(raw, tmp_path, monkeypatch, 'csv', modo)
+    assert resultado is False
@@ -0,0 +1,168 @@
+"""Pipeline incremental (main.main_pipeline + etl/manifest.py) com etapas de mentira gravando em tmp_path."""
+
+import os
+
+import pytest
+
+import main
+from etl.manifest import Manifest
+from etl.profiling import RunReport
+
+ETAPAS = ['baixa', 'limpa', 'conta', 'carrega']
+
+class Pipeline:
+    """
+    baixa (sempre roda) -> limpa (entrada.txt -> limpa.txt) -> conta (-> conta.txt) -> carrega (-> carga.txt).
+    Cada etapa grava uma função da entrada, então saída nova = entrada nova para a etapa seguinte.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.entrada = pasta / "entrada.txt"
+        self.params = {'limpa': {'sufixo': ''}, 'conta': {}, 'carrega': {}}
+        self.falhar = set()
+        self.executadas = []
+        self.manifesto = pasta / "manifesto.json"
+        self.entrada.write_text("a\nb\n")
+
+    def arquivo(self, nome):
+        return str(self.pasta / nome)
+
+    def etapa(self, nome, entrada, saida, conta):
+        def run():
+            self.executadas.append(nome)
+            if nome in self.falhar:
+                return False
+            with open(entrada) as f:
+                conteudo = f.read()
+            with open(saida, 'w') as f:
+                f.write(conta(conteudo))
+        return {
+            'titulo': nome,
+            'run': run,
+            'inputs': lambda: [entrada],
+            'outputs': lambda: [saida],
+            'params': self.params[nome],
+        }
+
+    def build_stages(self, fmt=None):
+        return {
+            'baixa': {'titulo': 'baixa', 'run': lambda: self.executadas.append('baixa'), 'always': True,
+                      'outputs': lambda: [str(self.entrada)]},
+            'limpa': self.etapa('limpa', str(self.entrada), self.arquivo("limpa.txt"),
+                                lambda texto: texto.upper() + self.params['limpa']['sufixo']),
+            'conta': self.etapa('conta', self.arquivo("limpa.txt"), self.arquivo("conta.txt"),
+                                lambda texto: str(len(texto.splitlines()))),
+            'carrega': self.etapa('carrega', self.arquivo("conta.txt"), self.arquivo("carga.txt"),
+                                  lambda texto: f"carregado {texto}"),
+        }
+
+    def rodar(self, **kwargs):
+        """Roda o pipeline (manifesto novo, lido do disco como numa execução nova) e devolve as etapas executadas."""
+        self.executadas = []
+        self.report = RunReport(self.arquivo("relatorio.json"))
+        main.main_pipeline(manifest=Manifest(str(self.manifesto)), report=self.report, **kwargs)
+        return self.executadas
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    p = Pipeline(tmp_path)
+    monkeypatch.setattr(main, 'STAGES', ETAPAS)
+    monkeypatch.setattr(main, 'build_stages', p.build_stages)
+    return p
+
+def test_primeira_execucao_roda_tudo(pipeline):
+    assert pipeline.rodar() == ETAPAS
+    assert open(pipeline.arquivo("carga.txt")).read() == "carregado 2"
+
+def test_sem_mudancas_pula_as_etapas(pipeline):
+    pipeline.rodar()
+    # A etapa 'always' roda sempre; as outras não têm nada novo
+    assert pipeline.rodar() == ['baixa']
+    motivos = {e['etapa']: e.get('motivo') for e in pipeline.report.data['etapas']}
+    assert motivos == {'baixa': None, 'limpa': 'sem_mudancas', 'conta': 'sem_mudancas', 'carrega': 'sem_mudancas'}
+
+def test_entrada_nova_roda_a_etapa_e_as_seguintes(pipeline):
+    pipeline.rodar()
+    pipeline.entrada.write_text("a\nb\nc\n")
+    assert pipeline.rodar() == ETAPAS
+    assert open(pipeline.arquivo("carga.txt")).read() == "carregado 3"
+
+def test_saida_igual_nao_propaga(pipeline):
+    pipeline.rodar()
+    # limpa roda de novo (entrada mudou), mas a contagem de linhas não muda: conta.txt fica igual
+    pipeline.entrada.write_text("x\ny\n")
+    assert pipeline.rodar() == ['baixa', 'limpa', 'conta']
+
+def test_parametro_novo_roda_a_etapa_e_as_seguintes(pipeline):
+    pipeline.rodar()
+    pipeline.params['limpa']['sufixo'] = "z\n"
+    assert pipeline.rodar() == ETAPAS
+    assert open(pipeline.arquivo("carga.txt")).read() == "carregado 3"
+
+def test_parametro_novo_no_meio(pipeline):
+    pipeline.rodar()
+    pipeline.params['carrega']['destino'] = "outro"
+    assert pipeline.rodar() == ['baixa', 'carrega']
+
+def test_saida_apagada_roda_de_novo(pipeline):
+    pipeline.rodar()
+    os.remove(pipeline.arquivo("carga.txt"))
+    assert pipeline.rodar() == ['baixa', 'carrega']
+
+def test_force_roda_tudo(pipeline):
+    pipeline.rodar()
+    assert pipeline.rodar(force=True) == ETAPAS
+
+def test_from_stage(pipeline):
+    pipeline.rodar()
+    # Etapas antes de --from-stage não rodam (nem a 'always'); ela e as seguintes são forçadas
+    assert pipeline.rodar(from_stage='conta') == ['conta', 'carrega']
+    motivos = [e.get('motivo') for e in pipeline.report.data['etapas'][:2]]
+    assert motivos == ['from_stage', 'from_stage']
+
+def test_from_stage_ignora_mudancas_anteriores(pipeline):
+    pipeline.rodar()
+    pipeline.entrada.write_text("a\nb\nc\n")
+    assert pipeline.rodar(from_stage='carrega') == ['carrega']
+    # limpa não rodou: a próxima execução normal ainda vê a entrada nova
+    assert pipeline.rodar() == ETAPAS
+
+def test_etapa_que_falha_e_esquecida(pipeline):
+    pipeline.rodar()
+    pipeline.entrada.write_text("a\nb\nc\n")
+    pipeline.falhar = {'conta'}
+    with pytest.raises(SystemExit):
+        pipeline.rodar()
+    assert pipeline.executadas == ['baixa', 'limpa', 'conta']
+    # limpa ficou registrada com a entrada nova; conta foi esquecida (não fica com o registro antigo)
+    assert set(Manifest(str(pipeline.manifesto)).stages) == {'limpa', 'carrega'}
+    assert pipeline.report.data['status'] == 'erro'
+
+    pipeline.falhar = set()
+    assert pipeline.rodar() == ['baixa', 'conta', 'carrega']
+    assert open(pipeline.arquivo("carga.txt")).read() == "carregado 3"
+
+def test_etapa_que_falha_na_primeira_execucao(pipeline):
+    pipeline.falhar = {'limpa'}
+    with pytest.raises(SystemExit):
+        pipeline.rodar()
+    assert 'limpa' not in Manifest(str(pipeline.manifesto)).stages
+
+def test_manifesto_corrompido_roda_tudo(pipeline):
+    pipeline.rodar()
+    pipeline.manifesto.write_text("{nao e json")
+    assert pipeline.rodar() == ETAPAS
+
+def test_hash_em_cache_por_mtime(tmp_path):
+    arquivo = tmp_path / "a.txt"
+    arquivo.write_text("um")
+    manifesto = Manifest(str(tmp_path / "m.json"))
+    antes = manifesto.file_hash(str(arquivo))
+    # Mesmo conteúdo regravado (mtime novo): hash recalculado, igual
+    arquivo.write_text("um")
+    os.utime(arquivo, ns=(1, 1))
+    assert manifesto.file_hash(str(arquivo)) == antes
+    arquivo.write_text("dois")
+    assert manifesto.file_hash(str(arquivo)) != antes
+    assert manifesto.file_hash(str(tmp_path / "nao_existe.txt")) is None
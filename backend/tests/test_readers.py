@@ -0,0 +1,92 @@
+"""Detecção de encoding/separador (etl/readers.py)."""
+
+import io
+import codecs
+import zipfile
+
+import pandas as pd
+import pytest
+
+from etl import readers
+
+LINHAS = [("1", "SAÚDE ASSISTÊNCIA MÉDICA", "1.234,56"), ("2", "ODONTOLÓGICA", "-10,50"), ("3", "CAIXA", "0,00")]
+
+def csv_bytes(encoding, sep=';', linhas=LINHAS):
+    texto = sep.join(['REG_ANS', 'DESCRICAO', 'VL_SALDO_FINAL']) + '\n'
+    texto += ''.join(sep.join(linha) + '\n' for linha in linhas)
+    return texto.encode(encoding)
+
+def misto():
+    """Início em UTF-8 (amostra inteira) e, bem depois, uma linha gravada em Latin-1."""
+    linhas = [(str(i), "ASSISTÊNCIA MÉDICA", "1,00") for i in range(3000)]
+    return csv_bytes('utf-8', linhas=linhas) + "9999;CLÍNICA ODONTOLÓGICA;2,00\n".encode('latin1')
+
+def test_utf8():
+    assert readers.sniff(csv_bytes('utf-8')) == readers.Dialect('utf-8', ';', 'latin1_fallback', False)
+
+def test_latin1():
+    assert readers.sniff(csv_bytes('latin1')) == readers.Dialect('latin1', ';', 'strict', False)
+
+def test_bom_utf8():
+    dialeto = readers.sniff(codecs.BOM_UTF8 + csv_bytes('utf-8'))
+    assert dialeto.encoding == 'utf-8-sig'
+
+def test_amostra_cortada_no_meio_de_um_caractere():
+    dados = csv_bytes('utf-8')
+    corte = dados.index('Ú'.encode('utf-8')) + 1
+    assert readers.sniff(dados[:corte]).encoding == 'utf-8'
+
+def test_misto_utf8_latin1():
+    dados = misto()
+    amostra = dados[:readers.SAMPLE_SIZE]
+    # Amostra só com UTF-8: o byte Latin-1 do fim fica fora dela
+    assert len(dados) > readers.SAMPLE_SIZE
+    dialeto = readers.sniff(amostra)
+    assert (dialeto.encoding, dialeto.errors) == ('utf-8', 'latin1_fallback')
+
+    df = readers.read_csv(io.BytesIO(dados), dtype=str)
+    assert len(df) == 3001
+    assert df['DESCRICAO'].iloc[0] == "ASSISTÊNCIA MÉDICA"
+    assert df['DESCRICAO'].iloc[-1] == "CLÍNICA ODONTOLÓGICA"
+
+@pytest.mark.parametrize("sep", [';', ',', '\t', '|'])
+def test_separador(sep):
+    assert readers.sniff(csv_bytes('utf-8', sep)).sep == sep
+
+def test_separador_dentro_de_aspas_nao_conta():
+    cabecalho = '"REG_ANS";"DESCRICAO, COMPLETA, COM VIRGULAS";"VL_SALDO_FINAL"\n1;A;2\n'
+    assert readers.sniff(cabecalho.encode()).sep == ';'
+
+def test_sem_separador_usa_o_padrao():
+    assert readers.sniff(b"REG_ANS\n1\n2\n").sep == readers.DEFAULT_SEP
+
+@pytest.mark.parametrize("encoding", ['latin1', 'cp1252'])
+def test_mojibake(encoding):
+    # UTF-8 lido uma vez como Latin-1/cp1252 e gravado de novo em UTF-8
+    texto = "SAÚDE; MÉDICA; ODONTOLÓGICA".encode('utf-8').decode(encoding, errors='ignore')
+    assert readers.sniff(f"DESCRICAO;X\n{texto};1\n".encode('utf-8')).mojibake
+    assert not readers.sniff(csv_bytes('utf-8')).mojibake
+
+@pytest.mark.parametrize("chunksize", [1, 7, None])
+def test_read_csv_em_blocos(chunksize):
+    """Mesmo conteúdo lendo inteiro ou em blocos (o dialeto vem da amostra, não do bloco)."""
+    dados = misto()
+    esperado = pd.read_csv(io.BytesIO(dados), sep=';', dtype=str, encoding='utf-8', encoding_errors='latin1_fallback')
+    if chunksize is None:
+        obtido = readers.read_csv(io.BytesIO(dados), dtype=str)
+    else:
+        obtido = pd.concat(readers.read_csv(io.BytesIO(dados), dtype=str, chunksize=chunksize), ignore_index=True)
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+def test_cache_por_membro_de_zip(tmp_path):
+    caminho = tmp_path / "dados.zip"
+    with zipfile.ZipFile(caminho, 'w') as z:
+        z.writestr('latin.csv', csv_bytes('latin1'))
+        z.writestr('utf.csv', csv_bytes('utf-8', ',', [("1", "SAÚDE ASSISTÊNCIA MÉDICA", "10.50")]))
+    with zipfile.ZipFile(caminho) as z:
+        for nome, esperado in [('latin.csv', ('latin1', ';')), ('utf.csv', ('utf-8', ','))]:
+            chave = readers.member_key(z, nome)
+            with z.open(nome) as f:
+                df = readers.read_csv(f, key=chave, dtype=str)
+            assert (readers.cache[chave].encoding, readers.cache[chave].sep) == esperado
+            assert df['DESCRICAO'].iloc[0] == "SAÚDE ASSISTÊNCIA MÉDICA"
@@ -0,0 +1,125 @@
+"""Downloads do scraper (etl/scraper.py) contra o servidor local que imita a ANS (etl/fake_ans_server.py)."""
+
+import os
+import io
+import zipfile
+
+import pytest
+import requests
+
+from etl import scraper, fake_ans_server
+
+def zip_bytes(tamanho=200_000):
+    """ZIP com um membro que não comprime (o arquivo fica grande o bastante para cortar no meio)."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as z:
+        z.writestr('1T2025.csv', os.urandom(tamanho))
+    return buffer.getvalue()
+
+@pytest.fixture
+def servidor(tmp_path):
+    """Sobe o servidor em tmp_path/remoto; devolve (pasta remota, url base, pasta local)."""
+    remoto, local = tmp_path / "remoto", tmp_path / "local"
+    remoto.mkdir()
+    local.mkdir()
+    server, url = fake_ans_server.start_server(str(remoto))
+    yield remoto, url, local
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def sessao():
+    """Sessão própria (sem o pool global) que anota o status de cada resposta."""
+    session = scraper.make_session()
+    session.status = []
+    session.hooks['response'].append(lambda r, *args, **kwargs: session.status.append(r.status_code))
+    yield session
+    session.close()
+
+def baixar(url, local, sessao, nome='arquivo.zip'):
+    return scraper.download_file(url + nome, nome, output_dir=str(local), session=sessao)
+
+def test_download_novo(servidor, sessao):
+    remoto, url, local = servidor
+    dados = zip_bytes()
+    (remoto / "arquivo.zip").write_bytes(dados)
+
+    path = baixar(url, local, sessao)
+    assert sessao.status == [200]
+    assert open(path, 'rb').read() == dados
+    meta = scraper.load_meta(path)
+    assert meta['etag'] and meta['size'] == len(dados)
+    assert not os.path.exists(path + ".part")
+
+def test_sem_mudanca_responde_304(servidor, sessao):
+    remoto, url, local = servidor
+    (remoto / "arquivo.zip").write_bytes(zip_bytes())
+    baixar(url, local, sessao)
+    mtime = os.path.getmtime(local / "arquivo.zip")
+
+    assert baixar(url, local, sessao) == str(local / "arquivo.zip")
+    assert sessao.status == [200, 304]
+    assert os.path.getmtime(local / "arquivo.zip") == mtime
+
+def meio_baixado(remoto, url, local, corte):
+    """Simula um download interrompido: .part com os primeiros 'corte' bytes e os metadados da resposta."""
+    dados = (remoto / "arquivo.zip").read_bytes()
+    part = local / "arquivo.zip.part"
+    part.write_bytes(dados[:corte])
+    etag = requests.head(url + "arquivo.zip").headers['ETag']
+    scraper.save_meta(str(part), {'url': url + "arquivo.zip", 'etag': etag, 'last_modified': None})
+    return dados
+
+def test_part_truncado_retoma_com_206(servidor, sessao):
+    remoto, url, local = servidor
+    (remoto / "arquivo.zip").write_bytes(zip_bytes())
+    dados = meio_baixado(remoto, url, local, 50_000)
+
+    path = baixar(url, local, sessao)
+    assert sessao.status == [206]
+    assert open(path, 'rb').read() == dados
+    assert not os.path.exists(local / "arquivo.zip.part")
+
+def test_part_completo_responde_416(servidor, sessao):
+    remoto, url, local = servidor
+    (remoto / "arquivo.zip").write_bytes(zip_bytes())
+    dados = meio_baixado(remoto, url, local, None)
+
+    path = baixar(url, local, sessao)
+    assert sessao.status == [416]
+    assert open(path, 'rb').read() == dados
+
+def test_etag_mudou_baixa_inteiro(servidor, sessao):
+    remoto, url, local = servidor
+    (remoto / "arquivo.zip").write_bytes(zip_bytes())
+    meio_baixado(remoto, url, local, 50_000)
+    # Arquivo remoto trocado depois do início do download: o If-Range não bate e o servidor manda tudo
+    novos = zip_bytes(150_000)
+    (remoto / "arquivo.zip").write_bytes(novos)
+    os.utime(remoto / "arquivo.zip", ns=(1, 1))
+
+    path = baixar(url, local, sessao)
+    assert sessao.status == [200]
+    assert open(path, 'rb').read() == novos
+
+def test_zip_corrompido_e_rejeitado(servidor, sessao):
+    remoto, url, local = servidor
+    dados = bytearray(zip_bytes())
+    dados[1000] ^= 0xFF  # muda um byte dentro do membro: o CRC não bate
+    (remoto / "arquivo.zip").write_bytes(bytes(dados))
+
+    assert baixar(url, local, sessao) is None
+    assert os.listdir(local) == []
+
+def test_csv_comprimido_pelo_servidor(servidor, sessao):
+    """O servidor comprime o CSV para quem aceita gzip; o scraper pede identity e confere o tamanho real."""
+    remoto, url, local = servidor
+    dados = ("REGISTRO_OPERADORA;CNPJ;Razao_Social\n" + "123456;11222333000181;OPERADORA\n" * 5000).encode()
+    (remoto / "Relatorio_cadop.csv").write_bytes(dados)
+    assert requests.get(url + "Relatorio_cadop.csv").headers.get('Content-Encoding') == 'gzip'
+
+    path = scraper.download_cadop(str(local), sessao, base_url=url)
+    assert open(path, 'rb').read() == dados
+    assert scraper.load_meta(path)['size'] == len(dados)
+    assert scraper.download_cadop(str(local), sessao, base_url=url) == path
+    assert sessao.status[-1] == 304
@@ -0,0 +1,66 @@
+"""Validação vetorizada de CNPJ (transformer.validar_cnpjs) contra a versão escalar original."""
+
+import re
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.transformer import validar_cnpjs
+
+def validar_cnpj(cnpj):
+    """Validação escalar (Módulo 11), a que o transformer usava linha a linha: serve de referência."""
+    cnpj = re.sub(r'[^0-9]', '', str(cnpj))
+    if len(cnpj) != 14 or cnpj == cnpj[0] * len(cnpj):
+        return False
+
+    def calc_digito(doc, pesos):
+        resto = sum(int(d) * p for d, p in zip(doc, pesos)) % 11
+        return 0 if resto < 2 else 11 - resto
+
+    return (calc_digito(cnpj[:12], [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]) == int(cnpj[12])
+            and calc_digito(cnpj[:13], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]) == int(cnpj[13]))
+
+def com_dv(base):
+    """Completa 12 dígitos com os dois dígitos verificadores certos."""
+    for pesos in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        resto = sum(int(d) * p for d, p in zip(base, pesos)) % 11
+        base += str(0 if resto < 2 else 11 - resto)
+    return base
+
+def formatado(cnpj):
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+
+@pytest.fixture
+def cnpjs():
+    rng = random.Random(11)
+    validos = [com_dv(''.join(rng.choice('0123456789') for _ in range(12))) for _ in range(3000)]
+    valores = (validos + [formatado(c) for c in validos[:500]]
+               # Um dígito trocado (quase sempre inválido) e dígitos aleatórios
+               + [c[:13] + str((int(c[13]) + 1) % 10) for c in validos[:500]]
+               + [''.join(rng.choice('0123456789') for _ in range(14)) for _ in range(3000)]
+               # Tamanho errado, sequências repetidas, lixo e nulos
+               + [c[:13] for c in validos[:100]] + [c + '0' for c in validos[:100]]
+               + [d * 14 for d in '0123456789'] + [formatado('1' * 14)]
+               + ['', 'abc', ' 11.222.333/0001-81 ', '11222333000181x', None, np.nan])
+    return pd.Series(valores, dtype=object)
+
+def test_igual_a_versao_escalar(cnpjs):
+    esperado = [validar_cnpj(c) if pd.notna(c) else False for c in cnpjs]
+    obtido = validar_cnpjs(cnpjs)
+    assert obtido.tolist() == esperado
+    assert obtido.index.equals(cnpjs.index)
+    # Sanidade: o conjunto tem válidos e inválidos de sobra
+    assert 3000 < sum(esperado) < len(esperado) - 3000
+
+def test_casos_conhecidos():
+    serie = pd.Series(['11.222.333/0001-81', '11222333000181', '11222333000182', '00000000000000',
+                       '1122233300018', None], index=[10, 20, 30, 40, 50, 60])
+    assert validar_cnpjs(serie).tolist() == [True, True, False, False, False, False]
+
+def test_tipos_de_entrada():
+    # Texto do pandas (com pd.NA), inteiros e Series vazia
+    assert validar_cnpjs(pd.Series(['11222333000181', pd.NA], dtype='string')).tolist() == [True, False]
+    assert validar_cnpjs(pd.Series([11222333000181, 11222333000182])).tolist() == [True, False]
+    assert validar_cnpjs(pd.Series([], dtype=object)).tolist() == []
@@ -0,0 +1,143 @@
+"""Leitura em streaming do .xlsx (etl/xlsx_reader.py) contra o pd.read_excel."""
+
+import io
+import re
+import random
+import zipfile
+import datetime as dt
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from etl import consolidator, xlsx_reader
+from benchmarks import synthetic
+
+COLUNAS = consolidator.REQUIRED_COLS
+TERMOS = consolidator.TERMOS_FILTRO
+NORMALIZA = lambda c: str(c).upper().strip()
+
+def planilha_openpyxl():
+    """Shared strings, datas reais e em texto, células vazias, colunas extras e texto depois da tabela."""
+    rng = random.Random(1)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(['Extra', ' data ', 'reg_ans', 'CD', 'Descricao', 'VL_SALDO_FINAL'])
+    descricoes = ['EVENTOS/ SINISTROS CONHECIDOS', 'Receita', 'eventos indenizáveis & <líquidos>', 'SINISTRO',
+                  'Outros custos', None]
+    for i in range(300):
+        data = dt.datetime(2025, rng.choice([1, 4, 7, 10]), 1) if i % 3 else '2025-03-31'
+        ws.append([None if i % 5 == 0 else 'x', data, rng.choice([123456, '000999', 4321]), '411',
+                   rng.choice(descricoes), rng.choice([1234.56, -10.5, 0, '1.234,56', None])])
+    ws.append([None] * 6)
+    ws.append(['fim', None, None, None, 'TOTAL SINISTRO', None])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+def com_prefixo(data):
+    """Mesma planilha com as tags da planilha prefixadas (<x:row>, <x:c>...)."""
+    origem = zipfile.ZipFile(io.BytesIO(data))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as destino:
+        for nome in origem.namelist():
+            conteudo = origem.read(nome)
+            if nome.endswith('sheet1.xml'):
+                texto = conteudo.decode().replace(f'xmlns="{xlsx_reader.NS_MAIN[1:-1]}"',
+                                                  f'xmlns:x="{xlsx_reader.NS_MAIN[1:-1]}"')
+                conteudo = re.sub(r'<(/?)(?!\?)(?![a-z]+:)', r'<\1x:', texto).encode()
+            destino.writestr(nome, conteudo)
+    return buffer.getvalue()
+
+def planilha_sintetica():
+    """Formato do gerador dos benchmarks: inlineStr e números sem tipo, um trimestre pequeno."""
+    codigos, descricoes = synthetic.plano_de_contas(12)
+    rng = synthetic.np.random.default_rng(3)
+    bloco = synthetic.linhas_trimestre(synthetic.np.arange(300000, 300025), synthetic.np.full(25, 1e5),
+                                       2025, 2, codigos, descricoes, rng)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        synthetic.escrever_xlsx(z, '2T2025.xlsx', [bloco])
+    return zipfile.ZipFile(buffer).read('2T2025.xlsx')
+
+def inline(texto):
+    return f'<c t="inlineStr"><is><t>{texto}</t></is></c>'
+
+def trechos(*partes):
+    """Texto inline em trechos <r> (como o Excel grava texto com formatação misturada)."""
+    runs = ''.join(f'<r>{"<rPr><b/></rPr>" if i % 2 else ""}<t>{parte}</t></r>' for i, parte in enumerate(partes))
+    return f'<c t="inlineStr"><is>{runs}</is></c>'
+
+def planilha_trechos():
+    """Termos que a busca de bytes não acha: cortados entre trechos <r> ou escritos com &#NN;. E linhas vazias."""
+    descricoes = [
+        trechos('EVEN', 'TOS/ SINIS', 'TRO CONHECIDO'),
+        trechos('Outras despesas - ', 'sin', 'istro'),
+        inline('&#69;VENTOS INDENIZ&#193;VEIS'),
+        inline('SINISTROS'),
+        inline('RECEITA'),
+        trechos('RECE', 'ITA'),
+    ]
+    linhas = [''.join(inline(c) for c in ['DATA', 'REG_ANS', 'DESCRICAO', 'VL_SALDO_FINAL'])]
+    for i in range(60):
+        linhas.append(inline('2025-03-31') + f'<c><v>{300000 + i}</v></c>' + descricoes[i % len(descricoes)]
+                      + f'<c><v>{i * 10.5}</v></c>')
+    # Linha vazia fechada na própria tag (<row/>) a cada 9
+    xml = ''.join(f'<row>{linha}</row>' + ('<row/>' if n % 9 == 8 else '') for n, linha in enumerate(linhas))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for parte, conteudo in synthetic.XLSX_ESTRUTURA.items():
+            z.writestr(parte, conteudo)
+        z.writestr('xl/worksheets/sheet1.xml', '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   f'<worksheet xmlns="{xlsx_reader.NS_MAIN[1:-1]}"><sheetData>{xml}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+PLANILHAS = {
+    'openpyxl': planilha_openpyxl,
+    'prefixo': lambda: com_prefixo(planilha_openpyxl()),
+    'sintetica': planilha_sintetica,
+    'trechos': planilha_trechos,
+}
+
+@pytest.fixture(scope="module", params=list(PLANILHAS))
+def planilha(request):
+    return PLANILHAS[request.param]()
+
+def esperado_read_excel(data):
+    # dtype=object: valores crus das células (sem "000999" virar 999), como o xlsx_reader devolve
+    df = pd.read_excel(io.BytesIO(data), dtype=object)
+    df.columns = [NORMALIZA(c) for c in df.columns]
+    filtro = df['DESCRICAO'].str.contains('|'.join(TERMOS), case=False, na=False)
+    df = df.loc[filtro, COLUNAS].reset_index(drop=True)
+    # Célula vazia: o read_excel devolve NaN, o xlsx_reader devolve None
+    return df.astype(object).where(df.notna(), None)
+
+@pytest.mark.parametrize("batch_size", [1, 7, None])
+def test_iter_rows_igual_read_excel(planilha, batch_size):
+    lotes = list(xlsx_reader.iter_rows(io.BytesIO(planilha), COLUNAS, 'DESCRICAO', TERMOS,
+                                       normalize=NORMALIZA, date_columns=['DATA'], batch_size=batch_size))
+    if batch_size:
+        assert all(len(lote) <= batch_size for lote in lotes)
+    else:
+        assert len(lotes) == 1
+    obtido = pd.DataFrame([linha for lote in lotes for linha in lote], columns=COLUNAS)
+    esperado = esperado_read_excel(planilha)
+    assert len(obtido) > 0
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+
+@pytest.mark.parametrize("chunksize", [1, 7, None])
+def test_consolidador_igual_ao_read_excel(planilha, chunksize):
+    """O que o consolidator grava não muda em relação ao caminho antigo (read_excel + filter_despesas)."""
+    df = pd.read_excel(io.BytesIO(planilha), usecols=consolidator.is_required_col)
+    esperado = consolidator.filter_despesas(df, {}).reset_index(drop=True)
+    partes = list(consolidator.iter_file_chunks(io.BytesIO(planilha), 'xlsx', chunksize=chunksize))
+    pd.testing.assert_frame_equal(pd.concat(partes, ignore_index=True), esperado)
+
+def test_sem_colunas_obrigatorias():
+    wb = openpyxl.Workbook()
+    wb.active.append(['DATA', 'REG_ANS', 'DESCRICAO'])
+    wb.active.append(['2025-01-01', 1, 'EVENTOS'])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    assert list(xlsx_reader.iter_rows(buffer, COLUNAS, 'DESCRICAO', TERMOS, normalize=NORMALIZA)) == []